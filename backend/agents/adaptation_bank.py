@@ -0,0 +1,178 @@
+"""Pre-generated content adaptations per curriculum node and strategy bucket.
+
+EmotionalState.get_adaptation_strategy() maps any emotional state to one of a
+small set of strategy combinations (see EmotionalState.strategy_key), so the
+Content Adapter's output can be generated ahead of time for each node and
+served on the chat path without a Bedrock call.
+
+Which buckets are worth building is learned from traffic: every live (not
+banked) adaptation records its bucket in the curriculum's demand document, and
+the bank holds "default" plus the most requested buckets. A bucket seen for the
+first time starts a background build for it.
+"""
+
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+from agents.prompts import CONTENT_ADAPTER_PROMPT
+from models.emotional_state import EmotionalState
+from utils.bedrock import invoke_agent, extract_json
+from utils.storage import (
+    get_adaptation,
+    get_strategy_demand,
+    put_adaptation,
+    put_strategy_demand,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# A calm, engaged learner; each signal below pushes one dimension past its rule threshold
+BASE_STATE = {"engagement": 0.6, "confidence": 0.5, "frustration": 0.2,
+              "curiosity": 0.5, "cognitive_load": 0.4}
+SIGNALS = {
+    "frustrated": {"frustration": 0.75},
+    "disengaged": {"engagement": 0.2},
+    "curious": {"curiosity": 0.8},
+    "overloaded": {"cognitive_load": 0.8},
+    "confident": {"confidence": 0.9},
+}
+
+# How many strategy buckets to keep banked per curriculum ("default" plus the most requested)
+BANK_VARIANTS = int(os.environ.get("ADAPTATION_BANK_VARIANTS", "6"))
+BUILD_CONCURRENCY = int(os.environ.get("ADAPTATION_BANK_CONCURRENCY", "4"))
+# Generations per precompute invocation; the rest continue in a fresh invocation
+BUILD_MAX_JOBS = int(os.environ.get("ADAPTATION_BANK_MAX_JOBS", "120"))
+
+
+def strategy_states() -> Dict[str, dict]:
+    """A representative emotional state for every reachable strategy bucket.
+
+    Signal combinations that map to the same bucket, or contradict each other
+    (frustrated and confident), collapse; the rest are ordered by signal count.
+    """
+    states = {}
+    for count in range(len(SIGNALS) + 1):
+        for names in combinations(SIGNALS, count):
+            state = dict(BASE_STATE)
+            for name in names:
+                state.update(SIGNALS[name])
+            states.setdefault(EmotionalState.from_dict(state).strategy_key(), state)
+    return states
+
+
+STRATEGY_STATES = strategy_states()
+
+
+def _topic_for(node: dict) -> str:
+    return f"{node.get('title', '')}: {node.get('description', '')}".strip(": ")
+
+
+def generate_variant(node: dict, state: dict) -> Optional[dict]:
+    """Generate one node/strategy adaptation with the Content Adapter agent.
+
+    Returns None unless the agent answers with JSON; a stored variant is served
+    to every student in the bucket, so a malformed one is not kept.
+    """
+    tool_input = {"current_topic": _topic_for(node), "emotional_state": state}
+    response = invoke_agent(CONTENT_ADAPTER_PROMPT, json.dumps(tool_input))
+    if isinstance(response, dict):
+        return response
+    try:
+        variant = extract_json(response)
+    except (ValueError, TypeError):
+        return None
+    return variant if isinstance(variant, dict) else None
+
+
+def record_strategy(curriculum_hash: str, strategy_key: str, state: EmotionalState) -> bool:
+    """Count a live adaptation in the curriculum's bucket demand.
+
+    Only called when a lesson had to be generated, so the extra read and write
+    are small next to the model call. Concurrent updates can lose an increment;
+    the counts only rank buckets. Returns True the first time a bucket is seen.
+    """
+    demand = get_strategy_demand(curriculum_hash) or {}
+    entry = demand.get(strategy_key)
+    demand[strategy_key] = {
+        "count": (entry or {}).get("count", 0) + 1,
+        "state": (entry or {}).get("state") or state.to_dict(),
+    }
+    put_strategy_demand(curriculum_hash, demand)
+    return entry is None
+
+
+def bank_strategies(curriculum_hash: str, variants: int = BANK_VARIANTS) -> List[Tuple[str, dict]]:
+    """The buckets to bank: "default", then observed buckets by demand."""
+    buckets = {"default": STRATEGY_STATES["default"]}
+    demand = get_strategy_demand(curriculum_hash) or {}
+    for key, entry in sorted(demand.items(), key=lambda item: -item[1].get("count", 0)):
+        buckets.setdefault(key, STRATEGY_STATES.get(key) or entry.get("state") or BASE_STATE)
+    return list(buckets.items())[:variants]
+
+
+def build_adaptation_bank(curriculum: dict, curriculum_hash: str,
+                          variants: int = BANK_VARIANTS,
+                          max_jobs: Optional[int] = None) -> Tuple[int, int]:
+    """Generate and store missing variants for every node and the banked buckets.
+
+    At most max_jobs (default BUILD_MAX_JOBS) variants are generated per call,
+    earliest nodes first.
+    Node/bucket pairs that already have a variant are skipped, so calling again
+    continues where the last call stopped. Returns (written, still missing).
+    """
+    if max_jobs is None:
+        max_jobs = BUILD_MAX_JOBS
+    buckets = bank_strategies(curriculum_hash, variants)
+    pairs = [(node, key, state)
+             for node in curriculum.get("nodes", []) for key, state in buckets]
+
+    def missing(pair):
+        node, key, _ = pair
+        return get_adaptation(curriculum_hash, node["id"], key) is None
+
+    def build(job):
+        node, key, state = job
+        try:
+            variant = generate_variant(node, state)
+        except Exception as e:
+            logger.error("Adaptation bank: node=%s strategy=%s failed: %s", node["id"], key, e)
+            return 0
+        if variant is None:
+            logger.warning("Adaptation bank: node=%s strategy=%s returned no JSON; not stored",
+                           node["id"], key)
+            return 0
+        put_adaptation(curriculum_hash, node["id"], key, variant)
+        return 1
+
+    with ThreadPoolExecutor(max_workers=BUILD_CONCURRENCY) as pool:
+        todo = [pair for pair, absent in zip(pairs, pool.map(missing, pairs)) if absent]
+        jobs = todo[:max_jobs]
+        written = sum(pool.map(build, jobs))
+
+    remaining = len(todo) - len(jobs)
+    logger.info("Adaptation bank: curriculum=%s buckets=%s wrote %d/%d variants, %d left",
+                curriculum_hash[:12], [key for key, _ in buckets], written, len(jobs), remaining)
+    return written, remaining
+
+
+def serve_adaptation(curriculum_hash: str, node_id: str, strategy_key: str) -> Optional[dict]:
+    """The stored variant for a node and strategy bucket, or None."""
+    return get_adaptation(curriculum_hash, node_id, strategy_key)
+
+
+def personalize(variant: dict, state: EmotionalState, student_message: str) -> dict:
+    """Tie a shared variant to this student without another model call.
+
+    The strategy and the student's words ride along so the orchestrator can
+    connect the prepared lesson to what the student actually said.
+    """
+    personalized = dict(variant)
+    personalized["adaptation_strategy"] = state.get_adaptation_strategy()
+    if student_message:
+        personalized["respond_to"] = student_message
+    return personalized
@@ -0,0 +1,78 @@
+"""Per-turn and per-session token budgets for the chat loop.
+
+When a session nears its budget, or a turn has already spent its own, the loop
+degrades gracefully instead of failing: fewer orchestrator iterations, a shorter
+maxTokens, and optional tools dropped or skipped.
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import List
+
+from agents.tools import ORCHESTRATOR_TOOLS
+
+TURN_TOKEN_BUDGET = int(os.environ.get("TURN_TOKEN_BUDGET", "80000"))
+SESSION_TOKEN_BUDGET = int(os.environ.get("SESSION_TOKEN_BUDGET", "3000000"))
+# Fraction of the session budget after which turns run in constrained mode
+SESSION_SOFT_LIMIT = float(os.environ.get("SESSION_SOFT_LIMIT", "0.8"))
+
+# Tools that improve a reply but are not needed to produce one
+OPTIONAL_TOOLS = {"adapt_content", "generate_assessment", "parse_curriculum"}
+
+WRAP_UP_NOTE = (
+    "## Budget Notice\n\nThis turn has reached its processing budget. Do not call any "
+    "more tools; reply to the student now using what you already have."
+)
+
+
+@dataclass
+class TurnPlan:
+    """Limits applied to one chat turn."""
+
+    level: str = "normal"
+    max_iterations: int = 6
+    max_tokens: int = 4096
+    tools: List[dict] = field(default_factory=lambda: list(ORCHESTRATOR_TOOLS))
+
+    @property
+    def tool_names(self) -> set:
+        return {t["toolSpec"]["name"] for t in self.tools}
+
+
+def session_total(token_usage: dict) -> int:
+    """Tokens spent so far in a session, as persisted in session["token_usage"]."""
+    return sum(
+        token_usage.get(k, 0)
+        for k in ("inputTokens", "outputTokens", "cacheReadInputTokens", "cacheWriteInputTokens")
+    )
+
+
+def plan_turn(token_usage: dict) -> TurnPlan:
+    """Pick turn limits from how much of the session budget is already spent."""
+    spent = session_total(token_usage)
+
+    if spent >= SESSION_TOKEN_BUDGET:
+        # Over budget: one short reply, no tools
+        return TurnPlan(level="exhausted", max_iterations=1, max_tokens=512, tools=[])
+
+    if spent >= SESSION_TOKEN_BUDGET * SESSION_SOFT_LIMIT:
+        return TurnPlan(
+            level="constrained",
+            max_iterations=3,
+            max_tokens=1024,
+            tools=[
+                t for t in ORCHESTRATOR_TOOLS
+                if t["toolSpec"]["name"] not in OPTIONAL_TOOLS
+            ],
+        )
+
+    return TurnPlan()
+
+
+def merge_usage(token_usage: dict, turn_totals: dict) -> dict:
+    """Add one turn's usage to the session's running totals."""
+    merged = dict(token_usage)
+    for key, value in turn_totals.items():
+        merged[key] = merged.get(key, 0) + value
+    merged["turns"] = merged.get("turns", 0) + 1
+    return merged
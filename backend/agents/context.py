@@ -0,0 +1,111 @@
+"""Context budget manager for the orchestrator's conversation history.
+
+Recent messages are replayed verbatim; older ones are folded in batches into a
+rolling summary persisted on the session (context_summary / summarized_count), so
+the orchestrator's input stays bounded no matter how long a session runs.
+"""
+
+import json
+import logging
+import os
+
+from agents.prompts import CONVERSATION_SUMMARIZER_PROMPT
+from utils.bedrock import invoke_agent
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Messages (not turns) always replayed verbatim
+RECENT_MESSAGES = int(os.environ.get("CONTEXT_RECENT_MESSAGES", "12"))
+# Older messages are folded into the summary once this many have accumulated
+SUMMARY_BATCH = int(os.environ.get("CONTEXT_SUMMARY_BATCH", "10"))
+# Approximate token ceiling for summary + replayed history + new message
+TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "24000"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token for English prose)."""
+    return len(text) // 4 + 1
+
+
+def _message_text(msg: dict) -> str:
+    content = msg.get("content", "")
+    if isinstance(content, str):
+        return content
+    return "\n".join(b["text"] for b in content if isinstance(b, dict) and "text" in b)
+
+
+def build_context(session: dict, user_message: str, messages: list) -> tuple:
+    """Select the persisted history to replay for this turn.
+
+    Args:
+        messages: Persisted messages from seq session["summarized_count"] onwards.
+
+    Returns:
+        (summary, window) where summary is the rolling summary text (may be empty)
+        and window is the list of persisted messages to replay verbatim, oldest first.
+    """
+    summary = session.get("context_summary", "")
+    window = messages
+
+    # Enforce the budget by dropping the oldest verbatim turns; they are folded
+    # into the summary on the next refresh
+    used = estimate_tokens(summary) + estimate_tokens(user_message)
+    sizes = [estimate_tokens(_message_text(m)) for m in window]
+    total = used + sum(sizes)
+    start = 0
+    while total > TOKEN_BUDGET and len(window) - start > 2:
+        total -= sizes[start]
+        start += 1
+    # Converse requires the history to open with a user message
+    while start < len(window) and window[start].get("role") != "user":
+        total -= sizes[start]
+        start += 1
+    if start:
+        logger.warning("Context: dropped %d messages to fit %d-token budget",
+                       start, TOKEN_BUDGET)
+
+    return summary, window[start:]
+
+
+def refresh_summary(session: dict, messages: list) -> dict:
+    """Fold older messages into the rolling summary once a full batch is pending.
+
+    Args:
+        session: The session as loaded at the start of the turn.
+        messages: Persisted messages from seq session["summarized_count"] onwards,
+            including this turn's.
+
+    Returns:
+        Session updates (context_summary, summarized_count), or {} when no refresh is due.
+    """
+    summarized = int(session.get("summarized_count", 0))
+    cutoff = len(messages) - RECENT_MESSAGES
+    # Keep the verbatim window starting on a user message
+    while 0 < cutoff < len(messages) and messages[cutoff].get("role") != "user":
+        cutoff -= 1
+
+    if cutoff < SUMMARY_BATCH:
+        return {}
+
+    pending = messages[:cutoff]
+    transcript = "\n".join(
+        f"{m.get('role', 'user')}: {_message_text(m)}" for m in pending
+    )
+    summary = invoke_agent(
+        CONVERSATION_SUMMARIZER_PROMPT,
+        json.dumps(
+            {
+                "existing_summary": session.get("context_summary", ""),
+                "new_messages": transcript,
+            }
+        ),
+        max_tokens=1024,
+    )
+    if not isinstance(summary, str) or not summary.strip():
+        logger.warning("Context: summarizer returned no text, keeping previous summary")
+        return {}
+
+    logger.info("Context: folded %d messages into summary (summarized_count=%d)",
+                len(pending), summarized + cutoff)
+    return {"context_summary": summary.strip(), "summarized_count": summarized + cutoff}
@@ -0,0 +1,372 @@
+"""Chunked, concurrent curriculum parsing with the Curriculum Architect agent.
+
+A document is segmented locally on section markers ("===" lines and chapter/unit
+headings, then paragraphs for long sections) and the segments are packed into
+chunks of at most PARSE_CHUNK_CHARS. The chunks are parsed in parallel; the agent
+returns only node structure plus the refs of the segments each node covers, and
+node content is attached here from the source text, so output tokens no longer
+grow with document length. The partial node lists are merged into one
+CurriculumGraph: ids are made unique, prerequisites are resolved across chunks
+and the result is validated as a DAG.
+"""
+
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from agents.prompts import CURRICULUM_ARCHITECT_PROMPT
+from models.curriculum import CurriculumGraph, CurriculumNode
+from utils.bedrock import MODEL_ID, invoke_agent, extract_json
+from utils.curriculum_store import load_curriculum
+from utils.storage import get_parse_result, put_curriculum, put_parse_result
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# The agent only reads a chunk, so chunks can be large; output is node metadata
+PARSE_CHUNK_CHARS = int(os.environ.get("PARSE_CHUNK_CHARS", "60000"))
+PARSE_CONCURRENCY = int(os.environ.get("PARSE_CONCURRENCY", "6"))
+PARSE_MAX_TOKENS = 8192
+# Longest segment the agent can assign to a node; longer sections split on paragraphs
+SEGMENT_CHARS = int(os.environ.get("PARSE_SEGMENT_CHARS", "4000"))
+# Reuse the stored parse when the same text and subject are uploaded again
+PARSE_CACHE_ENABLED = os.environ.get("PARSE_CACHE_ENABLED", "true").lower() == "true"
+
+# Anything that changes what a parse produces; cached parses from other versions are ignored
+PARSE_VERSION = hashlib.sha256(
+    json.dumps([CURRICULUM_ARCHITECT_PROMPT, MODEL_ID, PARSE_CHUNK_CHARS, SEGMENT_CHARS])
+    .encode("utf-8")
+).hexdigest()[:16]
+
+SEPARATOR_RE = re.compile(r"^\s*={3,}\s*$")
+HEADING_RE = re.compile(
+    r"^\s*(?:#{1,2}\s+\S|(?:chapter|unit|part|module|lesson)\s+(?:\d+|[ivxlc]+)\b)",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class Section:
+    """A span of the source text starting at a section marker."""
+
+    heading: str
+    start: int
+    end: int
+    ref: str = ""
+
+
+def split_sections(text: str) -> List[Section]:
+    """Split text into sections at "===" separator lines and chapter-style headings.
+
+    Separator lines are not part of any section; heading lines start theirs.
+    Offsets index into the original text.
+    """
+    sections = []
+    start = 0
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        line_start, offset = offset, offset + len(line)
+        if SEPARATOR_RE.match(line):
+            sections.append((start, line_start))
+            start = offset
+        elif HEADING_RE.match(line) and text[start:line_start].strip():
+            sections.append((start, line_start))
+            start = line_start
+    sections.append((start, len(text)))
+
+    result = []
+    for begin, end in sections:
+        body = text[begin:end]
+        if not body.strip():
+            continue
+        heading = body.strip().splitlines()[0].strip()
+        result.append(Section(heading=heading if HEADING_RE.match(heading) else "",
+                              start=begin, end=end))
+    return result
+
+
+def _split_long(section: Section, text: str, max_chars: int) -> List[Section]:
+    """Break an oversized section on paragraph boundaries (hard cut as a last resort)."""
+    pieces = []
+    start = section.start
+    while section.end - start > max_chars:
+        cut = text.rfind("\n\n", start + 1, start + max_chars)
+        if cut <= start:
+            cut = start + max_chars
+        pieces.append(Section(section.heading if not pieces else "", start, cut))
+        start = cut
+    pieces.append(Section(section.heading if not pieces else "", start, section.end))
+    return pieces
+
+
+def segment_text(text: str, max_chars: int = SEGMENT_CHARS) -> List[Section]:
+    """Deterministically split text into referenceable segments ("s1", "s2", ...)."""
+    segments = []
+    for section in split_sections(text):
+        segments.extend(_split_long(section, text, max_chars))
+    for index, segment in enumerate(segments):
+        segment.ref = f"s{index + 1}"
+    return segments
+
+
+def chunk_sections(segments: List[Section],
+                   max_chars: int = PARSE_CHUNK_CHARS) -> List[List[Section]]:
+    """Greedily pack consecutive segments into chunks of at most max_chars."""
+    chunks, current, size = [], [], 0
+    for segment in segments:
+        length = segment.end - segment.start
+        if current and size + length > max_chars:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(segment)
+        size += length
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+def _section_input(segment: Section, text: str) -> dict:
+    entry = {"ref": segment.ref, "text": text[segment.start:segment.end].strip()}
+    if segment.heading:
+        entry["heading"] = segment.heading
+    return entry
+
+
+def _attach_content(nodes: List[CurriculumNode], node_refs: Dict[str, List[str]],
+                    section_text: Dict[str, str]) -> None:
+    """Fill node content from the segments each node references.
+
+    Each segment belongs to the first node that claims it. Unclaimed segments go
+    to the owner of the preceding segment (or the following one at the start),
+    so no source text is lost when the agent skips a ref.
+    """
+    owner = {}
+    for node in nodes:
+        for ref in node_refs.get(node.id, []):
+            if ref in section_text:
+                owner.setdefault(ref, node.id)
+    if not owner:
+        logger.warning("Curriculum agent referenced no sections; keeping node content as returned")
+        return
+
+    refs = list(section_text)
+    last = next(owner[ref] for ref in refs if ref in owner)
+    for ref in refs:
+        last = owner.setdefault(ref, last)
+
+    content = {node.id: [] for node in nodes}
+    for ref in refs:
+        content[owner[ref]].append(section_text[ref])
+    for node in nodes:
+        node.content = "\n\n".join(content[node.id])
+
+
+def _parse_chunk(chunk_input: dict) -> Optional[dict]:
+    """One Curriculum Architect call; None if the response is not usable JSON."""
+    result = invoke_agent(CURRICULUM_ARCHITECT_PROMPT, json.dumps(chunk_input),
+                          max_tokens=PARSE_MAX_TOKENS)
+    logger.info("Curriculum agent part=%s raw response type=%s, length=%d",
+                chunk_input.get("part", 1), type(result).__name__, len(str(result)))
+    try:
+        parsed = result if isinstance(result, dict) else extract_json(result)
+    except (ValueError, TypeError) as e:
+        logger.error("Failed to parse curriculum JSON: %s\nRaw: %s", e, str(result)[:500])
+        return None
+    if not isinstance(parsed.get("nodes"), list):
+        logger.error("Curriculum response has no nodes array: %s", str(result)[:500])
+        return None
+    return parsed
+
+
+def merge_parts(parts: List[List[dict]], part_headings: List[List[str]], subject: str,
+                section_text: Optional[Dict[str, str]] = None) -> CurriculumGraph:
+    """Merge per-chunk node lists (in document order) into one valid graph.
+
+    Prerequisites are resolved first against the node's own part, then against
+    any node id, id/title slug or earlier section heading. Unresolvable ones are
+    dropped. The first nodes of a part without prerequisites follow the last node
+    of the previous part, preserving the document's order. With section_text
+    (ref -> text, in document order), node content is attached from the refs in
+    each node's "sections".
+    """
+    nodes: List[CurriculumNode] = []
+    part_of: Dict[str, int] = {}
+    local_ids: List[Dict[str, str]] = []
+    by_slug: Dict[str, str] = {}
+    node_refs: Dict[str, List[str]] = {}
+
+    for index, raw_nodes in enumerate(parts):
+        local = {}
+        for raw in raw_nodes:
+            if not isinstance(raw, dict):
+                continue
+            node = CurriculumNode.from_dict(raw)
+            original = node.id or _slug(node.title) or f"node_{len(nodes) + 1}"
+            node.id = original
+            suffix = 2
+            while node.id in part_of:
+                node.id = f"{original}_{suffix}"
+                suffix += 1
+            local.setdefault(original, node.id)
+            node_refs[node.id] = [str(ref) for ref in raw.get("sections") or []]
+            part_of[node.id] = index
+            for key in (node.id, _slug(original), _slug(node.title)):
+                if key:
+                    by_slug.setdefault(key, node.id)
+            nodes.append(node)
+        local_ids.append(local)
+
+    # Earlier-section headings point at the first node parsed from that part
+    first_of_part = {}
+    for node in nodes:
+        first_of_part.setdefault(part_of[node.id], node.id)
+    for index, headings in enumerate(part_headings):
+        if index in first_of_part:
+            for heading in headings:
+                by_slug.setdefault(_slug(heading), first_of_part[index])
+
+    dropped = 0
+    for node in nodes:
+        local = local_ids[part_of[node.id]]
+        resolved = []
+        for prereq in node.prerequisites:
+            target = local.get(prereq) or by_slug.get(prereq) or by_slug.get(_slug(prereq))
+            # Cross-part references may only point backwards in the document
+            if (target and target != node.id and target not in resolved
+                    and part_of[target] <= part_of[node.id]):
+                resolved.append(target)
+            else:
+                dropped += 1
+        node.prerequisites = resolved
+    if dropped:
+        logger.info("Curriculum merge dropped %d unresolved prerequisites", dropped)
+
+    last_of_part = {part_of[n.id]: n.id for n in nodes}
+    previous = None
+    for index in range(len(parts)):
+        if index not in last_of_part:
+            continue
+        if previous is not None:
+            for node in nodes:
+                if part_of[node.id] == index and not node.prerequisites:
+                    node.prerequisites = [last_of_part[previous]]
+        previous = index
+
+    if section_text and nodes:
+        _attach_content(nodes, node_refs, section_text)
+
+    graph = CurriculumGraph(nodes=nodes, subject=subject)
+    try:
+        graph.validate()
+    except ValueError as e:
+        # Only possible within a part; keep edges that point back in document order
+        logger.warning("Curriculum graph invalid (%s); dropping forward prerequisites", e)
+        position = {n.id: i for i, n in enumerate(nodes)}
+        for node in nodes:
+            node.prerequisites = [p for p in node.prerequisites
+                                  if position[p] < position[node.id]]
+        graph.reindex()
+        graph.validate()
+    return graph
+
+
+def parse_curriculum(raw_content: str, subject: str) -> dict:
+    """Parse raw text of any length into a curriculum dict."""
+    segments = segment_text(raw_content)
+    chunks = chunk_sections(segments)
+    if not chunks:
+        return {"subject": subject, "nodes": [], "parse_error": "No content to structure"}
+
+    headings = [[s.heading for s in chunk if s.heading] for chunk in chunks]
+    inputs = []
+    for index, chunk in enumerate(chunks):
+        chunk_input = {
+            "sections": [_section_input(segment, raw_content) for segment in chunk],
+            "subject_hint": subject,
+        }
+        if len(chunks) > 1:
+            chunk_input.update({
+                "part": index + 1,
+                "total_parts": len(chunks),
+                "earlier_sections": [h for part in headings[:index] for h in part],
+            })
+        inputs.append(chunk_input)
+    logger.info("Parsing curriculum: %d chars, %d segments in %d parts",
+                len(raw_content), len(segments), len(chunks))
+
+    # Each worker runs in a copy of the caller's context so usage joins the trace
+    with ThreadPoolExecutor(max_workers=max(1, min(PARSE_CONCURRENCY, len(inputs)))) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _parse_chunk, chunk_input)
+                   for chunk_input in inputs]
+        results = []
+        for index, future in enumerate(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error("Curriculum part %d failed: %s", index + 1, e)
+                results.append(None)
+
+    failed = sum(1 for r in results if r is None)
+    if failed == len(results):
+        return {"subject": subject, "nodes": [], "parse_error": "Could not structure curriculum"}
+
+    subject = next((r["subject"] for r in results if r and r.get("subject")), subject)
+    section_text = {s.ref: raw_content[s.start:s.end].strip() for s in segments}
+    graph = merge_parts([r["nodes"] if r else [] for r in results], headings, subject,
+                        section_text)
+    curriculum = graph.to_dict()
+    if failed:
+        curriculum["parse_error"] = f"{failed} of {len(results)} parts could not be structured"
+    return curriculum
+
+
+def _normalize(text: str) -> str:
+    """Canonical form of extracted text: NFKC, trimmed lines, collapsed blank runs."""
+    lines = [" ".join(line.split()) for line in unicodedata.normalize("NFKC", text).splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def parse_key(raw_content: str, subject: str) -> str:
+    """Cache key for a parse: the normalized text, subject hint and PARSE_VERSION."""
+    digest = hashlib.sha256()
+    for part in (PARSE_VERSION, " ".join(subject.split()).lower(), _normalize(raw_content)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_or_parse_curriculum(raw_content: str, subject: str) -> dict:
+    """parse_curriculum, reusing the stored result when this text was parsed before.
+
+    Curricula are content-addressed, so a repeat upload only costs a lookup and
+    its session points at the same stored graph (and question banks).
+    """
+    if not PARSE_CACHE_ENABLED:
+        return parse_curriculum(raw_content, subject)
+
+    key = parse_key(raw_content, subject)
+    cached = get_parse_result(key)
+    if cached:
+        curriculum = load_curriculum({"curriculum_hash": cached["curriculum_hash"]})
+        if curriculum:
+            logger.info("Parse cache hit: key=%s curriculum=%s",
+                        key[:12], cached["curriculum_hash"][:12])
+            return curriculum
+
+    curriculum = parse_curriculum(raw_content, subject)
+    # Partial or failed parses are not worth repeating on the next upload
+    if curriculum.get("nodes") and not curriculum.get("parse_error"):
+        put_parse_result(key, {"curriculum_hash": put_curriculum(curriculum),
+                               "version": PARSE_VERSION})
+    return curriculum
@@ -1,7 +1,12 @@
 """Dispatcher routes orchestrator tool calls to specialist agents."""
 
+import contextvars
 import json
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 from agents.prompts import (
     EMOTIONAL_ASSESSOR_PROMPT,
@@ -9,7 +14,13 @@ from agents.prompts import (
     CONTENT_ADAPTER_PROMPT,
     ASSESSMENT_GENERATOR_PROMPT,
 )
+from agents.adaptation_bank import personalize, record_strategy, serve_adaptation
+from agents.local_assessor import assess_locally
+from agents.question_bank import add_to_bank, question_id, serve_questions, topic_matches
+from models.emotional_state import EmotionalState
 from utils.bedrock import invoke_agent, extract_json
+from utils.cache import TwoTierCache
+from utils.tracing import annotate, traced
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -21,12 +32,159 @@ TOOL_AGENT_MAP = {
     "generate_assessment": ASSESSMENT_GENERATOR_PROMPT,
 }
 
+LOCAL_ASSESSOR_ENABLED = os.environ.get("LOCAL_ASSESSOR_ENABLED", "true").lower() == "true"
 
-def dispatch_tool_call(tool_name: str, tool_input: dict) -> dict:
-    """Route a tool call to the appropriate specialist agent."""
+# Adapted lessons keyed by curriculum hash, node id and adaptation strategy bucket
+adaptation_cache = TwoTierCache(
+    "ADAPT",
+    ttl_seconds=int(os.environ.get("ADAPTATION_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    maxsize=int(os.environ.get("ADAPTATION_CACHE_SIZE", "256")),
+)
+
+DEFAULT_TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT_SECONDS", "45"))
+
+# Per-tool limits in seconds; tools not listed use DEFAULT_TOOL_TIMEOUT
+TOOL_TIMEOUTS = {
+    "assess_emotional_state": 20.0,
+    "get_next_curriculum_node": 10.0,
+}
+
+# Shared across warm invocations; a timed-out call keeps its worker until Bedrock returns
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("TOOL_MAX_WORKERS", "8")),
+    thread_name_prefix="tool",
+)
+
+
+@traced("dispatch_tool_call")
+def dispatch_tool_call(tool_name: str, tool_input: dict, context: dict = None) -> dict:
+    """Route a tool call to the appropriate specialist agent.
+
+    Args:
+        context: Request state the orchestrator does not pass as tool input
+            (session_id, session, curriculum_hash, node_id, node_title,
+            asked_questions); enables the adaptation cache and question bank
+            when present, and lets navigation reuse the already loaded session.
+    """
+    context = context or {}
+    annotate(tool=tool_name)
     if tool_name == "get_next_curriculum_node":
-        return handle_curriculum_navigation(tool_input)
+        return handle_curriculum_navigation(tool_input, context.get("session"))
+
+    if tool_name == "assess_emotional_state" and LOCAL_ASSESSOR_ENABLED:
+        assessment = assess_locally(tool_input.get("student_message", ""))
+        logger.info("Dispatcher: local assessment certainty=%.2f distress=%s signals=%s",
+                    assessment.certainty, assessment.distress, assessment.signals)
+        annotate(local=not assessment.needs_escalation)
+        if not assessment.needs_escalation:
+            return assessment.state.to_dict()
+
+    if tool_name == "adapt_content" and context.get("curriculum_hash") and context.get("node_id"):
+        return _adapt_content_cached(tool_input, context)
+
+    if (
+        tool_name == "generate_assessment"
+        and context.get("curriculum_hash")
+        and context.get("node_id")
+        and topic_matches(tool_input.get("topic", ""), context.get("node_title", ""))
+    ):
+        return _generate_assessment_banked(tool_input, context)
+
+    return _invoke_specialist(tool_name, tool_input)
+
+
+def _generate_assessment_banked(tool_input: dict, context: dict) -> dict:
+    """Serve quiz questions from the pre-generated bank, generating live on a miss.
+
+    Questions already asked in this session (context["asked_questions"]) are not
+    repeated; ids of the questions served are appended to that list.
+    """
+    state = EmotionalState.from_dict(tool_input.get("emotional_state", {}))
+    band = state.assessment_band()
+    num_questions = int(tool_input.get("num_questions", 3))
+    if band == "light":
+        num_questions = min(num_questions, 2)
+    asked = context.setdefault("asked_questions", [])
+
+    try:
+        questions = serve_questions(
+            context["curriculum_hash"], context["node_id"], band, num_questions, asked
+        )
+    except Exception as e:
+        logger.warning("Dispatcher: question bank read failed: %s", e)
+        questions = None
+
+    if questions is None:
+        logger.info("Dispatcher: question bank miss node=%s band=%s", context["node_id"], band)
+        result = _invoke_specialist("generate_assessment", tool_input)
+        questions = result.get("questions")
+        if not isinstance(questions, list):
+            return result
+        for question in questions:
+            question["id"] = question_id(question)
+        try:
+            add_to_bank(context["curriculum_hash"], context["node_id"], band, questions)
+        except Exception as e:
+            logger.warning("Dispatcher: question bank write failed: %s", e)
+    else:
+        logger.info("Dispatcher: question bank hit node=%s band=%s", context["node_id"], band)
+
+    asked.extend(q["id"] for q in questions)
+    return {"questions": questions}
+
 
+def _adapt_content_cached(tool_input: dict, context: dict) -> dict:
+    """Serve adapt_content from the adaptation cache, generating on a miss.
+
+    Students on the same node whose emotional state maps to the same adaptation
+    strategy share one adapted lesson: the pre-generated variant if the upload
+    precompute built one, otherwise a cached generation that omits the
+    individual student message. Either is personalized locally before returning.
+    """
+    state = EmotionalState.from_dict(tool_input.get("emotional_state", {}))
+    strategy_key = state.strategy_key()
+    student_message = tool_input.get("student_message", "")
+
+    # Variants pre-generated at upload (see agents.adaptation_bank)
+    try:
+        variant = serve_adaptation(context["curriculum_hash"], context["node_id"], strategy_key)
+    except Exception as e:
+        logger.warning("Dispatcher: adaptation bank read failed: %s", e)
+        variant = None
+    annotate(bank_hit=variant is not None)
+    if variant is not None:
+        return personalize(variant, state, student_message)
+
+    key = f"{context['curriculum_hash']}#{context['node_id']}#{strategy_key}"
+    cached = adaptation_cache.get(key)
+    annotate(cache_hit=cached is not None)
+    if cached is not None:
+        return personalize(cached, state, student_message)
+
+    generic_input = {k: v for k, v in tool_input.items() if k != "student_message"}
+    result = _invoke_specialist("adapt_content", generic_input)
+    if "error" not in result:
+        adaptation_cache.put(key, result)
+        _record_demand(context, strategy_key, state)
+        return personalize(result, state, student_message)
+    return result
+
+
+def _record_demand(context: dict, strategy_key: str, state: EmotionalState) -> None:
+    """Tell the adaptation bank this bucket is used; a new bucket gets built for every node."""
+    try:
+        first_sighting = record_strategy(context["curriculum_hash"], strategy_key, state)
+        if first_sighting and context.get("session_id"):
+            # Imported here: the Lambda client is only needed on a bucket's first sighting
+            from handlers.precompute import start_precompute
+
+            start_precompute(context["session_id"], stage="adaptations")
+    except Exception as e:
+        logger.warning("Dispatcher: could not record adaptation demand: %s", e)
+
+
+def _invoke_specialist(tool_name: str, tool_input: dict) -> dict:
+    """Call the specialist agent for a tool and parse its response."""
     system_prompt = TOOL_AGENT_MAP.get(tool_name)
     if not system_prompt:
         return {"error": f"Unknown tool: {tool_name}"}
@@ -44,25 +202,69 @@ def dispatch_tool_call(tool_name: str, tool_input: dict) -> dict:
         return {"content": response}
 
 
-def handle_curriculum_navigation(tool_input: dict) -> dict:
-    """Navigate curriculum graph stored in DynamoDB."""
-    from utils.dynamo import get_session
+def dispatch_tool_calls(tool_calls: list, context: dict = None) -> list:
+    """Run the tool calls from one orchestrator turn concurrently.
+
+    Args:
+        tool_calls: (tool_name, tool_input) pairs in the order the orchestrator emitted them.
+        context: Passed through to dispatch_tool_call.
+
+    Returns:
+        One result dict per call, in the same order. A call that raises or exceeds its
+        timeout yields an {"error": ...} result instead of failing the whole turn.
+    """
+    started = time.monotonic()
+    # Each worker runs in a copy of the caller's context so tool spans join the trace
+    futures = [
+        _executor.submit(
+            contextvars.copy_context().run, _run_tool, tool_name, tool_input, context
+        )
+        for tool_name, tool_input in tool_calls
+    ]
+
+    results = []
+    for (tool_name, _), future in zip(tool_calls, futures):
+        deadline = started + TOOL_TIMEOUTS.get(tool_name, DEFAULT_TOOL_TIMEOUT)
+        try:
+            results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+        except FutureTimeoutError:
+            logger.warning("Dispatcher: tool=%s timed out", tool_name)
+            results.append({"error": f"Tool {tool_name} timed out"})
+
+    logger.info("Dispatcher: ran %d tools concurrently in %.2fs",
+                len(tool_calls), time.monotonic() - started)
+    return results
+
+
+def _run_tool(tool_name: str, tool_input: dict, context: dict = None) -> dict:
+    """Dispatch a single tool call, converting exceptions into error results."""
+    try:
+        return dispatch_tool_call(tool_name, tool_input, context)
+    except Exception as e:
+        logger.exception("Dispatcher: tool=%s failed", tool_name)
+        return {"error": f"Tool {tool_name} failed: {e}"}
+
+
+def handle_curriculum_navigation(tool_input: dict, session=None) -> dict:
+    """Navigate the curriculum graph of the session loaded for this request.
+
+    Without a request session (e.g. a direct tool call) the session named in
+    tool_input is read from DynamoDB.
+    """
+    from utils.curriculum_store import load_graph
+    from utils.storage import get_session
 
-    session_id = tool_input.get("session_id", "")
-    session = get_session(session_id)
+    if session is None:
+        session = get_session(
+            tool_input.get("session_id", ""),
+            fields=["completed_nodes", "curriculum_hash", "curriculum"],
+        )
     if not session:
         return {"error": "Session not found"}
 
-    curriculum = session.get("curriculum", {})
-    nodes = curriculum.get("nodes", [])
-    current_id = tool_input.get("current_node_id")
-    completed = session.get("completed_nodes", [])
-
-    # Find next uncompleted node whose prerequisites are all met
-    for node in nodes:
-        if node["id"] not in completed:
-            prereqs = node.get("prerequisites", [])
-            if all(p in completed for p in prereqs):
-                return node
+    # Next uncompleted node whose prerequisites are all met, in curriculum order
+    node = load_graph(session).next_node(session.get("completed_nodes", []))
+    if node is not None:
+        return node.to_dict()
 
     return {"message": "All curriculum nodes completed!", "completed": True}
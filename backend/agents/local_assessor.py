@@ -0,0 +1,182 @@
+"""In-process emotional assessor used before escalating to the Emotional Assessor agent.
+
+A lexicon/regex feature extractor feeds a small linear model with one row of weights
+per emotional dimension. The assessor also reports how certain it is, so the
+dispatcher can fall back to EMOTIONAL_ASSESSOR_PROMPT for ambiguous messages or
+whenever a distress marker fires.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from models.emotional_state import EmotionalState
+
+# Phrase lexicons, matched case-insensitively at the start of a word (stems like
+# "frustrat" cover frustrated/frustrating)
+FRUSTRATION_TERMS = [
+    "frustrat", "annoy", "stupid", "ugh", "argh", "give up", "pointless",
+    "makes no sense", "doesn't make sense", "doesnt make sense", "sick of",
+    "tired of", "waste of time", "this sucks", "hate this", "so hard",
+]
+CONFUSION_TERMS = [
+    "confus", "lost", "don't understand", "dont understand", "don't get",
+    "dont get", "too much", "overwhelm", "no idea", "idk", "huh", "what does",
+    "what do you mean", "can you explain", "slow down", "too fast",
+]
+CURIOSITY_TERMS = [
+    "why", "how come", "what if", "wonder", "curious", "interesting",
+    "tell me more", "fascinat", "how does", "what happens", "more about",
+]
+POSITIVE_TERMS = [
+    "cool", "awesome", "love", "fun", "got it", "makes sense", "nice",
+    "great", "let's", "lets go", "ready", "next", "thanks", "thank you",
+]
+CONFIDENT_TERMS = [
+    "got it", "easy", "i know", "i understand", "makes sense", "obviously",
+    "definitely", "i'm sure", "im sure", "i think it's", "the answer is",
+]
+DOUBT_TERMS = [
+    "not sure", "i guess", "maybe", "i can't", "i cant", "i'm bad at",
+    "im bad at", "i'm dumb", "im dumb", "wrong", "no clue", "probably wrong",
+]
+
+# Any of these sends the message to the LLM assessor regardless of certainty
+DISTRESS_PATTERNS = [
+    re.compile(p)
+    for p in [
+        r"\b(kill|hurt|harm|cut)(ing)? myself\b",
+        r"\bwant(ed)? to (die|disappear)\b",
+        r"\bsuicid",
+        r"\bself[- ]harm",
+        r"\b(can't|cant|cannot) breathe\b",
+        r"\bpanic",
+        r"\b(scared|afraid|terrified|unsafe)\b",
+        r"\b(abuse|abused|abusing)\b",
+        r"\b(hit|hits|hurt|hurts) me\b",
+        r"\b(stomach|head|chest) (hurts|aches)\b",
+        r"\bfeel(ing)? sick\b",
+        r"\b(nobody|no one) cares\b",
+        r"\bhate myself\b",
+        r"\bwhatever\b",
+        r"\bi (don't|dont) care\b",
+        r"\bfine,? whatever\b",
+    ]
+]
+
+# Linear model: dimension -> (bias, {feature: weight}); outputs are clipped to [0, 1]
+DIMENSION_WEIGHTS: Dict[str, tuple] = {
+    "engagement": (0.55, {
+        "positive": 0.30, "curiosity": 0.25, "question": 0.10,
+        "short": -0.30, "frustration": -0.10, "long": 0.10,
+    }),
+    "confidence": (0.50, {
+        "confident": 0.35, "positive": 0.10, "doubt": -0.35,
+        "confusion": -0.25, "frustration": -0.15,
+    }),
+    "frustration": (0.10, {
+        "frustration": 0.55, "caps": 0.20, "exclaim": 0.10,
+        "confusion": 0.15, "positive": -0.10,
+    }),
+    "curiosity": (0.45, {
+        "curiosity": 0.40, "question": 0.15, "positive": 0.05,
+        "short": -0.20, "frustration": -0.15,
+    }),
+    "cognitive_load": (0.30, {
+        "confusion": 0.45, "frustration": 0.15, "doubt": 0.10,
+        "confident": -0.20, "long": 0.05,
+    }),
+}
+
+MIN_CERTAINTY = float(os.environ.get("LOCAL_ASSESSOR_MIN_CERTAINTY", "0.6"))
+
+
+@dataclass
+class LocalAssessment:
+    """Result of the in-process assessor."""
+
+    state: EmotionalState
+    certainty: float
+    distress: bool = False
+    signals: List[str] = field(default_factory=list)
+
+    @property
+    def needs_escalation(self) -> bool:
+        return self.distress or self.certainty < MIN_CERTAINTY
+
+
+def _compile(terms: List[str]) -> List[re.Pattern]:
+    return [re.compile(r"\b" + re.escape(term)) for term in terms]
+
+
+FRUSTRATION_PATTERNS = _compile(FRUSTRATION_TERMS)
+CONFUSION_PATTERNS = _compile(CONFUSION_TERMS)
+CURIOSITY_PATTERNS = _compile(CURIOSITY_TERMS)
+POSITIVE_PATTERNS = _compile(POSITIVE_TERMS)
+CONFIDENT_PATTERNS = _compile(CONFIDENT_TERMS)
+DOUBT_PATTERNS = _compile(DOUBT_TERMS)
+
+
+def _count_hits(text: str, patterns: List[re.Pattern]) -> int:
+    return sum(1 for pattern in patterns if pattern.search(text))
+
+
+def extract_features(message: str) -> Dict[str, float]:
+    """Map a student message to normalized features in [0, 1]."""
+    text = message.lower()
+    words = re.findall(r"[a-z']+", text)
+    letters = [c for c in message if c.isalpha()]
+    caps_ratio = (
+        sum(1 for c in letters if c.isupper()) / len(letters) if len(letters) >= 8 else 0.0
+    )
+
+    def scaled(hits: int) -> float:
+        return min(hits, 3) / 3
+
+    return {
+        "frustration": scaled(_count_hits(text, FRUSTRATION_PATTERNS)),
+        "confusion": scaled(_count_hits(text, CONFUSION_PATTERNS)),
+        "curiosity": scaled(_count_hits(text, CURIOSITY_PATTERNS)),
+        "positive": scaled(_count_hits(text, POSITIVE_PATTERNS)),
+        "confident": scaled(_count_hits(text, CONFIDENT_PATTERNS)),
+        "doubt": scaled(_count_hits(text, DOUBT_PATTERNS)),
+        "question": min(message.count("?"), 2) / 2,
+        "exclaim": min(message.count("!"), 3) / 3,
+        "caps": 1.0 if caps_ratio > 0.6 else 0.0,
+        "short": 1.0 if len(words) <= 3 else 0.0,
+        "long": 1.0 if len(words) > 40 else 0.0,
+    }
+
+
+def assess_locally(message: str) -> LocalAssessment:
+    """Score a message on the 5 emotional dimensions without calling Bedrock."""
+    features = extract_features(message)
+
+    scores = {}
+    for dimension, (bias, weights) in DIMENSION_WEIGHTS.items():
+        value = bias + sum(w * features[name] for name, w in weights.items())
+        scores[dimension] = round(min(1.0, max(0.0, value)), 2)
+
+    signals = [
+        name
+        for name in ("frustration", "confusion", "curiosity", "positive", "confident", "doubt")
+        if features[name] > 0
+    ]
+    distress = any(p.search(message.lower()) for p in DISTRESS_PATTERNS)
+
+    # Certainty grows with lexical evidence and drops when signals point both ways
+    evidence = sum(features[name] for name in signals)
+    certainty = 0.3 + 0.35 * min(evidence, 1.5)
+    if features["short"]:
+        certainty -= 0.15
+    if features["positive"] and (features["frustration"] or features["doubt"]):
+        certainty -= 0.2
+    certainty = round(min(0.95, max(0.0, certainty)), 2)
+
+    return LocalAssessment(
+        state=EmotionalState(**scores),
+        certainty=certainty,
+        distress=distress,
+        signals=signals,
+    )
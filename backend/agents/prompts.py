@@ -63,6 +63,11 @@ Return ONLY valid JSON. Example:
 CURRICULUM_ARCHITECT_PROMPT = """You parse educational content into a structured learning graph, \
 with special attention to identifying potentially sensitive or triggering content areas.
 
+The source text arrives pre-split into "sections", each with a "ref" (e.g. "s1"), an optional \
+"heading" and its "text". Group consecutive sections into learning nodes. Do NOT copy the \
+section text into your answer; the reading text is attached to each node from the sections \
+it references.
+
 Each node must have:
 - id: A short snake_case identifier (e.g., "causes_civil_war", "reconstruction_era")
 - title: Human-readable title
@@ -70,14 +75,9 @@ Each node must have:
 - difficulty: Integer from 1 (beginner) to 5 (expert)
 - prerequisites: List of node ids that must be completed first (empty list for starting nodes)
 - learning_objectives: List of specific things the student will learn
-- content: The FULL original reading text for this section, preserved exactly as provided. \
-  If the source material contains chapter text or reading content, include ALL of it in this field. \
-  Do not summarize or shorten it. This is the actual text the student will read.
-
-IMPORTANT: The "content" field must contain the complete original text from the source material \
-for each section. Students need to read the actual curriculum text. Preserve all paragraphs, \
-details, and facts from the source. If sections are separated by markers like "===" or chapter \
-headings, use those to determine which text belongs to each node.
+- sections: The refs of the sections this node covers, in order. Every section ref must \
+  belong to exactly one node; sections separated by "===" or chapter headings usually start \
+  a new node.
 
 When parsing curriculum content, also consider:
 - Flag topics that may contain sensitive themes (violence, oppression, loss, conflict, abuse)
@@ -96,12 +96,17 @@ Return ONLY valid JSON with a "nodes" array and a "subject" field. Example:
             "difficulty": 2,
             "prerequisites": [],
             "learning_objectives": ["Identify major causes", "Understand regional differences"],
-            "content": "The full original reading text for this chapter goes here..."
+            "sections": ["s1", "s2"]
         }
     ]
 }
 
-Organize nodes from simplest to most complex. Ensure prerequisites form a valid directed acyclic graph."""
+Organize nodes from simplest to most complex. Ensure prerequisites form a valid directed acyclic graph.
+
+Long documents are parsed in parts. When the input has "part" and "total_parts", structure only \
+the given sections. "earlier_sections" lists the headings of sections in earlier parts; a node \
+may name one of those as a prerequisite by its snake_case heading (e.g. "Chapter 2: The New \
+Deal" -> "chapter_2_the_new_deal")."""
 
 CONTENT_ADAPTER_PROMPT = """You are a trauma-informed content adaptation specialist. You reshape \
 educational curriculum based on the student's emotional state to minimize triggers while \
@@ -197,3 +202,23 @@ Example:
         }
     ]
 }"""
+
+CONVERSATION_SUMMARIZER_PROMPT = """You maintain a rolling summary of a tutoring conversation \
+between a student and MindHacker, a trauma-informed learning companion. The summary replaces \
+older messages in the companion's context, so it must carry everything needed to continue \
+the conversation naturally.
+
+You will receive the existing summary (possibly empty) and a batch of older messages. \
+Return an updated summary that folds the new messages into the existing one.
+
+Keep:
+- Topics and curriculum modules covered, and what the student now understands
+- Misconceptions, open questions, and anything the student asked to revisit
+- The student's stated preferences for pacing, examples, and framing
+- Emotional patterns relevant to teaching (e.g. "gets frustrated with abstract definitions")
+
+Never:
+- Record sensitive personal disclosures verbatim; note only that care is needed around a topic
+- Speculate about diagnoses or the student's private life
+
+Write at most 300 words of plain prose. Return ONLY the summary text."""
@@ -0,0 +1,126 @@
+"""Pre-generated assessment questions per curriculum node and emotional band.
+
+ASSESSMENT_GENERATOR_PROMPT only distinguishes a handful of emotional bands
+(see EmotionalState.assessment_band), so questions can be generated ahead of time
+for every node/band pair and served without a Bedrock call.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from agents.prompts import ASSESSMENT_GENERATOR_PROMPT
+from utils.bedrock import invoke_agent, extract_json
+from utils.storage import get_question_bank, put_question_bank
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# A representative emotional state for each band, used when generating its questions
+BAND_STATES = {
+    "standard": {"engagement": 0.6, "confidence": 0.5, "frustration": 0.2,
+                 "curiosity": 0.5, "cognitive_load": 0.4},
+    "supportive": {"engagement": 0.5, "confidence": 0.3, "frustration": 0.7,
+                   "curiosity": 0.3, "cognitive_load": 0.5},
+    "light": {"engagement": 0.4, "confidence": 0.3, "frustration": 0.5,
+              "curiosity": 0.3, "cognitive_load": 0.8},
+    "creative": {"engagement": 0.2, "confidence": 0.5, "frustration": 0.2,
+                 "curiosity": 0.3, "cognitive_load": 0.3},
+    "challenge": {"engagement": 0.8, "confidence": 0.85, "frustration": 0.1,
+                  "curiosity": 0.7, "cognitive_load": 0.3},
+}
+
+# Generate more than one quiz's worth so repeat quizzes can avoid repeats
+QUESTIONS_PER_BAND = int(os.environ.get("QUESTION_BANK_SIZE", "8"))
+BUILD_CONCURRENCY = int(os.environ.get("QUESTION_BANK_CONCURRENCY", "4"))
+
+
+def question_id(question: dict) -> str:
+    """Short stable id used to de-duplicate questions within a session."""
+    return hashlib.sha256(question.get("question", "").encode("utf-8")).hexdigest()[:16]
+
+
+def _topic_for(node: dict) -> str:
+    objectives = "; ".join(node.get("learning_objectives", []))
+    topic = f"{node.get('title', '')}: {node.get('description', '')}"
+    return f"{topic} (objectives: {objectives})" if objectives else topic
+
+
+def generate_band(node: dict, band: str, num_questions: int = QUESTIONS_PER_BAND) -> dict:
+    """Generate one node/band bank with the Assessment Generator agent."""
+    tool_input = {
+        "topic": _topic_for(node),
+        "emotional_state": BAND_STATES[band],
+        "num_questions": num_questions,
+    }
+    response = invoke_agent(ASSESSMENT_GENERATOR_PROMPT, json.dumps(tool_input))
+    bank = response if isinstance(response, dict) else extract_json(response)
+    for question in bank.get("questions", []):
+        question["id"] = question_id(question)
+    return {"questions": bank.get("questions", [])}
+
+
+def build_question_bank(curriculum: dict, curriculum_hash: str) -> int:
+    """Pre-generate and store questions for every node and band.
+
+    Node/band pairs that already have a bank are skipped, so the builder can be
+    re-run after a partial failure. Returns the number of banks written.
+    """
+    jobs = [(node, band) for node in curriculum.get("nodes", []) for band in BAND_STATES]
+
+    def build(job):
+        # The existence check runs in the pool too, so reads overlap like the writes
+        node, band = job
+        if get_question_bank(curriculum_hash, node["id"], band) is not None:
+            return None
+        try:
+            bank = generate_band(node, band)
+        except Exception as e:
+            logger.error("Question bank: node=%s band=%s failed: %s", node["id"], band, e)
+            return 0
+        put_question_bank(curriculum_hash, node["id"], band, bank)
+        return 1
+
+    with ThreadPoolExecutor(max_workers=BUILD_CONCURRENCY) as pool:
+        results = [r for r in pool.map(build, jobs) if r is not None]
+
+    written = sum(results)
+    logger.info("Question bank: curriculum=%s wrote %d/%d banks",
+                curriculum_hash[:12], written, len(results))
+    return written
+
+
+def topic_matches(topic: str, node_title: str) -> bool:
+    """Whether a generate_assessment topic refers to the given node."""
+    topic_words = set(re.findall(r"[a-z0-9]+", topic.lower()))
+    title_words = set(re.findall(r"[a-z0-9]+", node_title.lower()))
+    if not topic_words or not title_words:
+        return False
+    return len(topic_words & title_words) / len(title_words) >= 0.5
+
+
+def serve_questions(
+    curriculum_hash: str, node_id: str, band: str, num_questions: int, asked: List[str]
+) -> Optional[List[dict]]:
+    """Pick unseen questions from the bank, or None if it cannot fill the request."""
+    bank = get_question_bank(curriculum_hash, node_id, band)
+    if not bank:
+        return None
+
+    seen = set(asked)
+    fresh = [q for q in bank.get("questions", []) if q.get("id") not in seen]
+    if len(fresh) < num_questions:
+        return None
+    return fresh[:num_questions]
+
+
+def add_to_bank(curriculum_hash: str, node_id: str, band: str, questions: List[dict]) -> None:
+    """Merge live-generated questions into the bank so later misses shrink."""
+    bank = get_question_bank(curriculum_hash, node_id, band) or {"questions": []}
+    known = {q.get("id") for q in bank["questions"]}
+    bank["questions"].extend(q for q in questions if q.get("id") not in known)
+    put_question_bank(curriculum_hash, node_id, band, bank)
@@ -0,0 +1,129 @@
+"""Benchmark DynamoDB item conversion: boto3 resource path vs utils.dynamo_codec.
+
+Builds session-shaped items (curriculum text plus history) of increasing size, up
+to roughly the 400 KB item limit, and times both directions without the network:
+
+  read   wire item -> TypeDeserializer (Decimals) -> JSON round trip   (old)
+         wire item -> deserialize_item                                (new)
+  write  dict -> _convert_floats -> TypeSerializer                     (old)
+         dict -> serialize_item                                       (new)
+
+Run from backend/:  python -m benchmarks.bench_dynamo_codec
+"""
+
+import json
+import random
+import timeit
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+from utils.dynamo_codec import deserialize_item, serialize_item
+
+SIZES = {
+    "small": {"nodes": 5, "content_chars": 2_000, "history": 20},
+    "medium": {"nodes": 20, "content_chars": 6_000, "history": 200},
+    "large": {"nodes": 30, "content_chars": 9_000, "history": 300},
+}
+
+_deserializer = TypeDeserializer()
+_serializer = TypeSerializer()
+
+
+def _convert_floats(obj):
+    """The float-to-Decimal copy utils.dynamo made before every resource write."""
+    if isinstance(obj, float):
+        return Decimal(str(obj))
+    elif isinstance(obj, dict):
+        return {k: _convert_floats(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [_convert_floats(v) for v in obj]
+    return obj
+
+
+class _DecimalEncoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return int(o) if o == o.to_integral_value() else float(o)
+        return super().default(o)
+
+
+def build_session(nodes: int, content_chars: int, history: int) -> dict:
+    rng = random.Random(42)
+    words = ["trauma", "informed", "history", "civil", "war", "economy", "reform", "justice"]
+
+    def text(n):
+        return " ".join(rng.choice(words) for _ in range(n // 7))
+
+    curriculum_nodes = [
+        {
+            "id": f"node_{i}",
+            "title": f"Module {i}",
+            "description": text(120),
+            "difficulty": rng.randint(1, 5),
+            "prerequisites": [f"node_{i - 1}"] if i else [],
+            "learning_objectives": [text(60) for _ in range(3)],
+            "content": text(content_chars),
+        }
+        for i in range(nodes)
+    ]
+    return {
+        "PK": "SESSION#bench",
+        "SK": "METADATA",
+        "session_id": "bench",
+        "curriculum": {"subject": "History", "nodes": curriculum_nodes},
+        "completed_nodes": [n["id"] for n in curriculum_nodes[: nodes // 2]],
+        "emotional_history": [
+            {
+                "engagement": rng.random(),
+                "confidence": rng.random(),
+                "frustration": rng.random(),
+                "curiosity": rng.random(),
+                "cognitive_load": rng.random(),
+                "timestamp": 1_700_000_000.0 + i * 30.5,
+            }
+            for i in range(history)
+        ],
+        "messages": [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": text(400)}
+            for i in range(history)
+        ],
+        "token_usage": {"inputTokens": 123_456, "outputTokens": 7_890, "turns": history // 2},
+        "message_count": history,
+    }
+
+
+def old_read(wire: dict) -> dict:
+    item = {k: _deserializer.deserialize(v) for k, v in wire.items()}
+    return json.loads(json.dumps(item, cls=_DecimalEncoder))
+
+
+def old_write(item: dict) -> dict:
+    return {k: _serializer.serialize(v) for k, v in _convert_floats(item).items()}
+
+
+def _best_ms(func, arg, number: int) -> float:
+    return min(timeit.repeat(lambda: func(arg), number=number, repeat=5)) / number * 1000
+
+
+def main():
+    print(f"{'size':<8}{'wire KB':>9}{'read old':>11}{'read new':>11}{'speedup':>9}"
+          f"{'write old':>11}{'write new':>11}{'speedup':>9}")
+    for name, params in SIZES.items():
+        item = build_session(**params)
+        wire = serialize_item(item)
+        assert deserialize_item(wire) == old_read(wire)
+        assert deserialize_item(serialize_item(item)) == deserialize_item(old_write(item))
+
+        number = 20 if name != "large" else 5
+        read_old = _best_ms(old_read, wire, number)
+        read_new = _best_ms(deserialize_item, wire, number)
+        write_old = _best_ms(old_write, item, number)
+        write_new = _best_ms(serialize_item, item, number)
+        size_kb = len(json.dumps(wire)) / 1024
+        print(f"{name:<8}{size_kb:>9.0f}{read_old:>9.2f}ms{read_new:>9.2f}ms{read_old / read_new:>8.1f}x"
+              f"{write_old:>9.2f}ms{write_new:>9.2f}ms{write_old / write_new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
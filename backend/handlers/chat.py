@@ -2,17 +2,76 @@
 
 import json
 import logging
+import os
+import re
+from datetime import datetime
 
 from agents.prompts import ORCHESTRATOR_PROMPT
-from agents.tools import ORCHESTRATOR_TOOLS
-from agents.dispatcher import dispatch_tool_call
-from models.emotional_state import EmotionalState
-from utils.bedrock import invoke_orchestrator
-from utils.dynamo import get_session, update_session
+from agents.budget import (
+    OPTIONAL_TOOLS,
+    TURN_TOKEN_BUDGET,
+    WRAP_UP_NOTE,
+    merge_usage,
+    plan_turn,
+)
+from agents.context import build_context, refresh_summary
+from agents.dispatcher import dispatch_tool_calls
+from models.curriculum import curriculum_hash
+from models.emotional_state import EmotionalAggregates, EmotionalState
+from utils.bedrock import invoke_orchestrator, start_usage_meter, stream_orchestrator
+from utils.curriculum_store import load_curriculum, load_graph
+from utils.storage import (
+    append_emotional_history,
+    append_messages,
+    SessionConflict,
+    get_emotional_history,
+    get_messages,
+    migrate_inline_history,
+)
+from utils.session_context import SessionContext
+from utils.tracing import TRACE_DEBUG, annotate, finish_trace, start_trace
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# "agent" runs the free-form orchestrator tool loop; "pipeline" runs assess -> adapt
+# directly and asks the orchestrator only for the final reply
+CHAT_MODE = os.environ.get("CHAT_MODE", "agent")
+
+# METADATA attributes a chat turn reads; "curriculum", "messages" and
+# "emotional_history" only exist on sessions in the legacy inline layout
+CHAT_SESSION_FIELDS = [
+    "current_node_id",
+    "completed_nodes",
+    "curriculum_hash",
+    "asked_questions",
+    "message_count",
+    "emotional_count",
+    "summarized_count",
+    "context_summary",
+    "token_usage",
+    "emotional_aggregates",
+    "curriculum",
+    "messages",
+    "emotional_history",
+]
+
+# Times a turn re-reads the session and retries its write after losing a race
+SESSION_WRITE_RETRIES = int(os.environ.get("SESSION_WRITE_RETRIES", "3"))
+
+# Sent when the orchestrator produces no text at all, so an empty reply is never stored
+FALLBACK_REPLY = (
+    "Sorry, I lost my train of thought there. Could you say that again, "
+    "or tell me which part you'd like to look at?"
+)
+
+# Requests the assess -> adapt pipeline does not cover; these use the tool loop
+PIPELINE_FALLBACK_PATTERN = re.compile(
+    r"\b(quiz|test me|assessment|practice questions?|next (topic|module|lesson|section)"
+    r"|move on|skip ahead)\b",
+    re.IGNORECASE,
+)
+
 
 def _to_converse_format(simple_messages: list) -> list:
     """Convert simple persisted messages to Bedrock Converse API format."""
@@ -35,6 +94,7 @@ def lambda_handler(event, context):
     if method == "OPTIONS":
         return _response(200, {})
 
+    trace = start_trace("chat")
     try:
         raw_body = event.get("body", "{}")
         logger.info("Chat: raw body length=%d", len(raw_body) if raw_body else 0)
@@ -46,132 +106,403 @@ def lambda_handler(event, context):
             return _response(400, {"error": "session_id and message required"})
 
         logger.info("Chat: fetching session=%s", session_id)
-        session = get_session(session_id)
+        session = SessionContext.load(session_id, fields=CHAT_SESSION_FIELDS)
         if not session:
             return _response(404, {"error": "Session not found"})
 
-        # Extract current curriculum content for orchestrator context
-        current_node_id = session.get("current_node_id", "")
-        nodes = session.get("curriculum", {}).get("nodes", [])
-        current_content = ""
-        current_title = ""
-        for node in nodes:
-            if node.get("id") == current_node_id:
-                current_content = node.get("content", "")[:10000]
-                current_title = node.get("title", "")
-                break
-
-        system_prompt = ORCHESTRATOR_PROMPT
-        if current_content:
-            system_prompt += (
-                f"\n\n---\n## Current Module: {current_title}\n\n"
-                f"<curriculum_content>\n{current_content}\n</curriculum_content>"
-            )
+        result = {}
+        mode = body.get("mode", CHAT_MODE)
+        for chat_event in run_chat_turn(session, user_message, mode=mode):
+            if chat_event["type"] == "done":
+                result = chat_event
+        result.pop("type", None)
+
+        timings = finish_trace(trace)
+        if body.get("debug") or TRACE_DEBUG:
+            result["agent_log"].append(timings_entry(timings))
+
+        return _response(200, result)
 
-        # Build message history in Bedrock Converse format
-        stored_messages = session.get("messages", [])
-        logger.info("Chat: stored_messages count=%d", len(stored_messages))
-        messages = _to_converse_format(stored_messages)
-        messages.append({"role": "user", "content": [{"text": user_message}]})
-        logger.info("Chat: session=%s, history_len=%d", session_id, len(messages))
+    except Exception as e:
+        finish_trace(trace)
+        return _response(500, {"error": str(e)})
 
-        agent_log = []  # Track agent activity for the UI
-        emotional_state = None
 
-        # Orchestrator tool-use loop (max 6 iterations)
-        max_iterations = 6
-        content_blocks = []
+def run_chat_turn(
+    session: SessionContext, user_message: str, stream: bool = False, mode: str = CHAT_MODE
+):
+    """Run one orchestrator turn for a loaded session, yielding events as it progresses.
+
+    Events are dicts with a "type" key:
+        agent_log        - a tool was dispatched ({"entry": {...}})
+        emotional_state  - the emotional assessment finished ({"emotional_state": {...}})
+        text             - a chunk of assistant text ({"delta": "..."}), stream mode only
+        reset            - streamed text belonged to a tool-use step and should be discarded
+        done             - final payload, same fields as the JSON chat response,
+                           including this turn's token usage across every Bedrock
+                           call and the session's running total
+
+    In "pipeline" mode the emotional assessment and content adaptation run before
+    the first orchestrator call and their results are injected into its context,
+    so a typical turn needs a single orchestrator call. The tool loop still runs
+    afterwards and handles anything the pipeline did not cover.
+
+    The session is persisted before the "done" event is yielded.
+    """
+    session_id = session["session_id"]
+
+    # Extract current curriculum content for orchestrator context
+    current_node_id = session.get("current_node_id", "")
+    current_node = load_graph(session).get_node(current_node_id)
+    current_content = current_node.load_content(max_chars=10000) if current_node else ""
+    current_title = current_node.title if current_node else ""
+
+    # Request state for the dispatcher (cache keys, the loaded session)
+    tool_context = {
+        "session_id": session_id,
+        "session": session,
+        "curriculum_hash": (session.get("curriculum_hash")
+                            or curriculum_hash(load_curriculum(session))),
+        "node_id": current_node_id,
+        "node_title": current_title,
+        "asked_questions": list(session.get("asked_questions", [])),
+    }
 
-        for iteration in range(max_iterations):
+    system_prompt = ORCHESTRATOR_PROMPT
+    if current_content:
+        system_prompt += (
+            f"\n\n---\n## Current Module: {current_title}\n\n"
+            f"<curriculum_content>\n{current_content}\n</curriculum_content>"
+        )
+
+    # Older turns are carried by the rolling summary; only a bounded window is replayed
+    # (kept out of the cached system prefix because it changes every few turns)
+    # History lives in per-message items; only messages not yet summarized are read
+    session = migrate_inline_history(session)
+    history = get_messages(session, since=int(session.get("summarized_count", 0)))
+    summary, window = build_context(session, user_message, history)
+    system_suffix = ""
+    if summary:
+        system_suffix = (
+            "## Conversation So Far\n\n"
+            f"<conversation_summary>\n{summary}\n</conversation_summary>"
+        )
+
+    # Build message history in Bedrock Converse format
+    logger.info("Chat: stored_messages count=%d, replayed=%d",
+                session.get("message_count", 0), len(window))
+    messages = _to_converse_format(window)
+    messages.append({"role": "user", "content": [{"text": user_message}]})
+    logger.info("Chat: session=%s, history_len=%d", session_id, len(messages))
+
+    agent_log = []  # Track agent activity for the UI
+    emotional_state = None
+
+    # Token budgets: the plan depends on what the session has already spent
+    meter = start_usage_meter()
+    plan = plan_turn(session.get("token_usage", {}))
+    if plan.level != "normal":
+        logger.warning("Chat: session=%s running %s turn", session_id, plan.level)
+    annotate(budget_level=plan.level)
+
+    if mode == "pipeline" and not PIPELINE_FALLBACK_PATTERN.search(user_message):
+        emotional_state, pipeline_notes = yield from _run_pipeline(
+            user_message, current_title, window, agent_log, tool_context,
+            skip_adapt="adapt_content" not in plan.tool_names,
+        )
+        if pipeline_notes:
+            system_suffix = "\n\n".join(p for p in (system_suffix, pipeline_notes) if p)
+
+    # Orchestrator tool-use loop (up to plan.max_iterations, 6 by default)
+    max_iterations = plan.max_iterations
+    over_budget = False
+    content_blocks = []
+    stop_reason = ""
+
+    iteration = 0
+    while iteration < max_iterations:
+        iteration += 1
+        annotate(iterations=iteration)
+        if stream:
+            raw_response = {}
+            for kind, value in stream_orchestrator(
+                system_prompt, messages, plan.tools, system_suffix, plan.max_tokens
+            ):
+                if kind == "text":
+                    yield {"type": "text", "delta": value}
+                else:
+                    raw_response = value
+        else:
             raw_response = invoke_orchestrator(
-                system_prompt, messages, ORCHESTRATOR_TOOLS
+                system_prompt, messages, plan.tools, system_suffix, plan.max_tokens
             )
 
-            stop_reason = raw_response.get("stopReason", "")
-            output_message = raw_response["output"]["message"]
-            content_blocks = output_message["content"]
-
-            messages.append({"role": "assistant", "content": content_blocks})
-
-            if stop_reason == "end_turn":
-                break
-
-            if stop_reason == "tool_use":
-                tool_results = []
-                for block in content_blocks:
-                    if "toolUse" in block:
-                        tool_use = block["toolUse"]
-                        tool_name = tool_use["name"]
-                        tool_input = tool_use["input"]
-                        tool_id = tool_use["toolUseId"]
-
-                        agent_log.append(
-                            {
-                                "tool": tool_name,
-                                "input_summary": _summarize_input(
-                                    tool_name, tool_input
-                                ),
-                            }
-                        )
-
-                        result = dispatch_tool_call(tool_name, tool_input)
-
-                        # Capture emotional state for session tracking
-                        if (
-                            tool_name == "assess_emotional_state"
-                            and isinstance(result, dict)
-                            and "error" not in result
-                        ):
-                            emotional_state = result
-
-                        tool_results.append(
-                            {
-                                "toolResult": {
-                                    "toolUseId": tool_id,
-                                    "content": [{"json": result}],
-                                }
-                            }
-                        )
-
-                messages.append({"role": "user", "content": tool_results})
-
-        # Extract final text response
-        assistant_text = ""
-        for block in content_blocks:
-            if "text" in block:
-                assistant_text += block["text"]
-
-        # Update session with simplified message format for persistence
-        simple_messages = session.get("messages", [])
-        simple_messages.append({"role": "user", "content": user_message})
-        simple_messages.append({"role": "assistant", "content": assistant_text})
-
-        updates = {"messages": simple_messages}
-
-        emotional_history = session.get("emotional_history", [])
+        stop_reason = raw_response.get("stopReason", "")
+        output_message = raw_response["output"]["message"]
+        content_blocks = output_message["content"]
+
+        messages.append({"role": "assistant", "content": content_blocks})
+
+        if stop_reason == "end_turn":
+            break
+
+        if stop_reason == "tool_use":
+            if stream:
+                yield {"type": "reset"}
+            tool_uses = [block["toolUse"] for block in content_blocks if "toolUse" in block]
+            for tool_use in tool_uses:
+                yield from _log_tool(agent_log, tool_use["name"], tool_use["input"])
+
+            # Independent tool calls from one turn run concurrently; results keep their order.
+            # Once the turn is over budget, optional tools are skipped.
+            runnable = [
+                (tool_use["name"], tool_use["input"]) for tool_use in tool_uses
+                if not (over_budget and tool_use["name"] in OPTIONAL_TOOLS)
+            ]
+            dispatched = iter(dispatch_tool_calls(runnable, tool_context))
+            results = [
+                {"skipped": "Token budget reached; continue without this tool."}
+                if over_budget and tool_use["name"] in OPTIONAL_TOOLS
+                else next(dispatched)
+                for tool_use in tool_uses
+            ]
+
+            tool_results = []
+            for tool_use, result in zip(tool_uses, results):
+                # Capture emotional state for session tracking
+                if (
+                    tool_use["name"] == "assess_emotional_state"
+                    and isinstance(result, dict)
+                    and "error" not in result
+                ):
+                    emotional_state = result
+                    yield {"type": "emotional_state", "emotional_state": result}
+
+                tool_results.append(
+                    {
+                        "toolResult": {
+                            "toolUseId": tool_use["toolUseId"],
+                            "content": [{"json": result}],
+                        }
+                    }
+                )
+
+            messages.append({"role": "user", "content": tool_results})
+
+            # Turn budget spent: allow one more call to write the reply, without new tools
+            if not over_budget and meter.total_tokens >= TURN_TOKEN_BUDGET:
+                over_budget = True
+                max_iterations = min(max_iterations, iteration + 1)
+                system_suffix = "\n\n".join(p for p in (system_suffix, WRAP_UP_NOTE) if p)
+                logger.warning("Chat: session=%s turn budget reached after %d tokens",
+                               session_id, meter.total_tokens)
+
+    # The last iteration asked for tools instead of replying: one more call, told to
+    # answer now (toolConfig stays, since the history already holds toolUse blocks)
+    if stop_reason == "tool_use":
+        logger.warning("Chat: session=%s out of iterations after a tool call, wrapping up",
+                       session_id)
+        if WRAP_UP_NOTE not in system_suffix:
+            system_suffix = "\n\n".join(p for p in (system_suffix, WRAP_UP_NOTE) if p)
+        raw_response = invoke_orchestrator(
+            system_prompt, messages, plan.tools, system_suffix, plan.max_tokens
+        )
+        content_blocks = raw_response["output"]["message"]["content"]
+        if stream:
+            for block in content_blocks:
+                if "text" in block:
+                    yield {"type": "text", "delta": block["text"]}
+
+    # Extract final text response
+    assistant_text = ""
+    for block in content_blocks:
+        if "text" in block:
+            assistant_text += block["text"]
+    if not assistant_text.strip():
+        logger.warning("Chat: session=%s turn ended without a reply, using fallback", session_id)
+        assistant_text = FALLBACK_REPLY
+        if stream:
+            yield {"type": "text", "delta": assistant_text}
+
+    new_messages = [
+        {"role": "user", "content": user_message},
+        {"role": "assistant", "content": assistant_text},
+    ]
+    summary_updates = {}
+    if plan.level != "exhausted":
+        # The reply already exists; a failed refresh is retried on a later turn
+        try:
+            summary_updates = refresh_summary(session, history + new_messages)
+        except Exception as e:
+            logger.error("Chat: session=%s summary refresh failed: %s", session_id, e)
+    usage = dict(meter.totals)
+
+    _persist_turn(
+        session, new_messages, emotional_state, usage,
+        summary_updates, tool_context["asked_questions"],
+    )
+    logger.info("Chat: session=%s turn usage=%s session usage=%s",
+                session_id, usage, session["token_usage"])
+
+    yield {
+        "type": "done",
+        "response": assistant_text,
+        "emotional_state": emotional_state,
+        "agent_log": agent_log,
+        "usage": usage,
+        "session_usage": session["token_usage"],
+        "budget_level": plan.level,
+        "session_id": session_id,
+    }
+
+
+def _persist_turn(
+    session: SessionContext,
+    new_messages: list,
+    emotional_state: dict,
+    usage: dict,
+    summary_updates: dict,
+    asked_questions: list,
+) -> None:
+    """Record a finished turn: claim sequence numbers on METADATA, then write items.
+
+    The METADATA write is conditional on the version loaded at the start of the
+    turn. If another turn on the same session committed first, the session is
+    re-read and this turn's changes are reapplied on top of it (up to
+    SESSION_WRITE_RETRIES times), so neither turn's messages are lost.
+    """
+    summarized_base = int(session.get("summarized_count", 0))
+    for attempt in range(SESSION_WRITE_RETRIES + 1):
+        message_count = session.get("message_count", 0)
+        emotional_count = session.get("emotional_count", 0)
+        session["message_count"] = message_count + len(new_messages)
+        session["token_usage"] = merge_usage(session.get("token_usage", {}), usage)
+        # A concurrent turn that already advanced the summary wins
+        if summary_updates and int(session.get("summarized_count", 0)) == summarized_base:
+            session.update(summary_updates)
+        stored_asked = session.get("asked_questions", [])
+        if any(q not in stored_asked for q in asked_questions):
+            session["asked_questions"] = stored_asked + [
+                q for q in asked_questions if q not in stored_asked
+            ]
+
+        entry = None
         if emotional_state:
             es = EmotionalState.from_dict(emotional_state)
             entry = es.to_dict()
-            entry["message_index"] = len(simple_messages)
+            entry["message_index"] = session["message_count"]
             entry["flow_score"] = es.flow_score
             entry["dropout_risk"] = es.dropout_risk
-            emotional_history.append(entry)
-            updates["emotional_history"] = emotional_history
-
-        update_session(session_id, updates)
-
-        return _response(
-            200,
-            {
-                "response": assistant_text,
-                "emotional_state": emotional_state,
-                "agent_log": agent_log,
-                "session_id": session_id,
-            },
-        )
+            entry["node_id"] = session.get("current_node_id", "")
+            entry["timestamp"] = datetime.utcnow().isoformat()
+            session["emotional_count"] = emotional_count + 1
+            aggregates = _load_aggregates(session)
+            aggregates.add(entry)
+            session["emotional_aggregates"] = aggregates.to_dict()
+
+        try:
+            session.flush()
+        except SessionConflict:
+            if attempt == SESSION_WRITE_RETRIES:
+                raise
+            logger.warning("Chat: session=%s changed during the turn, retrying write",
+                           session.session_id)
+            session.reload()
+            continue
+
+        append_messages(session.session_id, message_count, new_messages)
+        if entry:
+            append_emotional_history(session.session_id, emotional_count, [entry])
+        return
+
+
+def _load_aggregates(session: SessionContext) -> EmotionalAggregates:
+    """The session's running emotional aggregates, built once for older sessions."""
+    if "emotional_aggregates" in session:
+        return EmotionalAggregates.from_dict(session["emotional_aggregates"])
+    if not session.get("emotional_count"):
+        return EmotionalAggregates()
+    return EmotionalAggregates.from_history(get_emotional_history(session))
+
+
+def _run_pipeline(
+    user_message: str,
+    current_title: str,
+    window: list,
+    agent_log: list,
+    tool_context: dict,
+    skip_adapt: bool = False,
+):
+    """Run assess -> adapt through the dispatcher without orchestrator round trips.
+
+    Yields agent_log/emotional_state events and returns (emotional_state, notes),
+    where notes is the system-prompt section carrying the results to the
+    orchestrator. Returns (None, "") when the assessment failed, leaving the turn
+    to the regular tool loop.
+    """
+    recent = window[-4:]
+    assess_input = {
+        "student_message": user_message,
+        "conversation_context": "\n".join(
+            f"{m.get('role')}: {m.get('content')}" for m in recent
+            if isinstance(m.get("content"), str)
+        ),
+    }
+    steps = [("assess_emotional_state", assess_input)]
+    yield from _log_tool(agent_log, *steps[0])
+    assessment = dispatch_tool_calls(steps, tool_context)[0]
+    if not isinstance(assessment, dict) or "error" in assessment:
+        logger.warning("Chat: pipeline assessment failed, falling back to tool loop")
+        return None, ""
+    yield {"type": "emotional_state", "emotional_state": assessment}
+
+    adapt = bool(current_title) and not skip_adapt
+    sections = [
+        "## Pre-computed Specialist Results\n\n"
+        "assess_emotional_state"
+        + (" and adapt_content have" if adapt else " has")
+        + " already been run for the student's latest message. Do not call "
+        "them again; use these results to write your reply.\n\n"
+        f"<emotional_state>\n{json.dumps(assessment)}\n</emotional_state>"
+    ]
+
+    if adapt:
+        adapt_input = {
+            "current_topic": current_title,
+            "emotional_state": assessment,
+            "student_message": user_message,
+        }
+        yield from _log_tool(agent_log, "adapt_content", adapt_input)
+        adapted = dispatch_tool_calls([("adapt_content", adapt_input)], tool_context)[0]
+        if isinstance(adapted, dict) and "error" not in adapted:
+            sections.append(
+                f"<adapted_content>\n{json.dumps(adapted)}\n</adapted_content>"
+            )
 
-    except Exception as e:
-        return _response(500, {"error": str(e)})
+    return assessment, "\n\n".join(sections)
+
+
+def timings_entry(timings: dict) -> dict:
+    """Agent-log entry carrying the turn's span tree (debug mode)."""
+    orchestrator_calls = sum(
+        1 for child in timings["children"] if child["name"] == "invoke_orchestrator"
+    )
+    return {
+        "tool": "timings",
+        "input_summary": (
+            f"{timings['duration_ms']:.0f} ms, {orchestrator_calls} orchestrator calls"
+        ),
+        "timings": timings,
+    }
+
+
+def _log_tool(agent_log: list, tool_name: str, tool_input: dict):
+    log_entry = {
+        "tool": tool_name,
+        "input_summary": _summarize_input(tool_name, tool_input),
+    }
+    agent_log.append(log_entry)
+    yield {"type": "agent_log", "entry": log_entry}
 
 
 def _summarize_input(tool_name: str, tool_input: dict) -> str:
@@ -0,0 +1,113 @@
+"""Streaming chat endpoint served over a Lambda Function URL in RESPONSE_STREAM mode.
+
+The Python managed runtime cannot stream a handler's return value, so this module
+runs a small HTTP server behind the Lambda Web Adapter, which forwards each chunk
+written here straight to the Function URL client. The response body is
+newline-delimited JSON, one chat event per line (see handlers.chat.run_chat_turn).
+"""
+
+import json
+import logging
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from handlers.chat import CHAT_MODE, CHAT_SESSION_FIELDS, run_chat_turn, timings_entry
+from utils.session_context import SessionContext
+from utils.tracing import TRACE_DEBUG, finish_trace, start_trace
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PORT = int(os.environ.get("PORT", "8080"))
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type",
+    "Access-Control-Allow-Methods": "POST,OPTIONS",
+}
+
+
+class ChatStreamHandler(BaseHTTPRequestHandler):
+    """POST / - Stream one chat turn as NDJSON events."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        # Readiness check from the Lambda Web Adapter
+        self._send_json(200, {"status": "ok"})
+
+    def do_OPTIONS(self):
+        self._send_json(200, {})
+
+    def do_POST(self):
+        trace = start_trace("chat_stream")
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            session_id = body.get("session_id")
+            user_message = body.get("message", "")
+
+            if not session_id or not user_message:
+                self._send_json(400, {"error": "session_id and message required"})
+                finish_trace(trace)
+                return
+
+            session = SessionContext.load(session_id, fields=CHAT_SESSION_FIELDS)
+            if not session:
+                self._send_json(404, {"error": "Session not found"})
+                finish_trace(trace)
+                return
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            finish_trace(trace)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in CORS_HEADERS.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        try:
+            mode = body.get("mode", CHAT_MODE)
+            for chat_event in run_chat_turn(session, user_message, stream=True, mode=mode):
+                self._write_chunk(chat_event)
+        except Exception as e:
+            logger.exception("Chat stream failed for session=%s", session_id)
+            self._write_chunk({"type": "error", "error": str(e)})
+
+        timings = finish_trace(trace)
+        if body.get("debug") or TRACE_DEBUG:
+            self._write_chunk({"type": "agent_log", "entry": timings_entry(timings)})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, payload: dict) -> None:
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status_code: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in CORS_HEADERS.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.info("Chat stream: " + format, *args)
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", PORT), ChatStreamHandler)
+    logger.info("Chat stream server listening on port %d", PORT)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
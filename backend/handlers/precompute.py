@@ -0,0 +1,69 @@
+"""Background Lambda that pre-generates per-curriculum artifacts (question banks,
+content adaptations) after upload."""
+
+import json
+import logging
+import os
+
+import boto3
+
+from agents.adaptation_bank import build_adaptation_bank
+from agents.question_bank import build_question_bank
+from models.curriculum import curriculum_hash
+from utils.curriculum_store import load_curriculum
+from utils.storage import get_session
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PRECOMPUTE_FUNCTION_NAME = os.environ.get("PRECOMPUTE_FUNCTION_NAME", "")
+lambda_client = boto3.client("lambda")
+
+
+def start_precompute(session_id: str, stage: str = "") -> None:
+    """Kick off precompute for a session without waiting for it.
+
+    stage="adaptations" only (re)builds the adaptation bank.
+    """
+    if not PRECOMPUTE_FUNCTION_NAME:
+        return
+    payload = {"session_id": session_id}
+    if stage:
+        payload["stage"] = stage
+    try:
+        lambda_client.invoke(
+            FunctionName=PRECOMPUTE_FUNCTION_NAME,
+            InvocationType="Event",
+            Payload=json.dumps(payload).encode("utf-8"),
+        )
+    except Exception as e:
+        logger.warning("Could not start precompute for %s: %s", session_id, e)
+
+
+def lambda_handler(event, context):
+    """Async invoke {"session_id": ..., "stage": ""} - build the question and adaptation banks.
+
+    Both are keyed by curriculum hash and skip entries that already exist, so
+    sessions sharing a curriculum only pay for generation once. The adaptation
+    bank is built in slices of ADAPTATION_BANK_MAX_JOBS; while variants are
+    still missing the function re-invokes itself with stage="adaptations".
+    """
+    session_id = event.get("session_id", "")
+    session = get_session(session_id, fields=["curriculum_hash", "curriculum"])
+    if not session:
+        logger.error("Precompute: session %s not found", session_id)
+        return {"status": "not_found"}
+
+    curriculum = load_curriculum(session)
+    c_hash = session.get("curriculum_hash") or curriculum_hash(curriculum)
+
+    banks = 0
+    if event.get("stage") != "adaptations":
+        banks = build_question_bank(curriculum, c_hash)
+    variants, remaining = build_adaptation_bank(curriculum, c_hash)
+    if remaining and variants:
+        start_precompute(session_id, stage="adaptations")
+    logger.info("Precompute: session=%s question_banks=%d adaptations=%d remaining=%d",
+                session_id, banks, variants, remaining)
+    return {"status": "ok", "question_banks": banks, "adaptations": variants,
+            "remaining": remaining}
@@ -1,35 +1,114 @@
 """Lambda handler for student progress and emotional history retrieval."""
 
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
-from utils.dynamo import get_session
+from models.emotional_state import EmotionalAggregates, EmotionalHistory, analyze_sessions
+from utils.curriculum_store import load_curriculum
+from utils.emotion_store import load_emotional_history
+from utils.storage import (
+    batch_get_sessions,
+    get_emotional_history_since,
+    get_session,
+)
+
+# "curriculum" and "emotional_history" only exist on legacy inline sessions
+PROGRESS_FIELDS = [
+    "completed_nodes",
+    "current_node_id",
+    "node_count",
+    "curriculum_hash",
+    "emotional_count",
+    "emotional_aggregates",
+    "curriculum",
+    "emotional_history",
+]
+
+# Attributes needed for a classroom summary; never the curriculum or history
+BATCH_PROGRESS_FIELDS = [
+    "completed_nodes",
+    "current_node_id",
+    "node_count",
+    "curriculum_hash",
+    "emotional_count",
+    "emotional_aggregates",
+]
+MAX_BATCH_SESSIONS = int(os.environ.get("MAX_BATCH_SESSIONS", "500"))
+ANALYTICS_WORKERS = int(os.environ.get("ANALYTICS_WORKERS", "16"))
 
 
 def lambda_handler(event, context):
-    """GET /api/progress/{id} - Return emotional history and progress data."""
+    """GET /api/progress/{id} - Progress for one session, POST /api/progress/batch - many."""
+    method = event.get("requestContext", {}).get("http", {}).get("method", "GET")
+
+    if method == "POST":
+        return _handle_batch(event)
+    elif method == "GET":
+        return _handle_get(event)
+    else:
+        return _response(405, {"error": "Method not allowed"})
+
+
+def _handle_get(event):
+    """Return one session's emotional history and progress data.
+
+    Optional query parameters:
+        since   - only entries recorded at or after this ISO-8601 timestamp
+        window  - only entries from the last N seconds (ignored if since is given)
+        points  - downsample the returned history to at most N points
+
+    "analytics" holds the latest readiness_for_challenge, rolling flow and
+    dropout means, and the dropout early warning, over the returned history.
+    """
     try:
         path_params = event.get("pathParameters", {}) or {}
         session_id = path_params.get("id", "")
         if not session_id:
             return _response(400, {"error": "session id required"})
 
-        session = get_session(session_id)
+        query = event.get("queryStringParameters", {}) or {}
+        try:
+            since = _parse_since(query)
+            points = int(query["points"]) if query.get("points") else 0
+        except (ValueError, OverflowError) as e:
+            return _response(400, {"error": f"Invalid query parameter: {e}"})
+
+        session = get_session(session_id, fields=PROGRESS_FIELDS)
         if not session:
             return _response(404, {"error": "Session not found"})
 
-        curriculum = session.get("curriculum", {})
-        nodes = curriculum.get("nodes", [])
+        total_nodes = session.get("node_count")
+        if total_nodes is None:
+            total_nodes = len(load_curriculum(session).get("nodes", []))
         completed = session.get("completed_nodes", [])
 
-        progress_pct = (len(completed) / len(nodes) * 100) if nodes else 0
+        progress_pct = (len(completed) / total_nodes * 100) if total_nodes else 0
+
+        if since:
+            history = EmotionalHistory.from_entries(get_emotional_history_since(session, since))
+        else:
+            history = load_emotional_history(session)
+
+        # Aggregates are maintained on write; only sessions predating them fold here
+        if "emotional_aggregates" in session:
+            aggregates = EmotionalAggregates.from_dict(session["emotional_aggregates"])
+        elif since:
+            aggregates = EmotionalAggregates.from_history(load_emotional_history(session).entries())
+        else:
+            aggregates = EmotionalAggregates.from_history(history.entries())
 
         return _response(
             200,
             {
                 "session_id": session_id,
-                "emotional_history": session.get("emotional_history", []),
+                "emotional_history": history.downsample(points),
+                "emotional_count": session.get("emotional_count", len(history)),
+                "aggregates": aggregates.summary(),
+                "analytics": history.summary(),
                 "completed_nodes": completed,
-                "total_nodes": len(nodes),
+                "total_nodes": total_nodes,
                 "progress_pct": progress_pct,
                 "current_node_id": session.get("current_node_id", ""),
             },
@@ -38,6 +117,90 @@ def lambda_handler(event, context):
         return _response(500, {"error": str(e)})
 
 
+def _handle_batch(event):
+    """Return compact progress summaries for many sessions in one response.
+
+    Body: {"session_ids": [...], "analytics": false}. Sessions that do not exist
+    are listed in "missing" rather than failing the request. With "analytics"
+    each summary also carries the latest metrics and dropout warning, computed
+    for all sessions together from their columnar histories.
+    """
+    try:
+        body = json.loads(event.get("body") or "{}")
+        session_ids = body.get("session_ids", [])
+        if not isinstance(session_ids, list) or not session_ids:
+            return _response(400, {"error": "session_ids list required"})
+        if len(session_ids) > MAX_BATCH_SESSIONS:
+            return _response(
+                400, {"error": f"At most {MAX_BATCH_SESSIONS} session_ids per request"}
+            )
+
+        session_ids = list(dict.fromkeys(session_ids))
+        sessions = batch_get_sessions(session_ids, BATCH_PROGRESS_FIELDS)
+
+        summaries = [_summarize(sessions[sid]) for sid in session_ids if sid in sessions]
+        if body.get("analytics"):
+            analytics = _batch_analytics(list(sessions.values()))
+            for summary in summaries:
+                summary["analytics"] = analytics.get(summary["session_id"], {"count": 0})
+
+        return _response(
+            200,
+            {
+                "sessions": summaries,
+                "missing": [sid for sid in session_ids if sid not in sessions],
+            },
+        )
+    except Exception as e:
+        return _response(500, {"error": str(e)})
+
+
+def _summarize(session: dict) -> dict:
+    """Compact per-student progress built only from METADATA attributes."""
+    total_nodes = session.get("node_count")
+    if total_nodes is None:
+        # Classrooms share a curriculum, so this is one cached read at most
+        total_nodes = len(load_curriculum(session).get("nodes", []))
+    completed = session.get("completed_nodes", [])
+    aggregates = session.get("emotional_aggregates", {})
+
+    return {
+        "session_id": session["session_id"],
+        "completed_count": len(completed),
+        "total_nodes": total_nodes,
+        "progress_pct": (len(completed) / total_nodes * 100) if total_nodes else 0,
+        "current_node_id": session.get("current_node_id", ""),
+        "emotional_count": session.get("emotional_count", 0),
+        "flow_trend": aggregates.get("flow_trend"),
+        "dropout_trend": aggregates.get("dropout_trend"),
+    }
+
+
+def _batch_analytics(sessions: list) -> dict:
+    """Per-session analytics from one vectorized pass over every loaded history."""
+    with_history = [s for s in sessions if s.get("emotional_count")]
+    if not with_history:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(ANALYTICS_WORKERS, len(with_history))) as pool:
+        histories = list(pool.map(load_emotional_history, with_history))
+    return analyze_sessions(
+        {s["session_id"]: h for s, h in zip(with_history, histories)}
+    )
+
+
+def _parse_since(query: dict) -> str:
+    """Normalize since / window query parameters to an ISO-8601 lower bound ("" for none)."""
+    if query.get("since"):
+        since = datetime.fromisoformat(query["since"].replace("Z", "+00:00"))
+        # Stored timestamps are naive UTC
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        return since.isoformat()
+    if query.get("window"):
+        return (datetime.utcnow() - timedelta(seconds=float(query["window"]))).isoformat()
+    return ""
+
+
 def _response(status_code: int, body: dict) -> dict:
     return {
         "statusCode": status_code,
@@ -45,7 +208,7 @@ def _response(status_code: int, body: dict) -> dict:
             "Content-Type": "application/json",
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Headers": "Content-Type",
-            "Access-Control-Allow-Methods": "GET,OPTIONS",
+            "Access-Control-Allow-Methods": "POST,GET,OPTIONS",
         },
         "body": json.dumps(body),
     }
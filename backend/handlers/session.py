@@ -2,7 +2,10 @@
 
 import json
 
-from utils.dynamo import get_session, create_session
+from handlers.precompute import start_precompute
+from utils.content_store import hydrate_content
+from utils.curriculum_store import load_curriculum
+from utils.storage import get_session, create_session, get_messages, get_emotional_history
 from models.session import Session
 
 
@@ -25,6 +28,8 @@ def _handle_create(event):
         session = Session(curriculum=body.get("curriculum", {}))
         data = session.to_dict()
         create_session(data)
+        if session.curriculum.get("nodes"):
+            start_precompute(session.session_id)
         return _response(200, data)
     except Exception as e:
         return _response(500, {"error": str(e)})
@@ -38,10 +43,28 @@ def _handle_get(event):
         if not session_id:
             return _response(400, {"error": "session id required"})
 
+        # ?last=N returns only the most recent N messages / emotional states
+        # ?content=true fills in node reading text kept in the content store
+        query = event.get("queryStringParameters", {}) or {}
+        last_n = None
+        if query.get("last"):
+            try:
+                last_n = int(query["last"])
+            except ValueError:
+                last_n = -1
+            if last_n < 0:
+                return _response(400, {"error": "last must be a non-negative integer"})
+
         session = get_session(session_id)
         if not session:
             return _response(404, {"error": "Session not found"})
 
+        session["curriculum"] = load_curriculum(session)
+        if query.get("content", "").lower() == "true":
+            session["curriculum"] = hydrate_content(session["curriculum"])
+        session["messages"] = get_messages(session, last_n=last_n)
+        session["emotional_history"] = get_emotional_history(session, last_n=last_n)
+
         # Remove DynamoDB keys from response
         session.pop("PK", None)
         session.pop("SK", None)
@@ -1,30 +1,60 @@
-"""Lambda handler for curriculum upload and parsing."""
+"""Lambda handlers for curriculum upload and parsing.
+
+Two ways in:
+    POST /api/upload            - pasted text (or a small base64 PDF) parsed synchronously
+    POST /api/upload/url        - presigned S3 POST for a file; the browser uploads it
+                                  directly and an S3 Object Created event (via
+                                  EventBridge) runs s3_handler to extract and parse it
+    GET  /api/upload/{id}       - status of an asynchronous upload: pending,
+                                  processing, ready (with the curriculum) or failed
+"""
 
 import base64
 import io
 import json
 import logging
 import os
+import time
 import uuid
+from urllib.parse import unquote_plus
 
 import boto3
 
-from agents.prompts import CURRICULUM_ARCHITECT_PROMPT
-from utils.bedrock import invoke_agent, extract_json
-from utils.dynamo import create_session
+from agents.curriculum_parser import get_or_parse_curriculum
+from handlers.precompute import start_precompute
+from models.curriculum import CurriculumGraph
+from utils.content_store import hydrate_content
+from utils.curriculum_store import load_curriculum
+from utils.storage import (
+    SessionConflict,
+    create_session,
+    get_session,
+    put_curriculum,
+    update_session,
+)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 CURRICULUM_BUCKET = os.environ.get("CURRICULUM_BUCKET", "mindhacker-curriculum")
+UPLOAD_PREFIX = "uploads/"
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_URL_EXPIRY = int(os.environ.get("UPLOAD_URL_EXPIRY", "900"))
+# A "processing" claim older than this is from a run that timed out (the processor's limit is 900 s)
+UPLOAD_CLAIM_LEASE = int(os.environ.get("UPLOAD_CLAIM_LEASE", "960"))
+# EventBridge bus that receives a "Curriculum Upload Completed" event ("" disables it)
+COMPLETION_EVENT_BUS = os.environ.get("COMPLETION_EVENT_BUS", "")
+
 s3_client = boto3.client("s3")
+events_client = boto3.client("events")
+
+UPLOAD_STATUS_FIELDS = ["upload_status", "upload_error", "curriculum_hash", "curriculum"]
 
 
-def _extract_pdf_text(pdf_base64: str) -> str:
-    """Extract text from a base64-encoded PDF using PyPDF2."""
+def _extract_pdf_text(pdf_bytes: bytes) -> str:
+    """Extract text from PDF bytes using PyPDF2."""
     from PyPDF2 import PdfReader
 
-    pdf_bytes = base64.b64decode(pdf_base64)
     reader = PdfReader(io.BytesIO(pdf_bytes))
     pages = []
     for page in reader.pages:
@@ -34,7 +64,34 @@ def _extract_pdf_text(pdf_base64: str) -> str:
     return "\n\n".join(pages)
 
 
+def _first_node_id(curriculum: dict) -> str:
+    node = CurriculumGraph.from_dict(curriculum).next_node([])
+    return node.id if node else ""
+
+
+def _store_raw_content(session_id: str, raw_content: str) -> None:
+    """Store raw content in S3 for reference."""
+    s3_client.put_object(
+        Bucket=CURRICULUM_BUCKET,
+        Key=f"curricula/{session_id}/raw.txt",
+        Body=raw_content.encode("utf-8"),
+        ContentType="text/plain",
+    )
+
+
 def lambda_handler(event, context):
+    """Route /api/upload requests (see module docstring)."""
+    method = event.get("requestContext", {}).get("http", {}).get("method", "POST")
+    path = event.get("rawPath", "") or event.get("requestContext", {}).get("http", {}).get("path", "")
+
+    if method == "GET":
+        return _handle_status(event)
+    if path.rstrip("/").endswith("/url"):
+        return _handle_upload_url(event)
+    return _handle_sync_upload(event)
+
+
+def _handle_sync_upload(event):
     """POST /api/upload - Upload curriculum and parse into learning graph."""
     try:
         body = json.loads(event.get("body", "{}"))
@@ -45,7 +102,7 @@ def lambda_handler(event, context):
         # If PDF was uploaded, extract text from it
         if pdf_base64:
             try:
-                raw_content = _extract_pdf_text(pdf_base64)
+                raw_content = _extract_pdf_text(base64.b64decode(pdf_base64))
                 logger.info("Extracted %d chars from PDF", len(raw_content))
             except Exception as e:
                 logger.error("PDF extraction failed: %s", e)
@@ -54,62 +111,247 @@ def lambda_handler(event, context):
         if not raw_content:
             return _response(400, {"error": "content is required"})
 
-        # Parse curriculum via Curriculum Architect agent
-        parse_input = json.dumps(
-            {"raw_content": raw_content[:30000], "subject_hint": subject}
-        )
-        result = invoke_agent(CURRICULUM_ARCHITECT_PROMPT, parse_input, max_tokens=16384)
-        logger.info("Curriculum agent raw response type=%s, length=%d",
-                     type(result).__name__, len(str(result)))
-
-        # Parse the structured curriculum (handle markdown-wrapped JSON)
-        try:
-            if isinstance(result, dict):
-                curriculum = result
-            else:
-                curriculum = extract_json(result)
-        except (ValueError, TypeError) as e:
-            logger.error("Failed to parse curriculum JSON: %s\nRaw: %s", e, str(result)[:500])
-            curriculum = {"nodes": [], "parse_error": "Could not structure curriculum"}
-
-        if "subject" not in curriculum:
-            curriculum["subject"] = subject
+        curriculum = get_or_parse_curriculum(raw_content, subject)
 
         # Create a new session with this curriculum
         session_id = str(uuid.uuid4())
-        first_node_id = ""
-        if curriculum.get("nodes"):
-            first_node_id = curriculum["nodes"][0].get("id", "")
-
         session_data = {
             "session_id": session_id,
             "curriculum": curriculum,
             "messages": [],
             "emotional_history": [],
             "completed_nodes": [],
-            "current_node_id": first_node_id,
+            "current_node_id": _first_node_id(curriculum),
+            "upload_status": "ready",
         }
         create_session(session_data)
+        _store_raw_content(session_id, raw_content)
 
-        # Store raw content in S3 for reference
-        s3_client.put_object(
-            Bucket=CURRICULUM_BUCKET,
-            Key=f"curricula/{session_id}/raw.txt",
-            Body=raw_content.encode("utf-8"),
-            ContentType="text/plain",
+        # Pre-generate question banks off the request path
+        if curriculum.get("nodes"):
+            start_precompute(session_id)
+
+        return _response(
+            200,
+            {
+                "session_id": session_id,
+                "curriculum": hydrate_content(curriculum),
+            },
         )
+    except Exception as e:
+        return _response(500, {"error": str(e)})
+
 
+def _handle_upload_url(event):
+    """POST /api/upload/url - Create a pending session and a presigned S3 upload.
+
+    Body: {"filename": "book.pdf", "subject": "..."}. The response's upload_url and
+    upload_fields are used as a multipart form POST straight to S3 (max
+    MAX_UPLOAD_BYTES); parsing starts when the object lands.
+    """
+    try:
+        body = json.loads(event.get("body") or "{}")
+        filename = os.path.basename(body.get("filename", "")) or "curriculum.txt"
+        subject = body.get("subject", "")
+
+        session_id = str(uuid.uuid4())
+        create_session(
+            {
+                "session_id": session_id,
+                "messages": [],
+                "emotional_history": [],
+                "completed_nodes": [],
+                "current_node_id": "",
+                "subject_hint": subject,
+                "source_filename": filename,
+                "upload_status": "pending",
+            }
+        )
+
+        ext = os.path.splitext(filename)[1].lower() or ".txt"
+        presigned = s3_client.generate_presigned_post(
+            Bucket=CURRICULUM_BUCKET,
+            Key=f"{UPLOAD_PREFIX}{session_id}/source{ext}",
+            Conditions=[["content-length-range", 1, MAX_UPLOAD_BYTES]],
+            ExpiresIn=UPLOAD_URL_EXPIRY,
+        )
         return _response(
             200,
             {
                 "session_id": session_id,
-                "curriculum": curriculum,
+                "upload_url": presigned["url"],
+                "upload_fields": presigned["fields"],
+                "max_bytes": MAX_UPLOAD_BYTES,
+                "status": "pending",
             },
         )
     except Exception as e:
         return _response(500, {"error": str(e)})
 
 
+def _handle_status(event):
+    """GET /api/upload/{id} - Report parsing progress of an asynchronous upload."""
+    try:
+        path_params = event.get("pathParameters", {}) or {}
+        session_id = path_params.get("id", "")
+        if not session_id:
+            return _response(400, {"error": "session id required"})
+
+        session = get_session(session_id, fields=UPLOAD_STATUS_FIELDS)
+        if not session:
+            return _response(404, {"error": "Session not found"})
+
+        status = session.get("upload_status", "ready")
+        body = {"session_id": session_id, "status": status}
+        if status == "ready":
+            body["curriculum"] = hydrate_content(load_curriculum(session))
+        elif status == "failed":
+            body["error"] = session.get("upload_error", "Upload failed")
+        return _response(200, body)
+    except Exception as e:
+        return _response(500, {"error": str(e)})
+
+
+def s3_handler(event, context):
+    """S3 Object Created (EventBridge or S3 notification) - extract and parse an upload."""
+    for bucket, key in _uploaded_objects(event):
+        if not key.startswith(UPLOAD_PREFIX):
+            continue
+        session_id = key[len(UPLOAD_PREFIX):].split("/", 1)[0]
+        try:
+            claim = _claim_upload(session_id)
+        except Exception:
+            logger.exception("Could not claim upload for session=%s key=%s", session_id, key)
+            continue
+        if claim is None:
+            continue
+        session, version = claim
+        try:
+            _process_upload(session, version, bucket, key)
+        except Exception as e:
+            logger.exception("Upload processing failed for session=%s key=%s", session_id, key)
+            _mark_failed(session_id, version, str(e))
+    return {"status": "ok"}
+
+
+def _uploaded_objects(event) -> list:
+    if "detail" in event:
+        # EventBridge "Object Created"; keys are not URL-encoded here
+        detail = event["detail"]
+        return [(detail["bucket"]["name"], detail["object"]["key"])]
+    return [
+        (record["s3"]["bucket"]["name"], unquote_plus(record["s3"]["object"]["key"]))
+        for record in event.get("Records", [])
+    ]
+
+
+def _claim_upload(session_id: str):
+    """Mark an upload as being processed by this delivery.
+
+    S3 events can be delivered more than once. Only a pending or failed upload,
+    or one whose processing lease (claimed_at + UPLOAD_CLAIM_LEASE) has run out
+    because its Lambda timed out, can be claimed, and the versioned write lets
+    only one concurrent delivery win. Returns (session, claimed version), or
+    None when this delivery has nothing to do.
+    """
+    session = get_session(
+        session_id, fields=["subject_hint", "upload_status", "claimed_at", "version"]
+    )
+    if not session:
+        logger.error("Upload for unknown session=%s", session_id)
+        return None
+
+    status = session.get("upload_status")
+    if status == "ready":
+        logger.info("Upload for session=%s already parsed", session_id)
+        return None
+    if status == "processing" and time.time() < session.get("claimed_at", 0) + UPLOAD_CLAIM_LEASE:
+        logger.info("Upload for session=%s is being processed by another delivery", session_id)
+        return None
+
+    try:
+        version = update_session(
+            session_id,
+            {"upload_status": "processing", "claimed_at": int(time.time())},
+            expected_version=session.get("version", 0),
+        )
+    except SessionConflict:
+        logger.info("Upload for session=%s claimed by another delivery", session_id)
+        return None
+    return session, version
+
+
+def _mark_failed(session_id: str, version: int, error: str) -> None:
+    """Record a failure, unless the session moved on since this delivery's claim."""
+    try:
+        update_session(
+            session_id,
+            {"upload_status": "failed", "upload_error": error},
+            expected_version=version,
+        )
+    except SessionConflict:
+        logger.warning("Upload for session=%s changed since its claim; not marking failed",
+                       session_id)
+        return
+    _publish_completion(session_id, "failed")
+
+
+def _process_upload(session: dict, version: int, bucket: str, key: str) -> None:
+    session_id = session["session_id"]
+    data = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+    if key.lower().endswith(".pdf"):
+        raw_content = _extract_pdf_text(data)
+        logger.info("Extracted %d chars from PDF", len(raw_content))
+    else:
+        raw_content = data.decode("utf-8", errors="replace")
+    del data
+    if not raw_content.strip():
+        raise ValueError("No text could be extracted from the upload")
+
+    curriculum = get_or_parse_curriculum(raw_content, session.get("subject_hint", ""))
+    try:
+        update_session(
+            session_id,
+            {
+                "curriculum_hash": put_curriculum(curriculum),
+                "node_count": len(curriculum.get("nodes", [])),
+                "current_node_id": _first_node_id(curriculum),
+                "upload_status": "ready",
+            },
+            expected_version=version,
+        )
+    except SessionConflict:
+        # The lease ran out and a later delivery re-claimed the upload; it finishes the job
+        logger.warning("Upload for session=%s re-claimed during processing; dropping result",
+                       session_id)
+        return
+    _store_raw_content(session_id, raw_content)
+    logger.info("Upload parsed: session=%s nodes=%d", session_id, len(curriculum.get("nodes", [])))
+
+    if curriculum.get("nodes"):
+        start_precompute(session_id)
+    _publish_completion(session_id, "ready")
+
+
+def _publish_completion(session_id: str, status: str) -> None:
+    """Emit a completion event for subscribers that prefer push over polling."""
+    if not COMPLETION_EVENT_BUS:
+        return
+    try:
+        events_client.put_events(
+            Entries=[
+                {
+                    "EventBusName": COMPLETION_EVENT_BUS,
+                    "Source": "mindhacker.upload",
+                    "DetailType": "Curriculum Upload Completed",
+                    "Detail": json.dumps({"session_id": session_id, "status": status}),
+                }
+            ]
+        )
+    except Exception as e:
+        logger.warning("Could not publish upload completion for %s: %s", session_id, e)
+
+
 def _response(status_code: int, body: dict) -> dict:
     return {
         "statusCode": status_code,
@@ -117,7 +359,7 @@ def _response(status_code: int, body: dict) -> dict:
             "Content-Type": "application/json",
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Headers": "Content-Type",
-            "Access-Control-Allow-Methods": "POST,OPTIONS",
+            "Access-Control-Allow-Methods": "POST,GET,OPTIONS",
         },
         "body": json.dumps(body),
     }
@@ -1,7 +1,10 @@
 """Curriculum graph model for structured learning paths."""
 
-from dataclasses import dataclass, field, asdict
-from typing import List, Optional
+import hashlib
+import heapq
+import json
+from dataclasses import dataclass, field, asdict, fields
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 
 @dataclass
@@ -15,38 +18,193 @@ class CurriculumNode:
     prerequisites: List[str] = field(default_factory=list)
     learning_objectives: List[str] = field(default_factory=list)
     content: str = ""
+    # Set when the reading text lives in utils.content_store instead of content
+    content_ref: str = ""
+    content_length: int = 0
 
     def to_dict(self) -> dict:
         return asdict(self)
 
+    def load_content(self, max_chars: Optional[int] = None) -> str:
+        """The node's reading text (or its first max_chars), fetched on first use."""
+        from utils.content_store import node_content
+
+        return node_content(
+            {"content": self.content, "content_ref": self.content_ref,
+             "content_length": self.content_length},
+            max_chars,
+        )
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "CurriculumNode":
+        """Build a node from model output, ignoring unknown keys and filling gaps."""
+        known = {f.name for f in fields(cls)}
+        values = {k: v for k, v in d.items() if k in known and v is not None}
+        values.setdefault("description", "")
+        values["id"] = str(values.get("id", ""))
+        values["title"] = str(values.get("title", values["id"]))
+        values["prerequisites"] = [str(p) for p in values.get("prerequisites", [])]
+        return cls(**values)
+
 
 @dataclass
 class CurriculumGraph:
-    """A directed acyclic graph of curriculum nodes."""
+    """A directed acyclic graph of curriculum nodes.
+
+    The id index, dependents lists and prerequisite counts are built once, so
+    lookups are O(1) and the available-node frontier is O(nodes + edges) to
+    build and O(out-degree) to advance. Call reindex() after mutating nodes.
+    """
 
     nodes: List[CurriculumNode] = field(default_factory=list)
     subject: str = ""
+    _index: Dict[str, CurriculumNode] = field(default_factory=dict, init=False, repr=False,
+                                              compare=False)
+    _position: Dict[str, int] = field(default_factory=dict, init=False, repr=False,
+                                      compare=False)
+    _dependents: Dict[str, List[str]] = field(default_factory=dict, init=False, repr=False,
+                                              compare=False)
+    _indegree: Dict[str, int] = field(default_factory=dict, init=False, repr=False,
+                                      compare=False)
+
+    def __post_init__(self):
+        self.reindex()
+
+    def reindex(self) -> None:
+        """Rebuild the lookup structures from self.nodes.
+
+        Prerequisites naming unknown nodes are left out of the counts (validate()
+        rejects them for new graphs; stored ones may predate validation).
+        """
+        self._index, self._position = {}, {}
+        for position, node in enumerate(self.nodes):
+            self._index.setdefault(node.id, node)
+            self._position.setdefault(node.id, position)
+        self._dependents = {node_id: [] for node_id in self._index}
+        self._indegree = {}
+        for node_id, node in self._index.items():
+            prereqs = {p for p in node.prerequisites if p in self._index and p != node_id}
+            self._indegree[node_id] = len(prereqs)
+            for p in prereqs:
+                self._dependents[p].append(node_id)
 
     def to_dict(self) -> dict:
         return {"subject": self.subject, "nodes": [n.to_dict() for n in self.nodes]}
 
     @classmethod
     def from_dict(cls, d: dict) -> "CurriculumGraph":
-        nodes = [CurriculumNode(**n) for n in d.get("nodes", [])]
+        nodes = [CurriculumNode.from_dict(n) for n in d.get("nodes", [])]
         return cls(nodes=nodes, subject=d.get("subject", ""))
 
     def get_node(self, node_id: str) -> Optional[CurriculumNode]:
         """Find a node by its ID."""
+        return self._index.get(node_id)
+
+    def validate(self) -> None:
+        """Raise ValueError unless ids are unique and prerequisites form a DAG over them."""
+        if len(self._index) != len(self.nodes):
+            ids = [n.id for n in self.nodes]
+            dupes = sorted({i for i in ids if ids.count(i) > 1})
+            raise ValueError(f"Duplicate node ids: {dupes}")
         for n in self.nodes:
-            if n.id == node_id:
-                return n
-        return None
+            missing = [p for p in n.prerequisites if p not in self._index]
+            if missing:
+                raise ValueError(f"Node {n.id} has unknown prerequisites: {missing}")
+            if n.id in n.prerequisites:
+                raise ValueError(f"Node {n.id} lists itself as a prerequisite")
+
+        # Kahn's algorithm: any node never reaching indegree 0 sits on a cycle
+        order = self.topological_order()
+        if len(order) != len(self.nodes):
+            ordered = set(order)
+            cyclic = [n.id for n in self.nodes if n.id not in ordered]
+            raise ValueError(f"Prerequisite cycle among nodes: {cyclic}")
+
+    def topological_order(self) -> List[str]:
+        """Node ids in a prerequisite-respecting order (ties keep document order).
+
+        Nodes on a cycle are omitted.
+        """
+        frontier = self.frontier()
+        order = []
+        while True:
+            node = frontier.next_node()
+            if node is None:
+                return order
+            order.append(node.id)
+            frontier.complete(node.id)
+
+    def frontier(self, completed: Iterable[str] = ()) -> "CurriculumFrontier":
+        """The set of nodes a learner with these completed nodes can start next."""
+        return CurriculumFrontier(self, completed)
 
-    def get_available_nodes(self, completed: List[str]) -> List[CurriculumNode]:
+    def get_available_nodes(self, completed: Iterable[str]) -> List[CurriculumNode]:
         """Get all nodes whose prerequisites are met but are not yet completed."""
-        available = []
-        for node in self.nodes:
-            if node.id not in completed:
-                if all(p in completed for p in node.prerequisites):
-                    available.append(node)
-        return available
+        return self.frontier(completed).available()
+
+    def next_node(self, completed: Iterable[str]) -> Optional[CurriculumNode]:
+        """The first available node in document order, or None when all are done."""
+        return self.frontier(completed).next_node()
+
+
+class CurriculumFrontier:
+    """Available nodes for one learner, advanced incrementally as nodes complete.
+
+    Keeps each remaining node's count of unmet prerequisites (Kahn-style) and a
+    heap of available nodes ordered by their position in the curriculum.
+    """
+
+    def __init__(self, graph: CurriculumGraph, completed: Iterable[str] = ()):
+        self.graph = graph
+        self.completed: Set[str] = set()
+        self._unmet = dict(graph._indegree)
+        self._heap: List[Tuple[int, str]] = []
+        done = {node_id for node_id in completed if node_id in graph._index}
+        for node_id in done:
+            self._mark(node_id)
+        for node_id, unmet in self._unmet.items():
+            if unmet == 0 and node_id not in self.completed:
+                heapq.heappush(self._heap, (graph._position[node_id], node_id))
+
+    def _mark(self, node_id: str) -> List[str]:
+        """Record a completion and return dependents whose prerequisites are now all met."""
+        self.completed.add(node_id)
+        unlocked = []
+        for dependent in self.graph._dependents.get(node_id, []):
+            self._unmet[dependent] -= 1
+            if self._unmet[dependent] == 0:
+                unlocked.append(dependent)
+        return unlocked
+
+    def complete(self, node_id: str) -> List[CurriculumNode]:
+        """Mark a node complete; returns the nodes this unlocks."""
+        if node_id in self.completed or node_id not in self.graph._index:
+            return []
+        unlocked = [d for d in self._mark(node_id) if d not in self.completed]
+        for dependent in unlocked:
+            heapq.heappush(self._heap, (self.graph._position[dependent], dependent))
+        return [self.graph._index[d] for d in unlocked]
+
+    def _prune(self) -> None:
+        while self._heap and self._heap[0][1] in self.completed:
+            heapq.heappop(self._heap)
+
+    def next_node(self) -> Optional[CurriculumNode]:
+        """The earliest available node, without consuming it."""
+        self._prune()
+        return self.graph._index[self._heap[0][1]] if self._heap else None
+
+    def available(self) -> List[CurriculumNode]:
+        """All available nodes in curriculum order."""
+        ids = sorted({node_id for _, node_id in self._heap if node_id not in self.completed},
+                     key=self.graph._position.get)
+        return [self.graph._index[node_id] for node_id in ids]
+
+    def is_complete(self) -> bool:
+        return len(self.completed) == len(self.graph._index)
+
+
+def curriculum_hash(curriculum: dict) -> str:
+    """Content hash identifying a curriculum independent of the session that holds it."""
+    canonical = json.dumps(curriculum, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
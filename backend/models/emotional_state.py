@@ -1,10 +1,29 @@
 """Emotional state model with derived metrics and adaptation strategies."""
 
+import json
+import os
+import struct
+import zlib
 from dataclasses import dataclass, field, asdict
-from typing import List, Dict
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional
 
+import numpy as np
 
-@dataclass
+# Smoothing factor for the flow_score / dropout_risk trends (higher = more reactive)
+TREND_ALPHA = float(os.environ.get("TREND_ALPHA", "0.3"))
+
+DIMENSIONS = ("engagement", "confidence", "frustration", "curiosity", "cognitive_load")
+METRICS = DIMENSIONS + ("flow_score", "dropout_risk")
+
+# Dropout early warning: least-squares slope of dropout_risk per entry over the
+# last DROPOUT_WINDOW entries; a rise steeper than DROPOUT_SLOPE_THRESHOLD warns
+DROPOUT_WINDOW = int(os.environ.get("DROPOUT_WINDOW", "8"))
+DROPOUT_SLOPE_THRESHOLD = float(os.environ.get("DROPOUT_SLOPE_THRESHOLD", "0.02"))
+TREND_WINDOW = int(os.environ.get("TREND_WINDOW", "5"))
+
+
+@dataclass(slots=True)
 class EmotionalState:
     """Represents a student's emotional state across 5 dimensions."""
 
@@ -78,19 +97,444 @@ class EmotionalState:
 
         return strategies
 
+    def assessment_band(self) -> str:
+        """Quiz calibration band matching the ASSESSMENT_GENERATOR_PROMPT rules.
+
+        When several rules apply, the most protective one wins.
+        """
+        if self.cognitive_load > 0.6:
+            return "light"
+        if self.frustration > 0.5:
+            return "supportive"
+        if self.engagement < 0.3:
+            return "creative"
+        if self.confidence > 0.7 and self.frustration < 0.3:
+            return "challenge"
+        return "standard"
+
+    def strategy_key(self) -> str:
+        """Stable bucket id for the adaptation strategy, e.g. "approach=gamify|tone=enthusiastic"."""
+        strategies = self.get_adaptation_strategy()
+        if not strategies:
+            return "default"
+        return "|".join(f"{k}={v}" for k, v in sorted(strategies.items()))
+
+
+def flow_scores(values: np.ndarray) -> np.ndarray:
+    """EmotionalState.flow_score for every column of a (len(DIMENSIONS), n) array."""
+    engagement, confidence, frustration, curiosity, cognitive_load = values
+    return (engagement + confidence + curiosity - frustration - cognitive_load * 0.5) / 3.5
+
+
+def dropout_risks(values: np.ndarray) -> np.ndarray:
+    """EmotionalState.dropout_risk for every column of a (len(DIMENSIONS), n) array."""
+    engagement, _, frustration, _, cognitive_load = values
+    return frustration * 0.4 + (1 - engagement) * 0.3 + cognitive_load * 0.3
+
+
+def readiness_scores(values: np.ndarray) -> np.ndarray:
+    """EmotionalState.readiness_for_challenge for every column of a (len(DIMENSIONS), n) array."""
+    engagement, confidence, frustration, curiosity, _ = values
+    return (confidence * 0.4 + engagement * 0.3 + curiosity * 0.3) * (1 - frustration)
+
+
+_DERIVED = {
+    "flow_score": flow_scores,
+    "dropout_risk": dropout_risks,
+    "readiness_for_challenge": readiness_scores,
+}
+
+# Binary layout: magic, entry count, vocabulary byte length, then the node-id
+# vocabulary (JSON) and the little-endian columns, all zlib-compressed
+_MAGIC = b"EMH1"
+_HEADER = struct.Struct("<4sII")
+_EPOCH = datetime(1970, 1, 1)
+_NO_TIMESTAMP = np.iinfo(np.int64).min
+
 
-@dataclass
 class EmotionalHistory:
-    """Stores timestamped emotional states across a session."""
+    """A session's emotional states stored column-wise in NumPy arrays.
+
+    Each dimension is a float32 column, alongside the message index, the
+    timestamp (int64 microseconds since the epoch) and the node id (an index
+    into a small vocabulary). Derived metrics, rolling trends and the dropout
+    warning are computed over whole columns at once, and the history packs
+    into a compact binary form (to_bytes) for storage.
+    """
+
+    __slots__ = ("_values", "_message_index", "_timestamps", "_node_codes",
+                 "_nodes", "_node_lookup", "_count")
+
+    def __init__(self, capacity: int = 64):
+        capacity = max(capacity, 1)
+        self._values = np.zeros((len(DIMENSIONS), capacity), dtype=np.float32)
+        self._message_index = np.zeros(capacity, dtype=np.int32)
+        self._timestamps = np.full(capacity, _NO_TIMESTAMP, dtype=np.int64)
+        self._node_codes = np.zeros(capacity, dtype=np.int32)
+        self._nodes: List[str] = [""]
+        self._node_lookup: Dict[str, int] = {"": 0}
+        self._count = 0
 
-    states: List[Dict] = field(default_factory=list)
+    def __len__(self) -> int:
+        return self._count
 
-    def add(self, state: EmotionalState, message_index: int) -> None:
-        entry = state.to_dict()
-        entry["message_index"] = message_index
-        entry["flow_score"] = state.flow_score
-        entry["dropout_risk"] = state.dropout_risk
-        self.states.append(entry)
+    # -- building ---------------------------------------------------------------
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._count + extra
+        capacity = self._message_index.shape[0]
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        values = np.zeros((len(DIMENSIONS), capacity), dtype=np.float32)
+        values[:, :self._count] = self._values[:, :self._count]
+        self._values = values
+        self._message_index = np.resize(self._message_index, capacity)
+        self._node_codes = np.resize(self._node_codes, capacity)
+        timestamps = np.full(capacity, _NO_TIMESTAMP, dtype=np.int64)
+        timestamps[:self._count] = self._timestamps[:self._count]
+        self._timestamps = timestamps
+
+    def _node_code(self, node_id: str) -> int:
+        code = self._node_lookup.get(node_id)
+        if code is None:
+            code = self._node_lookup[node_id] = len(self._nodes)
+            self._nodes.append(node_id)
+        return code
+
+    def add(self, state: EmotionalState, message_index: int,
+            node_id: str = "", timestamp: str = "") -> None:
+        self.extend([{**state.to_dict(), "message_index": message_index,
+                      "node_id": node_id, "timestamp": timestamp}])
+
+    def extend(self, entries: List[Dict]) -> None:
+        """Append history entries as stored by the chat handler."""
+        if not entries:
+            return
+        self._reserve(len(entries))
+        start, stop = self._count, self._count + len(entries)
+        defaults = EmotionalState()
+        for i, name in enumerate(DIMENSIONS):
+            default = getattr(defaults, name)
+            self._values[i, start:stop] = [float(e.get(name, default)) for e in entries]
+        self._message_index[start:stop] = [int(e.get("message_index", 0)) for e in entries]
+        self._timestamps[start:stop] = [_to_micros(e.get("timestamp")) for e in entries]
+        self._node_codes[start:stop] = [self._node_code(e.get("node_id") or "") for e in entries]
+        self._count = stop
+
+    @classmethod
+    def from_entries(cls, entries: List[Dict]) -> "EmotionalHistory":
+        history = cls(capacity=len(entries))
+        history.extend(entries)
+        return history
+
+    # -- columns and metrics ----------------------------------------------------
+
+    @property
+    def values(self) -> np.ndarray:
+        """The (len(DIMENSIONS), n) float32 matrix of dimension values (a view)."""
+        return self._values[:, :self._count]
+
+    def column(self, name: str) -> np.ndarray:
+        """One dimension (float32 view) or derived metric (computed) over all entries."""
+        if name in DIMENSIONS:
+            return self._values[DIMENSIONS.index(name), :self._count]
+        if name in _DERIVED:
+            return _DERIVED[name](self.values)
+        raise KeyError(name)
+
+    def metrics(self) -> Dict[str, np.ndarray]:
+        """flow_score, dropout_risk and readiness_for_challenge for every entry."""
+        values = self.values
+        return {name: compute(values) for name, compute in _DERIVED.items()}
+
+    def latest(self) -> Optional[EmotionalState]:
+        if not self._count:
+            return None
+        return EmotionalState(*(float(v) for v in self._values[:, self._count - 1]))
+
+    def rolling_mean(self, name: str, window: int = TREND_WINDOW) -> np.ndarray:
+        """Mean of the metric over the trailing `window` entries, at every entry.
+
+        The first entries average over however many precede them; a window
+        below 1 is treated as 1.
+        """
+        series = self.column(name).astype(np.float64)
+        if not series.size:
+            return series
+        window = max(int(window), 1)
+        sums = np.cumsum(series)
+        sums[window:] = sums[window:] - sums[:-window]
+        counts = np.minimum(np.arange(1, series.size + 1), window)
+        return sums / counts
+
+    def trend(self, name: str, alpha: float = TREND_ALPHA) -> Optional[float]:
+        """Final EWMA of a metric, as EmotionalAggregates maintains it on write."""
+        series = self.column(name).astype(np.float64)
+        if not series.size:
+            return None
+        powers = (1 - alpha) ** np.arange(series.size - 1, -1, -1)
+        weights = alpha * powers
+        weights[0] = powers[0]
+        return float(weights @ series)
+
+    def slope(self, name: str, window: int = DROPOUT_WINDOW) -> float:
+        """Least-squares slope of a metric per entry over the last `window` entries."""
+        window = max(int(window), 1)
+        return float(window_slopes(self.column(name)[-window:][None, :])[0])
+
+    def dropout_warning(self, window: int = DROPOUT_WINDOW,
+                        threshold: float = DROPOUT_SLOPE_THRESHOLD) -> dict:
+        """Early warning when dropout_risk has been climbing over the recent window."""
+        window = max(int(window), 1)
+        slope = self.slope("dropout_risk", window) if self._count >= 2 else 0.0
+        return {
+            "slope": round(slope, 4),
+            "window": min(window, self._count),
+            "warning": slope > threshold,
+        }
+
+    def summary(self, window: int = TREND_WINDOW) -> dict:
+        """Session-level analytics as returned by the progress API."""
+        if not self._count:
+            return {"count": 0}
+        metrics = self.metrics()
+        return {
+            "count": self._count,
+            "readiness_for_challenge": round(float(metrics["readiness_for_challenge"][-1]), 4),
+            "rolling_flow": round(float(self.rolling_mean("flow_score", window)[-1]), 4),
+            "rolling_dropout": round(float(self.rolling_mean("dropout_risk", window)[-1]), 4),
+            "dropout_warning": self.dropout_warning(),
+        }
+
+    # -- entries ----------------------------------------------------------------
+
+    def entries(self, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+        """History entries in the chat handler's dict form (values rounded to 6 places)."""
+        stop = self._count if stop is None else min(stop, self._count)
+        values = np.round(self._values[:, start:stop].astype(np.float64), 6)
+        derived = {name: np.round(_DERIVED[name](values), 6)
+                   for name in ("flow_score", "dropout_risk")}
+        entries = []
+        for offset, i in enumerate(range(start, stop)):
+            entry = {name: float(values[d, offset]) for d, name in enumerate(DIMENSIONS)}
+            entry["message_index"] = int(self._message_index[i])
+            entry["flow_score"] = float(derived["flow_score"][offset])
+            entry["dropout_risk"] = float(derived["dropout_risk"][offset])
+            entry["node_id"] = self._nodes[self._node_codes[i]]
+            if self._timestamps[i] != _NO_TIMESTAMP:
+                entry["timestamp"] = _from_micros(int(self._timestamps[i]))
+            entries.append(entry)
+        return entries
 
     def to_list(self) -> List[Dict]:
-        return self.states
+        return self.entries()
+
+    def downsample(self, max_points: int) -> List[Dict]:
+        """At most max_points entries, each summarising a bucket of consecutive entries.
+
+        Dimensions and metrics are the bucket's means; the message index, node
+        and timestamp come from its last entry, and "samples" is its size.
+        Histories already within max_points (or max_points <= 0) come back whole.
+        """
+        if max_points <= 0 or self._count <= max_points:
+            return self.entries()
+
+        bounds = (np.arange(max_points + 1) * (self._count / max_points)).astype(np.int64)
+        # Float rounding can leave the final bound one short of the newest entry
+        bounds[-1] = self._count
+        starts, ends = bounds[:-1], bounds[1:]
+        keep = ends > starts
+        starts, ends = starts[keep], ends[keep]
+
+        values = self.values.astype(np.float64)
+        series = np.vstack([values, flow_scores(values), dropout_risks(values)])
+        sums = np.add.reduceat(series, starts, axis=1)
+        means = np.round(sums / (ends - starts), 6)
+
+        points = []
+        for b, end in enumerate(ends):
+            last = self.entries(end - 1, end)[0]
+            point = {k: v for k, v in last.items() if k not in METRICS}
+            for m, metric in enumerate(METRICS):
+                point[metric] = float(means[m, b])
+            point["samples"] = int(end - starts[b])
+            points.append(point)
+        return points
+
+    # -- binary form ------------------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        """Compact, versioned binary form (see _HEADER)."""
+        n = self._count
+        vocabulary = json.dumps(self._nodes[1:]).encode("utf-8")
+        body = b"".join([
+            vocabulary,
+            self._values[:, :n].astype("<f4").tobytes(),
+            self._message_index[:n].astype("<i4").tobytes(),
+            self._timestamps[:n].astype("<i8").tobytes(),
+            self._node_codes[:n].astype("<i4").tobytes(),
+        ])
+        return _HEADER.pack(_MAGIC, n, len(vocabulary)) + zlib.compress(body)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "EmotionalHistory":
+        magic, n, vocabulary_len = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not a serialized EmotionalHistory")
+        body = zlib.decompress(data[_HEADER.size:])
+
+        history = cls(capacity=n)
+        for node_id in json.loads(body[:vocabulary_len].decode("utf-8")):
+            history._node_code(node_id)
+        offset = vocabulary_len
+
+        def take(dtype: str, count: int) -> np.ndarray:
+            nonlocal offset
+            array = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes
+            return array
+
+        history._values[:, :n] = take("<f4", len(DIMENSIONS) * n).reshape(len(DIMENSIONS), n)
+        history._message_index[:n] = take("<i4", n)
+        history._timestamps[:n] = take("<i8", n)
+        history._node_codes[:n] = take("<i4", n)
+        history._count = n
+        return history
+
+
+def window_slopes(series: np.ndarray) -> np.ndarray:
+    """Least-squares slope of each row of a (sessions, window) array.
+
+    NaN marks missing points (shorter histories are left-padded with NaN);
+    rows with fewer than two points have slope 0.
+    """
+    series = np.asarray(series, dtype=np.float64)
+    mask = ~np.isnan(series)
+    x = np.broadcast_to(np.arange(series.shape[1], dtype=np.float64), series.shape)
+    counts = mask.sum(axis=1)
+    safe = np.maximum(counts, 1)
+    x_mean = np.where(mask, x, 0).sum(axis=1) / safe
+    y_mean = np.where(mask, series, 0).sum(axis=1) / safe
+    dx = np.where(mask, x - x_mean[:, None], 0)
+    dy = np.where(mask, series - y_mean[:, None], 0)
+    denominator = (dx * dx).sum(axis=1)
+    slopes = np.divide((dx * dy).sum(axis=1), denominator,
+                       out=np.zeros_like(denominator), where=denominator > 0)
+    return np.where(counts >= 2, slopes, 0.0)
+
+
+def analyze_sessions(histories: Dict[str, EmotionalHistory],
+                     window: int = DROPOUT_WINDOW,
+                     threshold: float = DROPOUT_SLOPE_THRESHOLD) -> Dict[str, dict]:
+    """Latest metrics and dropout warnings for many sessions in one vectorized pass.
+
+    The last `window` dropout_risk values of every session are stacked into one
+    (sessions, window) matrix so all slopes come from a single computation.
+    """
+    session_ids = [sid for sid, history in histories.items() if len(history)]
+    if not session_ids:
+        return {}
+    window = max(int(window), 1)
+
+    latest = np.empty((len(DIMENSIONS), len(session_ids)), dtype=np.float64)
+    recent = np.full((len(session_ids), window), np.nan)
+    for row, sid in enumerate(session_ids):
+        values = histories[sid].values
+        latest[:, row] = values[:, -1]
+        tail = dropout_risks(values[:, -window:].astype(np.float64))
+        recent[row, window - tail.size:] = tail
+
+    slopes = window_slopes(recent)
+    flow, dropout, readiness = flow_scores(latest), dropout_risks(latest), readiness_scores(latest)
+    return {
+        sid: {
+            "count": len(histories[sid]),
+            "flow_score": round(float(flow[row]), 4),
+            "dropout_risk": round(float(dropout[row]), 4),
+            "readiness_for_challenge": round(float(readiness[row]), 4),
+            "dropout_slope": round(float(slopes[row]), 4),
+            "dropout_warning": bool(slopes[row] > threshold),
+        }
+        for row, sid in enumerate(session_ids)
+    }
+
+
+def _to_micros(timestamp: Optional[str]) -> int:
+    if not timestamp:
+        return _NO_TIMESTAMP
+    moment = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = moment - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _from_micros(micros: int) -> str:
+    return (_EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+@dataclass
+class EmotionalAggregates:
+    """Running session-level statistics, updated once per new history entry.
+
+    Stored on the session so the progress API never has to fold the full
+    history: EWMA trends of flow_score and dropout_risk, plus per-node sums
+    from which averages are derived.
+    """
+
+    count: int = 0
+    flow_trend: Optional[float] = None
+    dropout_trend: Optional[float] = None
+    nodes: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+    def add(self, entry: dict) -> None:
+        self.count += 1
+        self.flow_trend = _ewma(self.flow_trend, entry.get("flow_score", 0.0))
+        self.dropout_trend = _ewma(self.dropout_trend, entry.get("dropout_risk", 0.0))
+
+        node = self.nodes.setdefault(entry.get("node_id") or "", {"count": 0})
+        node["count"] += 1
+        for metric in METRICS:
+            node[metric] = node.get(metric, 0.0) + float(entry.get(metric, 0.0))
+
+    def node_averages(self) -> Dict[str, Dict[str, float]]:
+        return {
+            node_id: {
+                "count": sums["count"],
+                **{m: round(sums.get(m, 0.0) / sums["count"], 4) for m in METRICS},
+            }
+            for node_id, sums in self.nodes.items()
+            if sums["count"]
+        }
+
+    def summary(self) -> dict:
+        """Aggregates as returned by the progress API."""
+        return {
+            "count": self.count,
+            "flow_trend": self.flow_trend,
+            "dropout_trend": self.dropout_trend,
+            "per_node": self.node_averages(),
+        }
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "EmotionalAggregates":
+        return cls(**{k: v for k, v in d.items() if k in cls.__dataclass_fields__})
+
+    @classmethod
+    def from_history(cls, entries: List[Dict]) -> "EmotionalAggregates":
+        aggregates = cls()
+        for entry in entries:
+            aggregates.add(entry)
+        return aggregates
+
+
+def _ewma(previous: Optional[float], value: float) -> float:
+    value = float(value)
+    if previous is None:
+        return value
+    return TREND_ALPHA * value + (1 - TREND_ALPHA) * previous
+
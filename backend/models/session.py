@@ -5,6 +5,8 @@ from dataclasses import dataclass, field, asdict
 from datetime import datetime
 from typing import List, Dict
 
+from models.curriculum import curriculum_hash
+
 
 @dataclass
 class Session:
@@ -12,10 +14,15 @@ class Session:
 
     session_id: str = ""
     curriculum: Dict = field(default_factory=dict)
+    curriculum_hash: str = ""
     messages: List[Dict] = field(default_factory=list)
     emotional_history: List[Dict] = field(default_factory=list)
     completed_nodes: List[str] = field(default_factory=list)
     current_node_id: str = ""
+    context_summary: str = ""
+    summarized_count: int = 0
+    asked_questions: List[str] = field(default_factory=list)
+    token_usage: Dict = field(default_factory=dict)
     created_at: str = ""
 
     def __post_init__(self):
@@ -23,6 +30,8 @@ class Session:
             self.session_id = str(uuid.uuid4())
         if not self.created_at:
             self.created_at = datetime.utcnow().isoformat()
+        if self.curriculum and not self.curriculum_hash:
+            self.curriculum_hash = curriculum_hash(self.curriculum)
 
     def to_dict(self) -> dict:
         return asdict(self)
@@ -0,0 +1,7 @@
+#!/bin/bash
+# Entry point for the streaming chat function (started by the Lambda Web Adapter).
+set -euo pipefail
+
+cd "${LAMBDA_TASK_ROOT:-$(dirname "$0")}"
+export PYTHONPATH="/opt/python:$(pwd):${PYTHONPATH:-}"
+exec python3 -m handlers.chat_stream
@@ -0,0 +1,74 @@
+"""Shared fixtures. Tests run against local backends and mocked AWS only."""
+
+import os
+import uuid
+
+import pytest
+
+# Read at import time by the modules under test
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["CONTENT_STORE"] = "inline"
+
+from utils.storage import set_store  # noqa: E402
+
+TABLE_NAME = "MindHackerSessionsTest"
+
+
+def _dynamodb_store():
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    from utils.dynamo import DynamoDBStore
+
+    mock = moto.mock_aws()
+    mock.start()
+    boto3.client("dynamodb", region_name=os.environ.get("AWS_REGION", "us-east-1")).create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"},
+                   {"AttributeName": "SK", "KeyType": "RANGE"}],
+        AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"},
+                              {"AttributeName": "SK", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return DynamoDBStore(TABLE_NAME), mock
+
+
+@pytest.fixture(params=["memory", "sqlite", "dynamodb"])
+def store(request, tmp_path):
+    """A fresh SessionStore of each backend."""
+    mock = None
+    if request.param == "memory":
+        from utils.memory_store import MemoryStore
+
+        backend = MemoryStore()
+    elif request.param == "sqlite":
+        from utils.sqlite_store import SQLiteStore
+
+        backend = SQLiteStore(str(tmp_path / f"{uuid.uuid4()}.db"))
+    else:
+        backend, mock = _dynamodb_store()
+    yield backend
+    if mock is not None:
+        mock.stop()
+
+
+@pytest.fixture
+def dynamodb_store():
+    """A DynamoDBStore on a fresh moto table."""
+    backend, mock = _dynamodb_store()
+    yield backend
+    mock.stop()
+
+
+@pytest.fixture
+def memory_store():
+    """Install a fresh MemoryStore behind the utils.storage facade."""
+    from utils.memory_store import MemoryStore
+
+    backend = MemoryStore()
+    set_store(backend)
+    yield backend
+    set_store(None)
@@ -0,0 +1,98 @@
+"""Demand-driven adaptation bank: bucket selection, sliced builds and serving."""
+
+import json
+
+import pytest
+
+import agents.adaptation_bank as bank
+import agents.dispatcher as dispatcher
+import handlers.precompute as precompute
+from models.emotional_state import EmotionalState
+from utils.storage import create_session, get_adaptation, get_strategy_demand
+
+CURRICULUM = {
+    "subject": "Physics",
+    "nodes": [{"id": f"n{i}", "title": f"Topic {i}", "description": "", "prerequisites": []}
+              for i in range(5)],
+}
+FRUSTRATED = EmotionalState(frustration=0.8)
+
+
+@pytest.fixture
+def adapter(monkeypatch, memory_store):
+    calls = []
+
+    def invoke(prompt, message, max_tokens=0):
+        calls.append(json.loads(message))
+        return json.dumps({"content": f"lesson {len(calls)}"})
+
+    monkeypatch.setattr(bank, "invoke_agent", invoke)
+    monkeypatch.setattr(dispatcher, "invoke_agent", invoke)
+    return calls
+
+
+def test_bank_starts_with_default_then_follows_demand(adapter):
+    assert [key for key, _ in bank.bank_strategies("c1")] == ["default"]
+
+    assert bank.record_strategy("c1", FRUSTRATED.strategy_key(), FRUSTRATED) is True
+    assert bank.record_strategy("c1", FRUSTRATED.strategy_key(), FRUSTRATED) is False
+    curious = EmotionalState(curiosity=0.9)
+    bank.record_strategy("c1", curious.strategy_key(), curious)
+
+    keys = [key for key, _ in bank.bank_strategies("c1")]
+    assert keys == ["default", FRUSTRATED.strategy_key(), curious.strategy_key()]
+    assert get_strategy_demand("c1")[FRUSTRATED.strategy_key()]["count"] == 2
+
+
+def test_build_is_sliced_and_resumes(adapter):
+    bank.record_strategy("c1", FRUSTRATED.strategy_key(), FRUSTRATED)
+
+    assert bank.build_adaptation_bank(CURRICULUM, "c1", max_jobs=4) == (4, 6)
+    assert bank.build_adaptation_bank(CURRICULUM, "c1", max_jobs=4) == (4, 2)
+    assert bank.build_adaptation_bank(CURRICULUM, "c1", max_jobs=4) == (2, 0)
+    assert len(adapter) == 10
+    assert get_adaptation("c1", "n4", FRUSTRATED.strategy_key()) is not None
+
+
+def test_non_json_replies_are_not_banked(adapter, monkeypatch):
+    monkeypatch.setattr(bank, "invoke_agent", lambda *args, **kwargs: "Sorry, I can't.")
+    assert bank.build_adaptation_bank(CURRICULUM, "c1") == (0, 0)
+    assert get_adaptation("c1", "n0", "default") is None
+
+
+def test_precompute_reinvokes_itself_until_the_bank_is_complete(adapter, monkeypatch):
+    session = create_session({"session_id": "s1", "curriculum": CURRICULUM,
+                              "messages": [], "emotional_history": []})
+    monkeypatch.setattr(precompute, "build_question_bank", lambda curriculum, c_hash: 0)
+    monkeypatch.setattr(bank, "BUILD_MAX_JOBS", 2)
+    invocations = []
+    monkeypatch.setattr(precompute, "start_precompute",
+                        lambda session_id, stage="": invocations.append(stage))
+
+    event = {"session_id": session["session_id"]}
+    while True:
+        result = precompute.lambda_handler(event, None)
+        if not result["remaining"]:
+            break
+        event = {"session_id": "s1", "stage": invocations[-1]}
+
+    assert invocations == ["adaptations", "adaptations"]
+    assert len(adapter) == len(CURRICULUM["nodes"])
+
+
+def test_live_adaptation_records_demand_and_starts_a_build(adapter, monkeypatch):
+    monkeypatch.setattr(dispatcher.adaptation_cache, "get", lambda key: None)
+    monkeypatch.setattr(dispatcher.adaptation_cache, "put", lambda key, value: None)
+    started = []
+    monkeypatch.setattr(precompute, "start_precompute",
+                        lambda session_id, stage="": started.append((session_id, stage)))
+    context = {"curriculum_hash": "c1", "node_id": "n0", "session_id": "s1"}
+    tool_input = {"current_topic": "Topic 0", "emotional_state": FRUSTRATED.to_dict(),
+                  "student_message": "this is too hard"}
+
+    for _ in range(2):
+        result = dispatcher.dispatch_tool_call("adapt_content", tool_input, context)
+        assert result["respond_to"] == "this is too hard"
+
+    assert started == [("s1", "adaptations")]
+    assert get_strategy_demand("c1")[FRUSTRATED.strategy_key()]["count"] == 2
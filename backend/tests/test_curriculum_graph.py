@@ -0,0 +1,106 @@
+"""CurriculumGraph validation and the incremental CurriculumFrontier."""
+
+import random
+
+import pytest
+
+from models.curriculum import CurriculumGraph, CurriculumNode
+
+
+def _graph(edges: dict) -> CurriculumGraph:
+    """Nodes in dict order, each with the listed prerequisites."""
+    return CurriculumGraph(nodes=[
+        CurriculumNode(id=node_id, title=node_id.upper(), description="", prerequisites=prereqs)
+        for node_id, prereqs in edges.items()
+    ])
+
+
+def _scan_available(graph: CurriculumGraph, completed: set) -> list:
+    """The original linear scan the frontier replaced."""
+    return [n.id for n in graph.nodes
+            if n.id not in completed and all(p in completed for p in n.prerequisites)]
+
+
+DIAMOND = {"a": [], "b": ["a"], "c": ["a"], "d": ["b", "c"], "e": []}
+
+
+def test_get_node_and_available_nodes():
+    graph = _graph(DIAMOND)
+    assert graph.get_node("c").title == "C"
+    assert graph.get_node("missing") is None
+    assert [n.id for n in graph.get_available_nodes([])] == ["a", "e"]
+    assert [n.id for n in graph.get_available_nodes(["a", "b"])] == ["c", "e"]
+    assert graph.next_node(["a", "b", "c"]).id == "d"
+    assert graph.next_node(list(DIAMOND)) is None
+
+
+def test_frontier_complete_returns_unlocked_nodes():
+    frontier = _graph(DIAMOND).frontier()
+    assert [n.id for n in frontier.complete("a")] == ["b", "c"]
+    assert frontier.complete("b") == []
+    assert frontier.complete("b") == []  # completing twice is a no-op
+    assert [n.id for n in frontier.complete("c")] == ["d"]
+    assert frontier.next_node().id == "d"
+    for node_id in ("d", "e"):
+        frontier.complete(node_id)
+    assert frontier.is_complete() and frontier.next_node() is None
+
+
+def test_frontier_matches_a_full_scan_on_random_dags():
+    rng = random.Random(7)
+    for _ in range(20):
+        ids = [f"n{i}" for i in range(40)]
+        graph = _graph({
+            node_id: rng.sample(ids[:i], k=min(i, rng.randint(0, 3)))
+            for i, node_id in enumerate(ids)
+        })
+        completed = set()
+        frontier = graph.frontier()
+        while True:
+            assert [n.id for n in frontier.available()] == _scan_available(graph, completed)
+            node = frontier.next_node()
+            if node is None:
+                break
+            completed.add(node.id)
+            frontier.complete(node.id)
+        assert completed == set(ids)
+
+
+def test_topological_order_respects_prerequisites():
+    graph = _graph({"d": ["b", "c"], "c": ["a"], "b": ["a"], "a": []})
+    order = graph.topological_order()
+    assert order == ["a", "c", "b", "d"]
+
+
+@pytest.mark.parametrize("edges, message", [
+    ({"a": [], "b": ["a"], "c": ["a", "b"]}, None),
+    ({"a": ["missing"]}, "unknown prerequisites"),
+    ({"a": ["a"]}, "itself"),
+    ({"a": ["c"], "b": ["a"], "c": ["b"]}, "cycle"),
+])
+def test_validate(edges, message):
+    graph = _graph(edges)
+    if message is None:
+        graph.validate()
+        return
+    with pytest.raises(ValueError, match=message):
+        graph.validate()
+
+
+def test_validate_rejects_duplicate_ids():
+    graph = CurriculumGraph(nodes=[CurriculumNode(id="a", title="A", description=""),
+                                   CurriculumNode(id="a", title="A2", description="")])
+    with pytest.raises(ValueError, match="Duplicate"):
+        graph.validate()
+
+
+def test_from_dict_round_trip_and_reindex():
+    graph = CurriculumGraph.from_dict({"subject": "S", "nodes": [
+        {"id": "a", "title": "A", "description": "", "prerequisites": []},
+        {"id": "b", "title": "B", "prerequisites": ["a"], "unknown_key": 1},
+    ]})
+    assert CurriculumGraph.from_dict(graph.to_dict()).to_dict() == graph.to_dict()
+
+    graph.nodes[1].prerequisites = []
+    graph.reindex()
+    assert [n.id for n in graph.get_available_nodes([])] == ["a", "b"]
@@ -0,0 +1,212 @@
+"""Chunked curriculum parsing: segmenting, chunk packing, merging parts and content."""
+
+import json
+
+import pytest
+
+import agents.curriculum_parser as parser
+from agents.curriculum_parser import (
+    _attach_content,
+    chunk_sections,
+    get_or_parse_curriculum,
+    merge_parts,
+    parse_curriculum,
+    parse_key,
+    segment_text,
+    split_sections,
+)
+from models.curriculum import CurriculumNode
+
+
+def _chapter(number: int, chars: int) -> str:
+    sentence = f"Material about topic {number}. "
+    body = (sentence * (chars // len(sentence) + 1))[:chars]
+    # Paragraph breaks give the splitter somewhere to cut
+    paragraphs = [body[i:i + 1500] for i in range(0, len(body), 1500)]
+    return f"Chapter {number}: Topic {number}\n\n" + "\n\n".join(paragraphs) + "\n"
+
+
+def fake_architect(prompt: str, message: str, max_tokens: int = 0):
+    """One node per headed section group, citing every segment up to the next heading."""
+    chunk = json.loads(message)
+    nodes = []
+    for section in chunk["sections"]:
+        if section.get("heading") or not nodes:
+            title = section.get("heading", "Introduction")
+            nodes.append({"id": title.split(":")[0].lower().replace(" ", "_"),
+                          "title": title, "description": "", "prerequisites": [],
+                          "sections": []})
+        nodes[-1]["sections"].append(section["ref"])
+    for previous, node in zip(nodes, nodes[1:]):
+        node["prerequisites"] = [previous["id"]]
+    return {"subject": "Topics", "nodes": nodes}
+
+
+def test_split_sections_on_separators_and_headings():
+    text = "Intro text\n===\nMore intro\nChapter 1 Cells\nAbout cells\n## Genes\nAbout genes\n"
+    sections = split_sections(text)
+    assert [s.heading for s in sections] == ["", "", "Chapter 1 Cells", "## Genes"]
+    assert text[sections[0].start:sections[0].end] == "Intro text\n"
+    assert "===" not in "".join(text[s.start:s.end] for s in sections)
+
+
+def test_chunk_sections_packs_consecutive_sections():
+    sections = split_sections("".join(_chapter(n, 900) for n in range(1, 6)))
+    chunks = chunk_sections(sections, max_chars=2000)
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert [s for c in chunks for s in c] == sections
+
+
+def test_merge_parts_keeps_ids_unique_and_chains_parts():
+    parts = [
+        [{"id": "intro", "title": "Intro", "prerequisites": []},
+         {"id": "basics", "title": "Basics", "prerequisites": ["intro"]}],
+        [{"id": "intro", "title": "Intro again", "prerequisites": []},
+         {"id": "advanced", "title": "Advanced", "prerequisites": ["Basics"]}],
+    ]
+    graph = merge_parts(parts, [["Chapter 1"], ["Chapter 2"]], "Subject")
+
+    ids = [n.id for n in graph.nodes]
+    assert ids == ["intro", "basics", "intro_2", "advanced"]
+    # A part's roots follow the previous part; titles resolve across parts
+    assert graph.get_node("intro_2").prerequisites == ["basics"]
+    assert graph.get_node("advanced").prerequisites == ["basics"]
+    graph.validate()
+
+
+def test_merge_parts_drops_forward_and_unknown_prerequisites():
+    parts = [
+        [{"id": "a", "title": "A", "prerequisites": ["c", "nowhere"]}],
+        [{"id": "c", "title": "C", "prerequisites": ["a"]}],
+    ]
+    graph = merge_parts(parts, [[], []], "Subject")
+    assert graph.get_node("a").prerequisites == []
+    assert graph.get_node("c").prerequisites == ["a"]
+
+
+def test_merge_parts_repairs_a_cycle_within_a_part():
+    parts = [[{"id": "a", "title": "A", "prerequisites": ["b"]},
+              {"id": "b", "title": "B", "prerequisites": ["a"]}]]
+    graph = merge_parts(parts, [[]], "Subject")
+    assert graph.get_node("a").prerequisites == []
+    assert graph.get_node("b").prerequisites == ["a"]
+    graph.validate()
+
+
+def test_parse_curriculum_splits_long_text_into_parts(monkeypatch):
+    calls = []
+
+    def architect(prompt, message, max_tokens=0):
+        calls.append(json.loads(message))
+        return fake_architect(prompt, message, max_tokens)
+
+    monkeypatch.setattr(parser, "invoke_agent", architect)
+    # Chapters fit in one segment each, so parts break between chapters
+    text = "".join(_chapter(n, 3_500) for n in range(1, 21))
+
+    curriculum = parse_curriculum(text, "hint")
+
+    assert len(calls) > 1
+    assert all(c["total_parts"] == len(calls) for c in calls)
+    assert calls[-1]["earlier_sections"][0] == "Chapter 1: Topic 1"
+    assert [n["id"] for n in curriculum["nodes"]] == [f"chapter_{n}" for n in range(1, 21)]
+    # The first chapter of a later part follows the last chapter of the previous one
+    first_of_part_2 = calls[1]["sections"][0]["heading"].split(":")[0].lower().replace(" ", "_")
+    node = next(n for n in curriculum["nodes"] if n["id"] == first_of_part_2)
+    assert node["prerequisites"] == [f"chapter_{int(first_of_part_2.split('_')[1]) - 1}"]
+    assert "parse_error" not in curriculum
+
+
+def test_parse_curriculum_reports_failed_parts(monkeypatch):
+    def architect(prompt, message, max_tokens=0):
+        if json.loads(message)["part"] == 2:
+            return "not json at all"
+        return fake_architect(prompt, message, max_tokens)
+
+    monkeypatch.setattr(parser, "invoke_agent", architect)
+    curriculum = parse_curriculum("".join(_chapter(n, 3_500) for n in range(1, 21)), "hint")
+
+    assert curriculum["nodes"]
+    assert curriculum["parse_error"].startswith("1 of")
+
+
+def test_parse_curriculum_with_no_text():
+    assert parse_curriculum("   \n", "hint")["nodes"] == []
+
+
+def test_segment_text_splits_long_sections_on_paragraphs():
+    text = _chapter(1, 9_000) + _chapter(2, 500)
+    segments = segment_text(text, max_chars=4_000)
+
+    assert [s.ref for s in segments] == [f"s{i}" for i in range(1, len(segments) + 1)]
+    assert all(s.end - s.start <= 4_000 for s in segments)
+    assert segments[0].heading == "Chapter 1: Topic 1"
+    assert segments[1].heading == ""
+    # Cuts land on paragraph boundaries and lose no text
+    assert all(text[s.end:s.end + 2] == "\n\n" for s in segments[:2])
+    assert "".join(text[s.start:s.end] for s in segments) == text
+
+
+def test_architect_receives_sections_and_content_comes_from_the_source(monkeypatch):
+    messages = []
+
+    def architect(prompt, message, max_tokens=0):
+        messages.append(json.loads(message))
+        return fake_architect(prompt, message, max_tokens)
+
+    monkeypatch.setattr(parser, "invoke_agent", architect)
+    text = _chapter(1, 6_000) + _chapter(2, 800)
+
+    curriculum = parse_curriculum(text, "hint")
+
+    sections = messages[0]["sections"]
+    assert [s["ref"] for s in sections] == ["s1", "s2", "s3"]
+    assert sections[0]["heading"] == "Chapter 1: Topic 1" and "heading" not in sections[1]
+    first, second = curriculum["nodes"]
+    assert first["content"].startswith("Chapter 1: Topic 1")
+    assert "Material about topic 1." in first["content"].split("\n\n")[-1]
+    assert second["content"] == _chapter(2, 800).strip()
+
+
+def test_unclaimed_segments_go_to_the_preceding_node():
+    nodes = [CurriculumNode(id="a", title="A", description=""),
+             CurriculumNode(id="b", title="B", description="")]
+    section_text = {"s1": "one", "s2": "two", "s3": "three", "s4": "four"}
+
+    _attach_content(nodes, {"a": ["s2"], "b": ["s4", "s2"]}, section_text)
+
+    # s1 has no preceding owner, so it joins the first claimed segment's node
+    assert nodes[0].content == "one\n\ntwo\n\nthree"
+    assert nodes[1].content == "four"
+
+
+def test_repeat_upload_reuses_the_stored_parse(monkeypatch, memory_store):
+    calls = []
+
+    def architect(prompt, message, max_tokens=0):
+        calls.append(message)
+        return fake_architect(prompt, message, max_tokens)
+
+    monkeypatch.setattr(parser, "invoke_agent", architect)
+    text = _chapter(1, 800) + _chapter(2, 800)
+
+    first = get_or_parse_curriculum(text, "Biology")
+    # Whitespace and hint case differences normalize to the same key
+    again = get_or_parse_curriculum(text.replace("\n", "  \n") + "\n\n\n", " biology ")
+
+    assert len(calls) == 1
+    assert again == first
+    assert parse_key(text, "Biology") != parse_key(text, "Chemistry")
+
+
+def test_partial_parses_are_not_cached(monkeypatch, memory_store):
+    def architect(prompt, message, max_tokens=0):
+        if json.loads(message)["part"] == 2:
+            raise RuntimeError("throttled")
+        return fake_architect(prompt, message, max_tokens)
+
+    monkeypatch.setattr(parser, "invoke_agent", architect)
+    text = "".join(_chapter(n, 3_500) for n in range(1, 21))
+
+    assert "parse_error" in get_or_parse_curriculum(text, "hint")
+    assert memory_store.get_parse_result(parse_key(text, "hint")) is None
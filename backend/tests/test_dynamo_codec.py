@@ -0,0 +1,51 @@
+"""Round trips through utils.dynamo_codec and agreement with boto3's serializer."""
+
+from decimal import Decimal
+
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+
+from utils.dynamo_codec import deserialize, deserialize_item, serialize, serialize_item
+
+SESSION_ITEM = {
+    "PK": "SESSION#abc",
+    "SK": "METADATA",
+    "version": 3,
+    "completed_nodes": ["a", "b"],
+    "emotional_aggregates": {"count": 2, "flow_trend": 0.4137, "nodes": {}},
+    "token_usage": {"inputTokens": 1200, "outputTokens": 85},
+    "upload_status": None,
+    "archived": False,
+    "score": -2.5e-07,
+}
+
+
+def test_item_round_trip():
+    assert deserialize_item(serialize_item(SESSION_ITEM)) == SESSION_ITEM
+
+
+@pytest.mark.parametrize("value", [0, 7, -12, 2 ** 40, 0.1, 1.5, -3.25, 1e-9])
+def test_numbers_keep_their_value(value):
+    result = deserialize(serialize(value))
+    assert result == value
+    assert isinstance(result, int) == isinstance(value, int)
+
+
+def test_integral_floats_read_back_as_ints():
+    # Counters written through Decimal or by other tools arrive as "10.0"
+    assert deserialize({"N": "10.0"}) == 10 and isinstance(deserialize({"N": "10.0"}), int)
+    assert deserialize({"N": "1E+3"}) == 1000
+
+
+def test_wire_format_matches_boto3():
+    expected = TypeSerializer().serialize(
+        {"count": 7, "ratio": Decimal("0.5"), "tags": ["x"], "ok": True, "none": None}
+    )
+    assert serialize({"count": 7, "ratio": 0.5, "tags": ["x"], "ok": True, "none": None}) == expected
+
+
+def test_unsupported_values_are_rejected():
+    with pytest.raises(TypeError):
+        serialize({1, 2})
+    with pytest.raises(TypeError):
+        deserialize({"XX": "?"})
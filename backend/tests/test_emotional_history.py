@@ -0,0 +1,184 @@
+"""Columnar emotional history: metrics, trends, packing and incremental reads."""
+
+import random
+
+import numpy as np
+import pytest
+
+import utils.emotion_store as emotion_store
+from models.emotional_state import (
+    DIMENSIONS,
+    EmotionalAggregates,
+    EmotionalHistory,
+    EmotionalState,
+    analyze_sessions,
+)
+from utils.storage import (
+    append_emotional_history,
+    create_session,
+    get_emotion_snapshot,
+    get_session,
+    update_session,
+)
+
+
+def _entries(count, seed=0, start=0):
+    rng = random.Random(seed)
+    entries = []
+    for i in range(start, start + count):
+        state = EmotionalState(*(round(rng.random(), 3) for _ in DIMENSIONS))
+        entries.append({**state.to_dict(), "flow_score": state.flow_score,
+                        "dropout_risk": state.dropout_risk, "message_index": i,
+                        "node_id": f"n{i % 3}",
+                        "timestamp": f"2026-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}"})
+    return entries
+
+
+def test_vectorized_metrics_match_the_scalar_properties():
+    entries = _entries(40)
+    history = EmotionalHistory.from_entries(entries)
+    metrics = history.metrics()
+    for i, entry in enumerate(entries):
+        state = EmotionalState.from_dict(entry)
+        assert metrics["flow_score"][i] == pytest.approx(state.flow_score, abs=1e-6)
+        assert metrics["dropout_risk"][i] == pytest.approx(state.dropout_risk, abs=1e-6)
+        assert metrics["readiness_for_challenge"][i] == pytest.approx(
+            state.readiness_for_challenge, abs=1e-6)
+
+
+def test_trend_matches_the_write_time_aggregates():
+    entries = _entries(30, seed=1)
+    aggregates = EmotionalAggregates.from_history(entries)
+    history = EmotionalHistory.from_entries(entries)
+    assert history.trend("flow_score") == pytest.approx(aggregates.flow_trend, abs=1e-5)
+    assert history.trend("dropout_risk") == pytest.approx(aggregates.dropout_trend, abs=1e-5)
+    assert EmotionalHistory().trend("flow_score") is None
+
+
+def test_rolling_mean_matches_a_loop_and_clamps_the_window():
+    history = EmotionalHistory.from_entries(_entries(12, seed=2))
+    series = history.column("engagement").astype(np.float64)
+    expected = [series[max(0, i - 3):i + 1].mean() for i in range(series.size)]
+    np.testing.assert_allclose(history.rolling_mean("engagement", 4), expected)
+
+    for window in (0, -3):
+        np.testing.assert_allclose(history.rolling_mean("engagement", window), series)
+    assert history.dropout_warning(window=0)["window"] == 1
+    assert analyze_sessions({"s1": history}, window=0)["s1"]["dropout_slope"] == 0.0
+
+
+def test_dropout_warning_tracks_a_rising_risk():
+    rising = EmotionalHistory.from_entries([
+        {"engagement": 0.9 - 0.1 * i, "frustration": 0.1 * i, "message_index": i}
+        for i in range(8)
+    ])
+    warning = rising.dropout_warning()
+    assert warning["warning"] and warning["slope"] > 0 and warning["window"] == 8
+
+    flat = EmotionalHistory.from_entries([{"message_index": i} for i in range(8)])
+    assert flat.dropout_warning() == {"slope": 0.0, "window": 8, "warning": False}
+    assert EmotionalHistory().dropout_warning()["warning"] is False
+
+
+def test_analyze_sessions_matches_per_session_results():
+    histories = {f"s{k}": EmotionalHistory.from_entries(_entries(k * 3, seed=k))
+                 for k in range(5)}
+    results = analyze_sessions(histories)
+    assert "s0" not in results
+    for sid, result in results.items():
+        history = histories[sid]
+        latest = history.latest()
+        assert result["count"] == len(history)
+        assert result["flow_score"] == round(latest.flow_score, 4)
+        assert result["dropout_slope"] == history.dropout_warning()["slope"]
+
+
+def test_bytes_round_trip():
+    history = EmotionalHistory.from_entries(_entries(50, seed=3) + [{"message_index": 50}])
+    restored = EmotionalHistory.from_bytes(history.to_bytes())
+    assert restored.to_list() == history.to_list()
+    assert "timestamp" not in restored.to_list()[-1]
+
+
+def test_downsample_buckets_end_with_the_newest_entry():
+    history = EmotionalHistory.from_entries(_entries(97, seed=4))
+    points = history.downsample(10)
+    assert len(points) == 10
+    assert sum(p["samples"] for p in points) == 97
+    assert points[-1]["message_index"] == 96
+    assert history.downsample(0) == history.entries()
+
+
+def _stored_session(memory_store, entries):
+    create_session({"session_id": "s1", "messages": [], "emotional_history": entries})
+    return get_session("s1")
+
+
+def _append(entries):
+    session = get_session("s1")
+    count = session["emotional_count"]
+    append_emotional_history("s1", count, entries)
+    update_session("s1", {"emotional_count": count + len(entries)})
+
+
+def test_store_reads_only_new_entries_after_a_snapshot(memory_store, monkeypatch):
+    monkeypatch.setattr(emotion_store, "EMOTION_SNAPSHOT_MIN_NEW", 5)
+    entries = _entries(6)
+    session = _stored_session(memory_store, entries)
+    assert emotion_store.load_emotional_history(session).to_list() == \
+        EmotionalHistory.from_entries(entries).to_list()
+    assert get_emotion_snapshot("s1")["next_seq"] == 6
+
+    queries = []
+    original = emotion_store.get_emotional_history
+    monkeypatch.setattr(emotion_store, "get_emotional_history",
+                        lambda session, since=0, **kwargs: queries.append(since)
+                        or original(session, since, **kwargs))
+    assert len(emotion_store.load_emotional_history(get_session("s1"))) == 6
+    assert queries == []
+
+    _append(_entries(2, start=6))
+    assert len(emotion_store.load_emotional_history(get_session("s1"))) == 8
+    assert queries == [6]
+
+
+def test_store_does_not_duplicate_entries_across_a_seq_gap(memory_store, monkeypatch):
+    monkeypatch.setattr(emotion_store, "EMOTION_SNAPSHOT_MIN_NEW", 1)
+    _stored_session(memory_store, _entries(3))
+    # An append whose count update never committed is superseded at a later seq
+    append_emotional_history("s1", 5, _entries(2, start=5))
+    update_session("s1", {"emotional_count": 7})
+
+    first = emotion_store.load_emotional_history(get_session("s1"))
+    assert [e["message_index"] for e in first.to_list()] == [0, 1, 2, 5, 6]
+    assert get_emotion_snapshot("s1")["next_seq"] == 7
+
+    _append(_entries(1, start=7))
+    second = emotion_store.load_emotional_history(get_session("s1"))
+    assert [e["message_index"] for e in second.to_list()] == [0, 1, 2, 5, 6, 7]
+
+
+def test_store_rereads_an_entry_counted_before_it_was_written(memory_store, monkeypatch):
+    monkeypatch.setattr(emotion_store, "EMOTION_SNAPSHOT_MIN_NEW", 1)
+    _stored_session(memory_store, _entries(3))
+    # The chat turn raises emotional_count before it appends the entry
+    update_session("s1", {"emotional_count": 4})
+
+    assert len(emotion_store.load_emotional_history(get_session("s1"))) == 3
+    assert get_emotion_snapshot("s1")["next_seq"] == 3
+
+    append_emotional_history("s1", 3, _entries(1, start=3))
+    history = emotion_store.load_emotional_history(get_session("s1"))
+    assert [e["message_index"] for e in history.to_list()] == [0, 1, 2, 3]
+
+
+def test_store_reads_snapshots_without_next_seq(memory_store, monkeypatch):
+    monkeypatch.setattr(emotion_store, "EMOTION_SNAPSHOT_MIN_NEW", 1)
+    _stored_session(memory_store, _entries(4))
+    emotion_store.load_emotional_history(get_session("s1"))
+    snapshot = get_emotion_snapshot("s1")
+    del snapshot["next_seq"]
+    memory_store.put_emotion_snapshot("s1", snapshot)
+
+    _append(_entries(1, start=4))
+    assert len(emotion_store.load_emotional_history(get_session("s1"))) == 5
@@ -0,0 +1,41 @@
+"""Question bank build: resumable generation and serving unseen questions."""
+
+import agents.question_bank as question_bank
+from agents.question_bank import BAND_STATES, build_question_bank, serve_questions
+from utils.storage import get_question_bank, put_question_bank
+
+CURRICULUM = {"nodes": [{"id": "n1", "title": "Cells", "description": ""},
+                        {"id": "n2", "title": "Genes", "description": ""}]}
+
+
+def _fake_band(calls):
+    def generate(node, band):
+        calls.append((node["id"], band))
+        if band == "light" and node["id"] == "n2":
+            raise RuntimeError("throttled")
+        return {"questions": [{"id": f"{node['id']}-{band}-{i}", "question": str(i)}
+                              for i in range(3)]}
+    return generate
+
+
+def test_build_skips_existing_banks_and_resumes_after_failures(monkeypatch, memory_store):
+    calls = []
+    monkeypatch.setattr(question_bank, "generate_band", _fake_band(calls))
+    put_question_bank("c1", "n1", "standard", {"questions": []})
+
+    pairs = len(CURRICULUM["nodes"]) * len(BAND_STATES)
+    assert build_question_bank(CURRICULUM, "c1") == pairs - 2
+    assert ("n1", "standard") not in calls
+    assert get_question_bank("c1", "n2", "light") is None
+
+    calls.clear()
+    assert build_question_bank(CURRICULUM, "c1") == 0
+    assert calls == [("n2", "light")]
+
+
+def test_serve_questions_skips_asked_ones(memory_store):
+    put_question_bank("c1", "n1", "standard",
+                      {"questions": [{"id": "a"}, {"id": "b"}, {"id": "c"}]})
+    assert serve_questions("c1", "n1", "standard", 2, ["a"]) == [{"id": "b"}, {"id": "c"}]
+    assert serve_questions("c1", "n1", "standard", 3, ["a"]) is None
+    assert serve_questions("c1", "n2", "standard", 1, []) is None
@@ -0,0 +1,208 @@
+"""Behaviour every SessionStore backend must share (see utils.storage).
+
+Each test runs once per backend via the parametrized `store` fixture.
+"""
+
+import threading
+import uuid
+
+import pytest
+
+from utils.storage import (
+    EMOTIONS,
+    MESSAGES,
+    SessionConflict,
+    SessionStore,
+    get_emotional_history,
+    get_messages,
+)
+
+CURRICULUM = {
+    "subject": "History",
+    "nodes": [
+        {"id": "a", "title": "A", "prerequisites": [], "content": "First"},
+        {"id": "b", "title": "B", "prerequisites": ["a"], "content": "Second"},
+    ],
+}
+
+
+def _new_session(store: SessionStore, **fields) -> str:
+    session_id = str(uuid.uuid4())
+    store.create_session({"session_id": session_id, "current_node_id": "a", **fields})
+    return session_id
+
+
+def test_create_and_get(store: SessionStore) -> None:
+    session_id = _new_session(store, curriculum=CURRICULUM, token_usage={"inputTokens": 3})
+    session = store.get_session(session_id)
+    assert session["session_id"] == session_id
+    assert session["current_node_id"] == "a"
+    assert session["node_count"] == 2
+    assert session["message_count"] == 0 and session["emotional_count"] == 0
+    assert session["token_usage"] == {"inputTokens": 3}
+    assert "curriculum" not in session
+    assert store.get_curriculum(session["curriculum_hash"]) == CURRICULUM
+    assert store.get_session("missing-" + session_id) is None
+
+
+def test_projection(store: SessionStore) -> None:
+    session_id = _new_session(store, completed_nodes=["a"])
+    session = store.get_session(session_id, fields=["completed_nodes", "not_there"])
+    assert session == {"session_id": session_id, "completed_nodes": ["a"]}
+
+
+def test_numbers_round_trip(store: SessionStore) -> None:
+    session_id = _new_session(store)
+    store.update_session(session_id, {"score": 0.1, "count": 7, "nested": {"x": [1, 2.5]}})
+    session = store.get_session(session_id)
+    assert session["score"] == 0.1 and isinstance(session["score"], float)
+    assert session["count"] == 7 and isinstance(session["count"], int)
+    assert session["nested"] == {"x": [1, 2.5]}
+
+
+def test_versioned_updates(store: SessionStore) -> None:
+    session_id = _new_session(store)
+    assert store.get_session(session_id).get("version", 0) == 0
+    assert store.update_session(session_id, {"current_node_id": "b"}, expected_version=0) == 1
+    assert store.update_session(session_id, {"completed_nodes": ["a"]}) == 2
+    with pytest.raises(SessionConflict):
+        store.update_session(session_id, {"current_node_id": "c"}, expected_version=1)
+    session = store.get_session(session_id)
+    assert session["version"] == 2 and session["current_node_id"] == "b"
+
+
+def test_concurrent_conditional_writes(store: SessionStore) -> None:
+    session_id = _new_session(store)
+    winners = []
+
+    def attempt():
+        try:
+            store.update_session(session_id, {"winner": threading.get_ident()}, expected_version=0)
+            winners.append(threading.get_ident())
+        except SessionConflict:
+            pass
+
+    threads = [threading.Thread(target=attempt) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(winners) == 1, f"{len(winners)} writers won the same version"
+    assert store.get_session(session_id)["winner"] == winners[0]
+
+
+def test_history(store: SessionStore) -> None:
+    session_id = _new_session(store)
+    messages = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}"}
+                for i in range(7)]
+    store.append_history(session_id, MESSAGES, 0, messages[:4])
+    store.append_history(session_id, MESSAGES, 4, messages[4:])
+    assert store.query_history(session_id, MESSAGES) == messages
+    assert store.query_history(session_id, MESSAGES, since=5) == messages[5:]
+    assert store.query_history(session_id, MESSAGES, last_n=3) == messages[-3:]
+    assert store.query_history(session_id, MESSAGES, last_n=0) == []
+    assert store.query_history(session_id, MESSAGES, since=5, last_n=0) == []
+    assert store.query_history(session_id, MESSAGES, since=5, with_seq=True) == \
+        [(5, messages[5]), (6, messages[6])]
+    assert store.query_history(session_id, MESSAGES, last_n=1, with_seq=True) == [(6, messages[6])]
+    assert store.query_history(session_id, EMOTIONS) == []
+
+
+def test_inline_history_honours_last_n() -> None:
+    session = {"session_id": "legacy", "messages": [{"content": f"m{i}"} for i in range(4)]}
+    assert get_messages(session, last_n=2) == session["messages"][-2:]
+    assert get_messages(session, last_n=0) == []
+    assert get_messages(session) == session["messages"]
+    assert get_emotional_history({"emotional_history": [{"a": 1}, {"b": 2}]},
+                                 since=1, with_seq=True) == [(1, {"b": 2})]
+
+
+def test_dynamodb_history_writes_are_chunked_and_retried(dynamodb_store, monkeypatch) -> None:
+    session_id = _new_session(dynamodb_store)
+    entries = [{"flow_score": i / 10, "message_index": i} for i in range(60)]
+    original = dynamodb_store.client.batch_write_item
+    sizes = []
+
+    def flaky(RequestItems):
+        # Leave the last item of the first request unprocessed
+        items = RequestItems[dynamodb_store.table_name]
+        sizes.append(len(items))
+        if len(sizes) == 1:
+            original(RequestItems={dynamodb_store.table_name: items[:-1]})
+            return {"UnprocessedItems": {dynamodb_store.table_name: items[-1:]}}
+        return original(RequestItems=RequestItems)
+
+    monkeypatch.setattr(dynamodb_store.client, "batch_write_item", flaky)
+    monkeypatch.setattr("utils.dynamo.time.sleep", lambda seconds: None)
+    dynamodb_store.append_history(session_id, EMOTIONS, 0, entries)
+
+    assert sizes == [25, 1, 25, 10]
+    assert dynamodb_store.query_history(session_id, EMOTIONS) == entries
+
+
+def test_dynamodb_migrates_inline_history(dynamodb_store) -> None:
+    messages = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    history = [{"flow_score": 0.25, "message_index": 1}]
+    dynamodb_store.put_session("legacy", {"session_id": "legacy", "messages": messages,
+                                          "emotional_history": history})
+
+    session = dynamodb_store.migrate_inline_history(dynamodb_store.get_session("legacy"))
+
+    stored = dynamodb_store.get_session("legacy")
+    assert "messages" not in stored and "emotional_history" not in stored
+    assert stored["message_count"] == session["message_count"] == 2
+    assert stored["emotional_count"] == 1
+    assert dynamodb_store.query_history("legacy", MESSAGES) == messages
+    assert dynamodb_store.query_history("legacy", EMOTIONS) == history
+
+
+def test_history_since(store: SessionStore) -> None:
+    session_id = _new_session(store)
+    entries = [
+        {"flow_score": 0.1},
+        {"flow_score": 0.2, "timestamp": "2026-01-01T10:00:00"},
+        {"flow_score": 0.3, "timestamp": "2026-01-01T11:00:00"},
+    ]
+    store.append_history(session_id, EMOTIONS, 0, entries)
+    assert store.history_since(session_id, EMOTIONS, "2026-01-01T10:30:00") == entries[2:]
+    assert store.history_since(session_id, EMOTIONS, "2026-01-01T09:00:00") == entries[1:]
+
+
+def test_batch_get(store: SessionStore) -> None:
+    ids = [_new_session(store, completed_nodes=[str(i)]) for i in range(5)]
+    found = store.batch_get_sessions(ids + ["missing", ids[0]], ["completed_nodes"])
+    assert set(found) == set(ids)
+    assert found[ids[3]] == {"session_id": ids[3], "completed_nodes": ["3"]}
+
+
+def test_documents(store: SessionStore) -> None:
+    key = str(uuid.uuid4())
+    assert store.get_cache_item(f"TEST#{key}", "TEST") is None
+    store.put_cache_item(f"TEST#{key}", "TEST", {"v": 1}, ttl_seconds=60)
+    assert store.get_cache_item(f"TEST#{key}", "TEST") == {"v": 1}
+    store.put_cache_item(f"TEST#{key}", "EXPIRED", {"v": 1}, ttl_seconds=-1)
+    assert store.get_cache_item(f"TEST#{key}", "EXPIRED") is None
+
+    store.put_question_bank(key, "a", "light", {"questions": [{"id": "q1"}]})
+    assert store.get_question_bank(key, "a", "light") == {"questions": [{"id": "q1"}]}
+    assert store.get_question_bank(key, "a", "standard") is None
+
+    store.put_adaptation(key, "a", "default", {"content": "lesson"})
+    assert store.get_adaptation(key, "a", "default") == {"content": "lesson"}
+    assert store.get_adaptation(key, "a", "depth=deep_dive") is None
+
+    assert store.get_strategy_demand(key) is None
+    store.put_strategy_demand(key, {"default": {"count": 2, "state": {"engagement": 0.6}}})
+    assert store.get_strategy_demand(key) == {"default": {"count": 2, "state": {"engagement": 0.6}}}
+
+    assert store.get_parse_result(key) is None
+    store.put_parse_result(key, {"curriculum_hash": "abc", "version": "v1"})
+    assert store.get_parse_result(key) == {"curriculum_hash": "abc", "version": "v1"}
+
+    assert store.get_emotion_snapshot(key) is None
+    store.put_emotion_snapshot(key, {"count": 2, "data": "RU1IMQ=="})
+    assert store.get_emotion_snapshot(key) == {"count": 2, "data": "RU1IMQ=="}
+
+    # Curricula are content-addressed and written once
+    first = store.put_curriculum(CURRICULUM)
+    assert store.put_curriculum(dict(CURRICULUM)) == first
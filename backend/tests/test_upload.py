@@ -0,0 +1,141 @@
+"""Asynchronous upload processing: claims, redelivery and status transitions."""
+
+import io
+import json
+import time
+
+import pytest
+
+import handlers.upload as upload
+from utils.storage import get_session, update_session
+
+CURRICULUM = {
+    "subject": "Biology",
+    "nodes": [
+        {"id": "cells", "title": "Cells", "prerequisites": [], "content": "Cells."},
+        {"id": "dna", "title": "DNA", "prerequisites": ["cells"], "content": "DNA."},
+    ],
+}
+
+
+class FakeS3:
+    def __init__(self, body: bytes = b"Chapter 1\nCells are small."):
+        self.body = body
+        self.gets = []
+
+    def get_object(self, Bucket, Key):
+        self.gets.append(Key)
+        return {"Body": io.BytesIO(self.body)}
+
+    def put_object(self, **kwargs):
+        pass
+
+    def generate_presigned_post(self, Bucket, Key, Conditions, ExpiresIn):
+        return {"url": f"https://{Bucket}.s3.amazonaws.com", "fields": {"key": Key}}
+
+
+@pytest.fixture
+def s3(monkeypatch, memory_store):
+    fake = FakeS3()
+    monkeypatch.setattr(upload, "s3_client", fake)
+    monkeypatch.setattr(upload, "start_precompute", lambda session_id: None)
+    monkeypatch.setattr(upload, "get_or_parse_curriculum", lambda raw, subject: CURRICULUM)
+    return fake
+
+
+def _new_upload() -> str:
+    response = upload.lambda_handler(
+        {
+            "rawPath": "/api/upload/url",
+            "requestContext": {"http": {"method": "POST"}},
+            "body": json.dumps({"filename": "bio.txt", "subject": "Biology"}),
+        },
+        None,
+    )
+    assert response["statusCode"] == 200
+    return json.loads(response["body"])["session_id"]
+
+
+def _deliver(session_id: str) -> None:
+    upload.s3_handler(
+        {"detail": {"bucket": {"name": "bucket"},
+                    "object": {"key": f"uploads/{session_id}/source.txt"}}},
+        None,
+    )
+
+
+def _status(session_id: str) -> dict:
+    response = upload.lambda_handler(
+        {"requestContext": {"http": {"method": "GET"}}, "pathParameters": {"id": session_id}},
+        None,
+    )
+    return json.loads(response["body"])
+
+
+def test_pending_upload_is_parsed_to_ready(s3):
+    session_id = _new_upload()
+    assert _status(session_id)["status"] == "pending"
+
+    _deliver(session_id)
+
+    status = _status(session_id)
+    assert status["status"] == "ready"
+    assert [n["id"] for n in status["curriculum"]["nodes"]] == ["cells", "dna"]
+    assert get_session(session_id)["current_node_id"] == "cells"
+
+
+def test_redelivery_after_ready_is_a_no_op(s3):
+    session_id = _new_upload()
+    _deliver(session_id)
+    _deliver(session_id)
+    assert len(s3.gets) == 1
+
+
+def test_redelivery_while_processing_is_a_no_op(s3):
+    session_id = _new_upload()
+    assert upload._claim_upload(session_id) is not None
+
+    _deliver(session_id)
+
+    assert s3.gets == []
+    assert _status(session_id)["status"] == "processing"
+
+
+def test_expired_processing_lease_can_be_reclaimed(s3):
+    session_id = _new_upload()
+    update_session(session_id, {"upload_status": "processing",
+                                "claimed_at": int(time.time()) - upload.UPLOAD_CLAIM_LEASE - 1})
+
+    _deliver(session_id)
+
+    assert len(s3.gets) == 1
+    assert _status(session_id)["status"] == "ready"
+
+
+def test_failure_is_reported_and_can_be_retried(s3, monkeypatch):
+    session_id = _new_upload()
+    s3.body = b"   "
+    _deliver(session_id)
+    status = _status(session_id)
+    assert status["status"] == "failed"
+    assert "No text" in status["error"]
+
+    s3.body = b"Chapter 1\nCells."
+    _deliver(session_id)
+    assert _status(session_id)["status"] == "ready"
+
+
+def test_failure_does_not_overwrite_a_newer_claim(s3):
+    session_id = _new_upload()
+    _, version = upload._claim_upload(session_id)
+    update_session(session_id, {"upload_status": "ready"})
+
+    upload._mark_failed(session_id, version, "stale delivery")
+
+    assert _status(session_id)["status"] == "ready"
+
+
+def test_unknown_session_is_not_created(s3):
+    _deliver("no-such-session")
+    assert get_session("no-such-session") is None
+    assert s3.gets == []
@@ -1,17 +1,25 @@
 """AWS Bedrock Converse API utilities for invoking specialist and orchestrator agents."""
 
+import contextvars
 import json
 import logging
 import os
 import re
+import threading
+import time
 from typing import Union
 
 import boto3
 
+from utils.tracing import child_span, record_usage, span, traced
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 MODEL_ID = os.environ.get("BEDROCK_MODEL_ID", "anthropic.claude-sonnet-4-20250514")
+PROMPT_CACHING = os.environ.get("PROMPT_CACHING_ENABLED", "true").lower() == "true"
+
+CACHE_POINT = {"cachePoint": {"type": "default"}}
 
 bedrock_client = boto3.client(
     "bedrock-runtime",
@@ -42,6 +50,93 @@ def extract_json(text: str) -> dict:
     raise ValueError(f"Could not extract JSON from response: {text[:200]}")
 
 
+def _system_blocks(system_prompt: str, system_suffix: str = "") -> list:
+    """Build system blocks with a cache checkpoint after the stable prompt.
+
+    Anything that changes between calls (e.g. the rolling conversation summary)
+    goes in system_suffix, after the checkpoint, so it does not invalidate the
+    cached prefix.
+    """
+    blocks = [{"text": system_prompt}]
+    if PROMPT_CACHING:
+        blocks.append(CACHE_POINT)
+    if system_suffix:
+        blocks.append({"text": system_suffix})
+    return blocks
+
+
+def _tool_config(tools: list) -> dict:
+    """Tool config with a cache checkpoint after the (static) tool specs."""
+    return {"tools": tools + [CACHE_POINT] if PROMPT_CACHING else tools}
+
+
+def _cached_messages(messages: list) -> list:
+    """Copy messages with a cache checkpoint on the last one.
+
+    Successive tool-use iterations of a turn then reuse the conversation prefix
+    written by the previous iteration.
+    """
+    if not PROMPT_CACHING or not messages:
+        return messages
+    last = messages[-1]
+    return messages[:-1] + [{**last, "content": last["content"] + [CACHE_POINT]}]
+
+
+USAGE_KEYS = (
+    "inputTokens",
+    "outputTokens",
+    "cacheReadInputTokens",
+    "cacheWriteInputTokens",
+)
+
+
+class UsageMeter:
+    """Accumulates token usage across every Bedrock call made for one chat turn."""
+
+    def __init__(self):
+        self.totals = {k: 0 for k in USAGE_KEYS}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, usage: dict) -> None:
+        with self._lock:
+            for key in USAGE_KEYS:
+                self.totals[key] += usage.get(key, 0)
+            self.calls += 1
+
+    @property
+    def total_tokens(self) -> int:
+        """Input + output tokens, including cached input."""
+        return sum(self.totals.values())
+
+
+_usage_meter = contextvars.ContextVar("usage_meter", default=None)
+
+
+def start_usage_meter() -> UsageMeter:
+    """Meter all Bedrock calls made from the current context (and tool threads copied from it)."""
+    meter = UsageMeter()
+    _usage_meter.set(meter)
+    return meter
+
+
+def _account_usage(label: str, usage: dict, span_=None) -> None:
+    """Log a call's token usage and add it to the trace span (default: the active one) and usage meter."""
+    logger.info(
+        "%s usage: input=%d output=%d cache_read=%d cache_write=%d",
+        label,
+        usage.get("inputTokens", 0),
+        usage.get("outputTokens", 0),
+        usage.get("cacheReadInputTokens", 0),
+        usage.get("cacheWriteInputTokens", 0),
+    )
+    record_usage(usage, span_)
+    meter = _usage_meter.get()
+    if meter is not None:
+        meter.add(usage)
+
+
+@traced("invoke_agent")
 def invoke_agent(
     system_prompt: str, user_message: str, tools: list = None, max_tokens: int = 8192
 ) -> Union[str, dict]:
@@ -55,11 +150,11 @@ def invoke_agent(
     kwargs = {
         "modelId": MODEL_ID,
         "messages": messages,
-        "system": [{"text": system_prompt}],
+        "system": _system_blocks(system_prompt),
         "inferenceConfig": {"maxTokens": max_tokens, "temperature": 0.7},
     }
     if tools:
-        kwargs["toolConfig"] = {"tools": tools}
+        kwargs["toolConfig"] = _tool_config(tools)
 
     logger.info("Invoking Bedrock agent with model %s", MODEL_ID)
     response = bedrock_client.converse(**kwargs)
@@ -70,6 +165,7 @@ def invoke_agent(
     content_blocks = message.get("content", [])
     logger.info("Agent response stop_reason=%s, blocks=%d",
                 response.get("stopReason"), len(content_blocks))
+    _account_usage("Agent", response.get("usage", {}))
 
     # If there are tool use blocks, return the full message for orchestrator processing
     has_tool_use = any(b.get("toolUse") for b in content_blocks)
@@ -84,17 +180,119 @@ def invoke_agent(
     return "\n".join(text_parts)
 
 
-def invoke_orchestrator(system_prompt: str, messages: list, tools: list) -> dict:
+def _orchestrator_kwargs(
+    system_prompt: str, messages: list, tools: list, system_suffix: str, max_tokens: int
+) -> dict:
+    kwargs = {
+        "modelId": MODEL_ID,
+        "messages": _cached_messages(messages),
+        "system": _system_blocks(system_prompt, system_suffix),
+        "inferenceConfig": {"maxTokens": max_tokens, "temperature": 0.7},
+    }
+    if tools:
+        kwargs["toolConfig"] = _tool_config(tools)
+    return kwargs
+
+
+@traced("invoke_orchestrator")
+def invoke_orchestrator(
+    system_prompt: str,
+    messages: list,
+    tools: list,
+    system_suffix: str = "",
+    max_tokens: int = 4096,
+) -> dict:
     """Invoke the orchestrator with full message history and tools.
 
+    The tool specs, system_prompt and message history are each followed by a
+    cache checkpoint; per-turn context that changes often belongs in system_suffix.
+    An empty tools list sends no toolConfig (history must then contain no tool blocks).
+
     Returns:
         The raw Bedrock Converse API response dict.
     """
-    kwargs = {
-        "modelId": MODEL_ID,
-        "messages": messages,
-        "system": [{"text": system_prompt}],
-        "toolConfig": {"tools": tools},
-        "inferenceConfig": {"maxTokens": 4096, "temperature": 0.7},
-    }
-    return bedrock_client.converse(**kwargs)
+    kwargs = _orchestrator_kwargs(system_prompt, messages, tools, system_suffix, max_tokens)
+    response = bedrock_client.converse(**kwargs)
+    _account_usage("Orchestrator", response.get("usage", {}))
+    return response
+
+
+def stream_orchestrator(
+    system_prompt: str,
+    messages: list,
+    tools: list,
+    system_suffix: str = "",
+    max_tokens: int = 4096,
+):
+    """Invoke the orchestrator with ConverseStream, yielding text as it is generated.
+
+    Yields:
+        ("text", delta) tuples while the model writes, then a single
+        ("response", response) tuple whose value has the same shape as the
+        dict returned by invoke_orchestrator, so the tool-use loop can treat
+        both paths identically.
+    """
+    # Not entered with span(): the generator yields to the caller mid-stream
+    orchestrator_span = child_span("invoke_orchestrator", streaming=True)
+    try:
+        kwargs = _orchestrator_kwargs(
+            system_prompt, messages, tools, system_suffix, max_tokens
+        )
+        response = bedrock_client.converse_stream(**kwargs)
+
+        blocks = {}
+        tool_inputs = {}
+        stop_reason = ""
+        usage = {}
+
+        for event in response["stream"]:
+            if "contentBlockStart" in event:
+                start = event["contentBlockStart"]
+                tool_use = start.get("start", {}).get("toolUse")
+                if tool_use:
+                    index = start["contentBlockIndex"]
+                    blocks[index] = {
+                        "toolUse": {
+                            "toolUseId": tool_use["toolUseId"],
+                            "name": tool_use["name"],
+                        }
+                    }
+                    tool_inputs[index] = []
+            elif "contentBlockDelta" in event:
+                delta_event = event["contentBlockDelta"]
+                index = delta_event["contentBlockIndex"]
+                delta = delta_event.get("delta", {})
+                if "text" in delta:
+                    if "first_token_ms" not in orchestrator_span.attributes:
+                        orchestrator_span.set(first_token_ms=round(
+                            (time.perf_counter() - orchestrator_span.start) * 1000, 1
+                        ))
+                    blocks.setdefault(index, {"text": ""})
+                    blocks[index]["text"] += delta["text"]
+                    yield ("text", delta["text"])
+                elif "toolUse" in delta:
+                    tool_inputs.setdefault(index, []).append(delta["toolUse"].get("input", ""))
+            elif "messageStop" in event:
+                stop_reason = event["messageStop"].get("stopReason", "")
+            elif "metadata" in event:
+                usage = event["metadata"].get("usage", {})
+
+        # Tool inputs arrive as JSON fragments; assemble them once the block is done
+        for index, parts in tool_inputs.items():
+            raw_input = "".join(parts)
+            blocks[index]["toolUse"]["input"] = json.loads(raw_input) if raw_input else {}
+
+        content_blocks = [blocks[i] for i in sorted(blocks)]
+        logger.info("Orchestrator stream stop_reason=%s, blocks=%d",
+                    stop_reason, len(content_blocks))
+        _account_usage("Orchestrator", usage, orchestrator_span)
+        yield (
+            "response",
+            {
+                "stopReason": stop_reason,
+                "output": {"message": {"role": "assistant", "content": content_blocks}},
+                "usage": usage,
+            },
+        )
+    finally:
+        orchestrator_span.end()
@@ -0,0 +1,85 @@
+"""Two-tier cache: a per-container LRU in front of TTL'd items in the sessions table."""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from utils.storage import get_cache_item, put_cache_item
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class LRUCache:
+    """Thread-safe in-process LRU (tool calls run on a thread pool)."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key: str, value) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+class TwoTierCache:
+    """LRU backed by DynamoDB items keyed PK=<namespace>#<key>, SK=<namespace>."""
+
+    def __init__(self, namespace: str, ttl_seconds: int, maxsize: int = 256):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.memory = LRUCache(maxsize)
+        self.stats = {"memory_hits": 0, "dynamo_hits": 0, "misses": 0}
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._record("memory_hits")
+            return value
+
+        try:
+            value = get_cache_item(f"{self.namespace}#{key}", self.namespace)
+        except Exception as e:
+            logger.warning("Cache %s: DynamoDB read failed: %s", self.namespace, e)
+            value = None
+
+        if value is None:
+            self._record("misses")
+            return None
+        self.memory.put(key, value)
+        self._record("dynamo_hits")
+        return value
+
+    def put(self, key: str, value: dict) -> None:
+        self.memory.put(key, value)
+        try:
+            put_cache_item(
+                f"{self.namespace}#{key}", self.namespace, value, self.ttl_seconds
+            )
+        except Exception as e:
+            logger.warning("Cache %s: DynamoDB write failed: %s", self.namespace, e)
+
+    @property
+    def hit_rate(self) -> float:
+        total = sum(self.stats.values())
+        hits = self.stats["memory_hits"] + self.stats["dynamo_hits"]
+        return hits / total if total else 0.0
+
+    def _record(self, outcome: str) -> None:
+        with self._stats_lock:
+            self.stats[outcome] += 1
+        logger.info("Cache %s: %s (hit_rate=%.2f, stats=%s)",
+                    self.namespace, outcome, self.hit_rate, self.stats)
@@ -0,0 +1,159 @@
+"""Node reading text kept outside the stored curriculum and loaded on demand.
+
+Chapter text dominates a curriculum's size but only the chat turn reads it (and
+only the current node). When a curriculum is stored, node content longer than
+CONTENT_INLINE_MAX characters is written once to a content-addressed object and
+replaced by "content_ref" / "content_length" (UTF-8 bytes); everything else that
+loads the curriculum skips the text.
+
+CONTENT_STORE picks where the text lives:
+    s3      - CURRICULUM_BUCKET under content/ (default with the dynamodb backend)
+    local   - files under CONTENT_DIR, for single-node and offline runs
+    inline  - content stays in the curriculum (default for sqlite / memory)
+
+Reads go through a per-container LRU; a max_chars read of a long object only
+fetches the first bytes with a ranged GET.
+"""
+
+import copy
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CONTENT_STORE = os.environ.get(
+    "CONTENT_STORE",
+    "s3" if os.environ.get("STORAGE_BACKEND", "dynamodb") == "dynamodb" else "inline",
+)
+CONTENT_DIR = os.environ.get("CONTENT_DIR", "mindhacker-content")
+CURRICULUM_BUCKET = os.environ.get("CURRICULUM_BUCKET", "mindhacker-curriculum")
+CONTENT_PREFIX = "content/"
+CONTENT_INLINE_MAX = int(os.environ.get("CONTENT_INLINE_MAX", "2000"))
+CONTENT_CACHE_SIZE = int(os.environ.get("CONTENT_CACHE_SIZE", "64"))
+CONTENT_IO_WORKERS = 8
+
+# UTF-8 needs at most 4 bytes per character
+MAX_BYTES_PER_CHAR = 4
+
+_cache = LRUCache(CONTENT_CACHE_SIZE)
+_s3_client = None
+_s3_lock = threading.Lock()
+
+
+def _s3():
+    global _s3_client
+    if _s3_client is None:
+        with _s3_lock:
+            if _s3_client is None:
+                import boto3
+
+                _s3_client = boto3.client("s3")
+    return _s3_client
+
+
+def _local_path(ref: str) -> str:
+    return os.path.join(CONTENT_DIR, ref[:2], f"{ref}.txt")
+
+
+def _write(ref: str, data: bytes) -> None:
+    if CONTENT_STORE == "s3":
+        _s3().put_object(Bucket=CURRICULUM_BUCKET, Key=f"{CONTENT_PREFIX}{ref}.txt",
+                         Body=data, ContentType="text/plain; charset=utf-8")
+        return
+    path = _local_path(ref)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _read(ref: str, max_bytes: Optional[int] = None) -> bytes:
+    if CONTENT_STORE == "s3":
+        kwargs = {"Bucket": CURRICULUM_BUCKET, "Key": f"{CONTENT_PREFIX}{ref}.txt"}
+        if max_bytes is not None:
+            kwargs["Range"] = f"bytes=0-{max_bytes - 1}"
+        return _s3().get_object(**kwargs)["Body"].read()
+    with open(_local_path(ref), "rb") as f:
+        return f.read(max_bytes if max_bytes is not None else -1)
+
+
+def externalize_content(curriculum: dict) -> dict:
+    """Copy of the curriculum with long node content moved to the content store."""
+    if CONTENT_STORE == "inline" or not curriculum:
+        return curriculum
+
+    externalized = copy.deepcopy(curriculum)
+    writes = {}
+    for node in externalized.get("nodes", []):
+        content = node.get("content") or ""
+        if len(content) <= CONTENT_INLINE_MAX:
+            continue
+        data = content.encode("utf-8")
+        ref = hashlib.sha256(data).hexdigest()
+        writes[ref] = data
+        node["content"] = ""
+        node["content_ref"] = ref
+        node["content_length"] = len(data)
+
+    if writes:
+        with ThreadPoolExecutor(max_workers=min(CONTENT_IO_WORKERS, len(writes))) as pool:
+            list(pool.map(lambda item: _write(*item), writes.items()))
+        logger.info("Content store: wrote %d node texts (%d bytes)",
+                    len(writes), sum(len(d) for d in writes.values()))
+    return externalized
+
+
+def read_content(ref: str, max_chars: Optional[int] = None, length: int = 0) -> str:
+    """Text stored under ref, or its first max_chars characters.
+
+    With the object's byte length (content_length) a prefix read of a long
+    object fetches only the bytes it can need.
+    """
+    full = _cache.get(ref)
+    if full is not None:
+        return full[:max_chars] if max_chars is not None else full
+
+    max_bytes = max_chars * MAX_BYTES_PER_CHAR if max_chars is not None else None
+    if max_bytes is None or (length and length <= max_bytes):
+        full = _read(ref).decode("utf-8")
+        _cache.put(ref, full)
+        return full[:max_chars] if max_chars is not None else full
+
+    prefix_key = f"{ref}:{max_chars}"
+    prefix = _cache.get(prefix_key)
+    if prefix is None:
+        # A cut multi-byte character at the end of the range is dropped
+        prefix = _read(ref, max_bytes).decode("utf-8", errors="ignore")[:max_chars]
+        _cache.put(prefix_key, prefix)
+    return prefix
+
+
+def node_content(node: dict, max_chars: Optional[int] = None) -> str:
+    """A node dict's reading text, whether inline or in the content store."""
+    if node.get("content") or not node.get("content_ref"):
+        content = node.get("content") or ""
+        return content[:max_chars] if max_chars is not None else content
+    return read_content(node["content_ref"], max_chars, node.get("content_length", 0))
+
+
+def hydrate_content(curriculum: dict) -> dict:
+    """Copy of the curriculum with every node's content filled in (for clients)."""
+    nodes = curriculum.get("nodes", [])
+    if not any(n.get("content_ref") and not n.get("content") for n in nodes):
+        return curriculum
+
+    with ThreadPoolExecutor(max_workers=CONTENT_IO_WORKERS) as pool:
+        contents = list(pool.map(node_content, nodes))
+    hydrated = dict(curriculum)
+    hydrated["nodes"] = [{**node, "content": content} for node, content in zip(nodes, contents)]
+    return hydrated
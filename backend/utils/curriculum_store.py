@@ -0,0 +1,58 @@
+"""Shared, content-addressed curriculum reads for session handlers.
+
+Curricula are immutable once stored (the key is their content hash), so a warm
+container can keep them - and the indexed CurriculumGraph built from them - in
+memory indefinitely; the LRUs only bound memory.
+"""
+
+import logging
+import os
+
+from models.curriculum import CurriculumGraph
+from utils.cache import LRUCache
+from utils.storage import get_curriculum
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CURRICULUM_CACHE_SIZE = int(os.environ.get("CURRICULUM_CACHE_SIZE", "32"))
+
+_curricula = LRUCache(CURRICULUM_CACHE_SIZE)
+_graphs = LRUCache(CURRICULUM_CACHE_SIZE)
+
+
+def load_curriculum(session: dict) -> dict:
+    """Return the curriculum a session refers to.
+
+    Sessions created before curricula were shared still embed theirs inline.
+    """
+    if "curriculum" in session:
+        return session["curriculum"]
+
+    c_hash = session.get("curriculum_hash")
+    if not c_hash:
+        return {}
+
+    curriculum = _curricula.get(c_hash)
+    if curriculum is None:
+        curriculum = get_curriculum(c_hash)
+        if curriculum is None:
+            logger.error("Curriculum %s not found for session %s",
+                         c_hash, session.get("session_id"))
+            return {}
+        _curricula.put(c_hash, curriculum)
+    return curriculum
+
+
+def load_graph(session: dict) -> CurriculumGraph:
+    """Return the indexed navigation graph for a session's curriculum."""
+    c_hash = session.get("curriculum_hash")
+    if "curriculum" in session or not c_hash:
+        return CurriculumGraph.from_dict(load_curriculum(session))
+
+    graph = _graphs.get(c_hash)
+    if graph is None:
+        graph = CurriculumGraph.from_dict(load_curriculum(session))
+        if graph.nodes:
+            _graphs.put(c_hash, graph)
+    return graph
@@ -1,82 +1,320 @@
-"""DynamoDB utilities for session persistence."""
+"""DynamoDB storage backend for session persistence.
+
+Single-table layout:
+    PK=SESSION#<id>  SK=METADATA     session fields, message/emotional counts, version
+    PK=SESSION#<id>  SK=MSG#<seq>    one message per item
+    PK=SESSION#<id>  SK=EMO#<seq>    one emotional-history entry per item
+    PK=<kind>#<key>  SK=<sub key>    documents: shared curricula, cache entries,
+                                     question banks (optionally with a ttl)
+
+Messages and emotional-history entries are their own items so each turn writes
+a constant amount regardless of session length. Sessions created before this
+layout keep inline "messages"/"emotional_history" lists until
+migrate_inline_history() moves them out.
+"""
 
-import json
 import os
-from decimal import Decimal
+import time
 from typing import Optional
 
 import boto3
-from boto3.dynamodb.conditions import Key
+
+from utils.dynamo_codec import deserialize_item, serialize, serialize_item
+from utils.storage import EMOTIONS, MESSAGES, SessionConflict, SessionStore, expires_at
 
 TABLE_NAME = os.environ.get("TABLE_NAME", "MindHackerSessions")
 
-dynamodb = boto3.resource(
-    "dynamodb",
-    region_name=os.environ.get("AWS_REGION", "us-east-1"),
-)
-table = dynamodb.Table(TABLE_NAME)
+SEQ_WIDTH = 8
+HISTORY_PAGE_SIZE = 50
+BATCH_GET_SIZE = 100  # BatchGetItem's per-request key limit
+BATCH_WRITE_SIZE = 25  # BatchWriteItem's per-request item limit
+BATCH_RETRIES = 6
+
+
+def _session_pk(session_id: str) -> str:
+    return f"SESSION#{session_id}"
+
+
+def _seq_sk(prefix: str, seq: int) -> str:
+    return f"{prefix}{seq:0{SEQ_WIDTH}d}"
+
+
+def _history_entry(item: dict) -> dict:
+    return deserialize_item({k: v for k, v in item.items() if k not in ("PK", "SK", "seq")})
+
+
+class DynamoDBStore(SessionStore):
+    """Sessions table backend.
+
+    Hot reads and writes use the low-level client so items are converted in one
+    pass by utils.dynamo_codec instead of via Decimal and a JSON round trip.
+    """
+
+    def __init__(self, table_name: str = TABLE_NAME):
+        region = os.environ.get("AWS_REGION", "us-east-1")
+        self.table_name = table_name
+        self.client = boto3.client("dynamodb", region_name=region)
+
+    def _key(self, pk: str, sk: str) -> dict:
+        return {"PK": {"S": pk}, "SK": {"S": sk}}
+
+    # -- sessions -------------------------------------------------------------
+
+    def put_session(self, session_id: str, metadata: dict) -> None:
+        item = {"PK": _session_pk(session_id), "SK": "METADATA", **metadata}
+        self.client.put_item(TableName=self.table_name, Item=serialize_item(item))
 
+    def get_session(self, session_id: str, fields: Optional[list] = None) -> Optional[dict]:
+        kwargs = {}
+        if fields:
+            names = {
+                f"#f{i}": name
+                for i, name in enumerate(dict.fromkeys(["session_id", *fields]))
+            }
+            kwargs = {
+                "ProjectionExpression": ", ".join(names),
+                "ExpressionAttributeNames": names,
+            }
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key=self._key(_session_pk(session_id), "METADATA"),
+            **kwargs,
+        )
+        item = response.get("Item")
+        if item:
+            return deserialize_item(item)
+        return None
 
-class DecimalEncoder(json.JSONEncoder):
-    """JSON encoder that handles Decimal types from DynamoDB."""
+    def batch_get_sessions(self, session_ids: list, fields: list) -> dict:
+        """BatchGetItem 100 keys at a time, retrying unprocessed keys with backoff."""
+        names = {f"#f{i}": name for i, name in enumerate(dict.fromkeys(["session_id", *fields]))}
+        unique_ids = list(dict.fromkeys(session_ids))
+        sessions = {}
 
-    def default(self, o):
-        if isinstance(o, Decimal):
-            return float(o)
-        return super().default(o)
+        for start in range(0, len(unique_ids), BATCH_GET_SIZE):
+            request = {
+                self.table_name: {
+                    "Keys": [
+                        self._key(_session_pk(sid), "METADATA")
+                        for sid in unique_ids[start:start + BATCH_GET_SIZE]
+                    ],
+                    "ProjectionExpression": ", ".join(names),
+                    "ExpressionAttributeNames": names,
+                }
+            }
+            attempt = 0
+            while request:
+                response = self.client.batch_get_item(RequestItems=request)
+                for item in response.get("Responses", {}).get(self.table_name, []):
+                    session = deserialize_item(item)
+                    sessions[session["session_id"]] = session
+                # Throttling or the 16 MB response cap leave keys unprocessed
+                request = response.get("UnprocessedKeys") or {}
+                if request:
+                    if attempt >= BATCH_RETRIES:
+                        raise RuntimeError(
+                            f"{len(request[self.table_name]['Keys'])} session keys still unprocessed"
+                        )
+                    time.sleep(min(0.05 * 2 ** attempt, 2.0))
+                    attempt += 1
 
+        return sessions
 
-def _convert_floats(obj):
-    """Convert float values to Decimal for DynamoDB storage."""
-    if isinstance(obj, float):
-        return Decimal(str(obj))
-    elif isinstance(obj, dict):
-        return {k: _convert_floats(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [_convert_floats(v) for v in obj]
-    return obj
+    def update_session(
+        self, session_id: str, updates: dict, expected_version: Optional[int] = None
+    ) -> int:
+        expressions = ["#version = if_not_exists(#version, :zero) + :one"]
+        values = {":zero": {"N": "0"}, ":one": {"N": "1"}}
+        names = {"#version": "version"}
 
+        for i, (key, val) in enumerate(updates.items()):
+            attr_name = f"#attr{i}"
+            attr_val = f":val{i}"
+            expressions.append(f"{attr_name} = {attr_val}")
+            names[attr_name] = key
+            values[attr_val] = serialize(val)
 
-def create_session(session_data: dict) -> dict:
-    """Create a new session in DynamoDB."""
-    item = _convert_floats(
-        {
-            "PK": f"SESSION#{session_data['session_id']}",
-            "SK": "METADATA",
-            **session_data,
+        kwargs = {}
+        if expected_version is not None:
+            values[":expected"] = serialize(expected_version)
+            kwargs["ConditionExpression"] = (
+                "attribute_exists(PK) AND (attribute_not_exists(#version) OR #version = :expected)"
+                if expected_version == 0
+                else "attribute_exists(PK) AND #version = :expected"
+            )
+
+        try:
+            response = self.client.update_item(
+                TableName=self.table_name,
+                Key=self._key(_session_pk(session_id), "METADATA"),
+                UpdateExpression="SET " + ", ".join(expressions),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues="UPDATED_NEW",
+                **kwargs,
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            raise SessionConflict(
+                f"Session {session_id} changed since version {expected_version}"
+            ) from None
+        return int(response["Attributes"]["version"]["N"])
+
+    def migrate_inline_history(self, session: dict) -> dict:
+        """Move a legacy session's inline history lists into per-entry items.
+
+        Returns the session in the append-only layout (counts set, lists removed).
+        """
+        if "message_count" in session:
+            return session
+
+        session_id = session["session_id"]
+        messages = session.pop("messages", [])
+        emotional_history = session.pop("emotional_history", [])
+        self.append_history(session_id, MESSAGES, 0, messages)
+        self.append_history(session_id, EMOTIONS, 0, emotional_history)
+        self.client.update_item(
+            TableName=self.table_name,
+            Key=self._key(_session_pk(session_id), "METADATA"),
+            UpdateExpression=(
+                "SET message_count = :m, emotional_count = :e REMOVE messages, emotional_history"
+            ),
+            ExpressionAttributeValues={
+                ":m": serialize(len(messages)),
+                ":e": serialize(len(emotional_history)),
+            },
+        )
+        session["message_count"] = len(messages)
+        session["emotional_count"] = len(emotional_history)
+        return session
+
+    # -- append-only history --------------------------------------------------
+
+    def append_history(self, session_id: str, kind: str, start_seq: int, entries: list) -> None:
+        if not entries:
+            return
+        pk = _session_pk(session_id)
+        requests = [
+            {"PutRequest": {"Item": serialize_item(
+                {"PK": pk, "SK": _seq_sk(kind, start_seq + offset),
+                 "seq": start_seq + offset, **entry}
+            )}}
+            for offset, entry in enumerate(entries)
+        ]
+        for start in range(0, len(requests), BATCH_WRITE_SIZE):
+            request = {self.table_name: requests[start:start + BATCH_WRITE_SIZE]}
+            attempt = 0
+            while request:
+                response = self.client.batch_write_item(RequestItems=request)
+                # Throttled writes come back unprocessed
+                request = response.get("UnprocessedItems") or {}
+                if request:
+                    if attempt >= BATCH_RETRIES:
+                        raise RuntimeError(
+                            f"{len(request[self.table_name])} history items still unprocessed"
+                        )
+                    time.sleep(min(0.05 * 2 ** attempt, 2.0))
+                    attempt += 1
+
+    def query_history(
+        self, session_id: str, kind: str, since: int = 0, last_n: Optional[int] = None,
+        with_seq: bool = False,
+    ) -> list:
+        """Page through history items with seq >= since, or only the newest last_n of them."""
+        if last_n == 0:
+            # DynamoDB rejects Limit=0
+            return []
+        values = {":pk": {"S": _session_pk(session_id)}}
+        if since:
+            condition = "PK = :pk AND SK BETWEEN :lo AND :hi"
+            values[":lo"] = {"S": _seq_sk(kind, since)}
+            values[":hi"] = {"S": _seq_sk(kind, 10 ** SEQ_WIDTH - 1)}
+        else:
+            condition = "PK = :pk AND begins_with(SK, :prefix)"
+            values[":prefix"] = {"S": kind}
+
+        kwargs = {
+            "TableName": self.table_name,
+            "KeyConditionExpression": condition,
+            "ExpressionAttributeValues": values,
         }
-    )
-    table.put_item(Item=item)
-    return session_data
-
-
-def get_session(session_id: str) -> Optional[dict]:
-    """Retrieve a session from DynamoDB by session ID."""
-    response = table.get_item(
-        Key={"PK": f"SESSION#{session_id}", "SK": "METADATA"}
-    )
-    item = response.get("Item")
-    if item:
-        return json.loads(json.dumps(item, cls=DecimalEncoder))
-    return None
-
-
-def update_session(session_id: str, updates: dict) -> None:
-    """Update specific fields of a session in DynamoDB."""
-    expressions = []
-    values = {}
-    names = {}
-
-    for i, (key, val) in enumerate(updates.items()):
-        attr_name = f"#attr{i}"
-        attr_val = f":val{i}"
-        expressions.append(f"{attr_name} = {attr_val}")
-        names[attr_name] = key
-        values[attr_val] = _convert_floats(val)
-
-    table.update_item(
-        Key={"PK": f"SESSION#{session_id}", "SK": "METADATA"},
-        UpdateExpression="SET " + ", ".join(expressions),
-        ExpressionAttributeNames=names,
-        ExpressionAttributeValues=values,
-    )
+        if last_n is not None:
+            kwargs.update(ScanIndexForward=False, Limit=last_n)
+
+        items = []
+        while True:
+            response = self.client.query(**kwargs)
+            items.extend(response.get("Items", []))
+            if last_n is not None and len(items) >= last_n:
+                items = items[:last_n]
+                break
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+            if last_n is not None:
+                kwargs["Limit"] = last_n - len(items)
+
+        if last_n is not None:
+            items.reverse()
+        if with_seq:
+            return [(int(item["seq"]["N"]), _history_entry(item)) for item in items]
+        return [_history_entry(item) for item in items]
+
+    def history_since(self, session_id: str, kind: str, timestamp: str) -> list:
+        """Read newest first and stop paging at the first entry older than timestamp.
+
+        The cost follows the size of the window rather than the length of the session.
+        """
+        kwargs = {
+            "TableName": self.table_name,
+            "KeyConditionExpression": "PK = :pk AND begins_with(SK, :prefix)",
+            "ExpressionAttributeValues": {
+                ":pk": {"S": _session_pk(session_id)},
+                ":prefix": {"S": kind},
+            },
+            "ScanIndexForward": False,
+            "Limit": HISTORY_PAGE_SIZE,
+        }
+        entries = []
+        while True:
+            response = self.client.query(**kwargs)
+            for item in response.get("Items", []):
+                entry = _history_entry(item)
+                if entry.get("timestamp", "") < timestamp:
+                    entries.reverse()
+                    return entries
+                entries.append(entry)
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        entries.reverse()
+        return entries
+
+    # -- keyed documents ------------------------------------------------------
+
+    def get_document(self, pk: str, sk: str, attribute: str) -> Optional[dict]:
+        response = self.client.get_item(TableName=self.table_name, Key=self._key(pk, sk))
+        item = response.get("Item")
+        if not item:
+            return None
+        # DynamoDB TTL deletes lazily, so the expiry is checked here as well
+        if "ttl" in item and int(item["ttl"]["N"]) < time.time():
+            return None
+        return deserialize_item(item).get(attribute)
+
+    def put_document(
+        self,
+        pk: str,
+        sk: str,
+        attribute: str,
+        value,
+        ttl_seconds: Optional[int] = None,
+        if_absent: bool = False,
+    ) -> None:
+        item = {"PK": pk, "SK": sk, attribute: value}
+        if ttl_seconds:
+            item["ttl"] = expires_at(ttl_seconds)
+        kwargs = {"ConditionExpression": "attribute_not_exists(PK)"} if if_absent else {}
+        try:
+            self.client.put_item(TableName=self.table_name, Item=serialize_item(item), **kwargs)
+        except self.client.exceptions.ConditionalCheckFailedException:
+            pass
@@ -0,0 +1,87 @@
+"""Single-pass conversion between plain Python values and DynamoDB's wire format.
+
+The boto3 resource layer turns every number into a Decimal, which then needs a
+second walk (or a JSON round trip) to become something json.dumps and the
+models accept. These helpers work on the low-level client's typed attribute
+values directly, so an item is converted in one pass in either direction:
+numbers become int or float, and floats are written without going through
+Decimal.
+"""
+
+from decimal import Decimal
+
+
+def _number(text: str):
+    if "." in text or "e" in text or "E" in text:
+        value = float(text)
+        # Keep counters and sequence numbers usable as ints
+        return int(value) if value.is_integer() and abs(value) < 2 ** 53 else value
+    return int(text)
+
+
+def deserialize(value: dict):
+    """Convert one typed attribute value ({"S": ...}, {"M": ...}, ...) to Python."""
+    for tag, inner in value.items():
+        if tag == "S":
+            return inner
+        if tag == "N":
+            return _number(inner)
+        if tag == "M":
+            return {k: deserialize(v) for k, v in inner.items()}
+        if tag == "L":
+            return [deserialize(v) for v in inner]
+        if tag == "BOOL":
+            return inner
+        if tag == "NULL":
+            return None
+        if tag == "NS":
+            return [_number(v) for v in inner]
+        if tag in ("SS", "BS", "B"):
+            return list(inner) if tag != "B" else inner
+        raise TypeError(f"Unsupported DynamoDB type: {tag}")
+    raise TypeError("Empty DynamoDB attribute value")
+
+
+def deserialize_item(item: dict) -> dict:
+    """Convert a low-level item ({name: typed value}) to a plain dict."""
+    return {k: deserialize(v) for k, v in item.items()}
+
+
+def serialize(value) -> dict:
+    """Convert a Python value to a typed attribute value."""
+    kind = type(value)
+    if kind is str:
+        return {"S": value}
+    if kind is bool:
+        return {"BOOL": value}
+    if kind is int or kind is Decimal:
+        return {"N": str(value)}
+    if kind is float:
+        return {"N": repr(value)}
+    if kind is dict:
+        return {"M": {k: serialize(v) for k, v in value.items()}}
+    if kind is list or kind is tuple:
+        return {"L": [serialize(v) for v in value]}
+    if value is None:
+        return {"NULL": True}
+    if kind is bytes:
+        return {"B": value}
+    # Subclasses (e.g. IntEnum, OrderedDict) take the slower isinstance path
+    if isinstance(value, bool):
+        return {"BOOL": bool(value)}
+    if isinstance(value, (int, Decimal)):
+        return {"N": str(value)}
+    if isinstance(value, float):
+        return {"N": repr(float(value))}
+    if isinstance(value, str):
+        return {"S": str(value)}
+    if isinstance(value, dict):
+        return {"M": {k: serialize(v) for k, v in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {"L": [serialize(v) for v in value]}
+    raise TypeError(f"Cannot store {kind.__name__} in DynamoDB")
+
+
+def serialize_item(item: dict) -> dict:
+    """Convert a plain dict to a low-level item."""
+    return {k: serialize(v) for k, v in item.items()}
@@ -0,0 +1,77 @@
+"""Columnar emotional-history reads for the progress API.
+
+A session's history is stored one entry per item, so reading thousands of
+entries to analyse it is slow. The packed EmotionalHistory (to_bytes) is kept
+as a snapshot document next to the entries; a read loads the snapshot, queries
+only the entries appended since, and rewrites the snapshot once at least
+EMOTION_SNAPSHOT_MIN_NEW entries have accumulated past it.
+
+The snapshot records one past the highest sequence number it has read
+(next_seq) rather than relying on its entry count: an abandoned append can
+leave a gap in the sequence, after which the count and the next seq no longer
+agree.
+"""
+
+import base64
+import logging
+import os
+from typing import Tuple
+
+from models.emotional_state import EmotionalHistory
+from utils.storage import (
+    get_emotion_snapshot,
+    get_emotional_history,
+    put_emotion_snapshot,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+EMOTION_SNAPSHOT_MIN_NEW = int(os.environ.get("EMOTION_SNAPSHOT_MIN_NEW", "25"))
+
+
+def load_emotional_history(session: dict) -> EmotionalHistory:
+    """Return a session's full emotional history in columnar form."""
+    if "emotional_history" in session:
+        # Legacy inline sessions carry the whole list on METADATA
+        return EmotionalHistory.from_entries(session["emotional_history"])
+
+    session_id = session["session_id"]
+    history, snapshot_seq = _read_snapshot(session_id)
+    snapshot_count = len(history)
+
+    next_seq = snapshot_seq
+    expected = session.get("emotional_count")
+    if expected is None or expected > snapshot_seq:
+        rows = get_emotional_history(session, since=snapshot_seq, with_seq=True)
+        history.extend([entry for _, entry in rows])
+        # Only what was actually read is covered: the chat turn raises
+        # emotional_count before it writes the entry, so the newest one may
+        # not exist yet
+        if rows:
+            next_seq = rows[-1][0] + 1
+
+    if len(history) - snapshot_count >= EMOTION_SNAPSHOT_MIN_NEW:
+        packed = history.to_bytes()
+        put_emotion_snapshot(
+            session_id,
+            {"count": len(history), "next_seq": next_seq,
+             "data": base64.b64encode(packed).decode("ascii")},
+        )
+        logger.info("Emotion snapshot: session=%s entries=%d bytes=%d",
+                    session_id, len(history), len(packed))
+    return history
+
+
+def _read_snapshot(session_id: str) -> Tuple[EmotionalHistory, int]:
+    """The stored history and the seq of the first entry it does not cover."""
+    snapshot = get_emotion_snapshot(session_id)
+    if not snapshot:
+        return EmotionalHistory(), 0
+    try:
+        history = EmotionalHistory.from_bytes(base64.b64decode(snapshot["data"]))
+    except Exception as e:
+        logger.warning("Ignoring unreadable emotion snapshot for %s: %s", session_id, e)
+        return EmotionalHistory(), 0
+    # Snapshots written before next_seq was recorded assumed a gap-free sequence
+    return history, int(snapshot.get("next_seq", len(history)))
@@ -0,0 +1,98 @@
+"""In-process storage backend for tests, local runs and load benchmarks.
+
+Everything lives in dicts guarded by one lock; values are deep-copied on the
+way in and out so callers can never mutate stored state by accident.
+"""
+
+import copy
+import threading
+import time
+from typing import Optional
+
+from utils.storage import SessionConflict, SessionStore, expires_at, project
+
+
+class MemoryStore(SessionStore):
+    """Process-local session store (contents are lost when the process exits)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._history = {}  # (session_id, kind) -> {seq: entry}
+        self._documents = {}  # (pk, sk) -> (value, expires_at)
+
+    # -- sessions -------------------------------------------------------------
+
+    def put_session(self, session_id: str, metadata: dict) -> None:
+        with self._lock:
+            self._sessions[session_id] = copy.deepcopy(
+                {**metadata, "session_id": session_id, "version": 0}
+            )
+
+    def get_session(self, session_id: str, fields: Optional[list] = None) -> Optional[dict]:
+        with self._lock:
+            record = self._sessions.get(session_id)
+            return copy.deepcopy(project(record, fields)) if record is not None else None
+
+    def update_session(
+        self, session_id: str, updates: dict, expected_version: Optional[int] = None
+    ) -> int:
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if expected_version is not None:
+                if record is None or record.get("version", 0) != expected_version:
+                    raise SessionConflict(
+                        f"Session {session_id} changed since version {expected_version}"
+                    )
+            if record is None:
+                record = self._sessions[session_id] = {"session_id": session_id}
+            record.update(copy.deepcopy(updates))
+            record["version"] = record.get("version", 0) + 1
+            return record["version"]
+
+    # -- append-only history --------------------------------------------------
+
+    def append_history(self, session_id: str, kind: str, start_seq: int, entries: list) -> None:
+        with self._lock:
+            items = self._history.setdefault((session_id, kind), {})
+            for offset, entry in enumerate(entries):
+                items[start_seq + offset] = copy.deepcopy(entry)
+
+    def query_history(
+        self, session_id: str, kind: str, since: int = 0, last_n: Optional[int] = None,
+        with_seq: bool = False,
+    ) -> list:
+        with self._lock:
+            items = self._history.get((session_id, kind), {})
+            entries = [(seq, items[seq]) for seq in sorted(items) if seq >= since]
+            if last_n is not None:
+                entries = entries[-last_n:] if last_n else []
+            entries = copy.deepcopy(entries)
+            return entries if with_seq else [entry for _, entry in entries]
+
+    # -- keyed documents ------------------------------------------------------
+
+    def get_document(self, pk: str, sk: str, attribute: str) -> Optional[dict]:
+        with self._lock:
+            stored = self._documents.get((pk, sk, attribute))
+            if stored is None:
+                return None
+            value, expiry = stored
+            if expiry is not None and expiry < time.time():
+                return None
+            return copy.deepcopy(value)
+
+    def put_document(
+        self,
+        pk: str,
+        sk: str,
+        attribute: str,
+        value,
+        ttl_seconds: Optional[int] = None,
+        if_absent: bool = False,
+    ) -> None:
+        with self._lock:
+            key = (pk, sk, attribute)
+            if if_absent and key in self._documents:
+                return
+            self._documents[key] = (copy.deepcopy(value), expires_at(ttl_seconds))
@@ -0,0 +1,124 @@
+"""Request-scoped session state shared by the chat loop and the tool dispatcher.
+
+A SessionContext is loaded once per request and reads like the session dict
+(get, [], in). Assignments are tracked, and flush() writes only the changed
+fields with a version-conditional update, so two overlapping turns on the same
+session cannot silently overwrite each other: the later flush raises
+SessionConflict and the caller reloads and reapplies its changes.
+
+With SESSION_CACHE_ENABLED a warm container keeps the last loaded state per
+session and reuses it when a version-only read shows it is still current.
+"""
+
+import copy
+import logging
+import os
+from typing import Optional
+
+from utils.cache import LRUCache
+from utils.storage import get_session, update_session
+from utils.tracing import annotate
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SESSION_CACHE_ENABLED = os.environ.get("SESSION_CACHE_ENABLED", "false").lower() == "true"
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", "128"))
+
+_warm_sessions = LRUCache(SESSION_CACHE_SIZE)
+
+
+class SessionContext:
+    """A session's METADATA fields with change tracking and versioned writes."""
+
+    def __init__(self, session_id: str, data: dict, fields: Optional[list] = None):
+        self.session_id = session_id
+        self.fields = fields
+        self._data = data
+        self._dirty = set()
+
+    @classmethod
+    def load(cls, session_id: str, fields: Optional[list] = None) -> Optional["SessionContext"]:
+        """Read a session (optionally only `fields`); None if it does not exist."""
+        if fields:
+            fields = list(dict.fromkeys([*fields, "version"]))
+        ctx = cls(session_id, {}, fields)
+
+        if SESSION_CACHE_ENABLED:
+            cached = _warm_sessions.get(ctx._cache_key)
+            if cached is not None:
+                current = get_session(session_id, fields=["version"])
+                if current is None:
+                    return None
+                hit = int(current.get("version", 0)) == int(cached.get("version", 0))
+                annotate(session_cache_hit=hit)
+                if hit:
+                    ctx._data = copy.deepcopy(cached)
+                    return ctx
+
+        data = get_session(session_id, fields=fields)
+        if data is None:
+            return None
+        ctx._data = data
+        ctx._remember()
+        return ctx
+
+    @property
+    def version(self) -> int:
+        return int(self._data.get("version", 0))
+
+    @property
+    def _cache_key(self) -> str:
+        return f"{self.session_id}#{','.join(self.fields or [])}"
+
+    def get(self, key: str, default=None):
+        return self._data.get(key, default)
+
+    def __getitem__(self, key: str):
+        return self._data[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def __setitem__(self, key: str, value) -> None:
+        self._data[key] = value
+        self._dirty.add(key)
+
+    def update(self, values: dict) -> None:
+        for key, value in values.items():
+            self[key] = value
+
+    def pop(self, key: str, default=None):
+        """Drop a field from the in-memory view only (nothing is written)."""
+        self._dirty.discard(key)
+        return self._data.pop(key, default)
+
+    def to_dict(self) -> dict:
+        return dict(self._data)
+
+    def reload(self) -> None:
+        """Re-read the session, discarding unflushed changes."""
+        self._data = get_session(self.session_id, fields=self.fields) or {}
+        self._dirty.clear()
+        self._remember()
+
+    def flush(self) -> None:
+        """Write changed fields if the stored version is still the one loaded.
+
+        Raises:
+            SessionConflict: another request updated the session first.
+        """
+        if not self._dirty:
+            return
+        updates = {key: self._data[key] for key in self._dirty}
+        self._data["version"] = update_session(
+            self.session_id, updates, expected_version=self.version
+        )
+        logger.info("Session %s: flushed %s at version %d",
+                    self.session_id, sorted(updates), self.version)
+        self._dirty.clear()
+        self._remember()
+
+    def _remember(self) -> None:
+        if SESSION_CACHE_ENABLED:
+            _warm_sessions.put(self._cache_key, copy.deepcopy(self._data))
@@ -0,0 +1,176 @@
+"""SQLite storage backend for single-node deployments and offline load testing.
+
+The database runs in WAL mode so readers never block the writer, and each
+thread gets its own connection (the chat loop dispatches tools on a thread
+pool). Records are stored as JSON; a session's version lives in its own
+column so conditional writes are a single compare-and-set inside an
+IMMEDIATE transaction.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from utils.storage import SessionConflict, SessionStore, expires_at, project
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    session_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (session_id, kind, seq)
+);
+CREATE TABLE IF NOT EXISTS documents (
+    pk TEXT NOT NULL,
+    sk TEXT NOT NULL,
+    attribute TEXT NOT NULL,
+    data TEXT NOT NULL,
+    expires_at INTEGER,
+    PRIMARY KEY (pk, sk, attribute)
+);
+"""
+
+
+class SQLiteStore(SessionStore):
+    """Session store in a local SQLite database file."""
+
+    def __init__(self, path: str, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; multi-statement writes open explicit transactions
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+        return conn
+
+    # -- sessions -------------------------------------------------------------
+
+    def put_session(self, session_id: str, metadata: dict) -> None:
+        data = {**metadata, "session_id": session_id}
+        data.pop("version", None)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO sessions (session_id, version, data) VALUES (?, 0, ?)",
+            (session_id, json.dumps(data)),
+        )
+
+    def get_session(self, session_id: str, fields: Optional[list] = None) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT version, data FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[1])
+        record["version"] = row[0]
+        return project(record, fields)
+
+    def update_session(
+        self, session_id: str, updates: dict, expected_version: Optional[int] = None
+    ) -> int:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT version, data FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if expected_version is not None and (row is None or row[0] != expected_version):
+                raise SessionConflict(
+                    f"Session {session_id} changed since version {expected_version}"
+                )
+            version = (row[0] if row else 0) + 1
+            data = json.loads(row[1]) if row else {"session_id": session_id}
+            data.update(updates)
+            data.pop("version", None)
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, version, data) VALUES (?, ?, ?)",
+                (session_id, version, json.dumps(data)),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return version
+
+    # -- append-only history --------------------------------------------------
+
+    def append_history(self, session_id: str, kind: str, start_seq: int, entries: list) -> None:
+        if not entries:
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO history (session_id, kind, seq, data) VALUES (?, ?, ?, ?)",
+                [
+                    (session_id, kind, start_seq + offset, json.dumps(entry))
+                    for offset, entry in enumerate(entries)
+                ],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def query_history(
+        self, session_id: str, kind: str, since: int = 0, last_n: Optional[int] = None,
+        with_seq: bool = False,
+    ) -> list:
+        conn = self._conn()
+        if last_n is not None:
+            rows = conn.execute(
+                "SELECT seq, data FROM history WHERE session_id = ? AND kind = ? AND seq >= ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (session_id, kind, since, last_n),
+            ).fetchall()
+            rows.reverse()
+        else:
+            rows = conn.execute(
+                "SELECT seq, data FROM history WHERE session_id = ? AND kind = ? AND seq >= ? "
+                "ORDER BY seq",
+                (session_id, kind, since),
+            ).fetchall()
+        if with_seq:
+            return [(row[0], json.loads(row[1])) for row in rows]
+        return [json.loads(row[1]) for row in rows]
+
+    # -- keyed documents ------------------------------------------------------
+
+    def get_document(self, pk: str, sk: str, attribute: str) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT data, expires_at FROM documents WHERE pk = ? AND sk = ? AND attribute = ?",
+            (pk, sk, attribute),
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return json.loads(row[0])
+
+    def put_document(
+        self,
+        pk: str,
+        sk: str,
+        attribute: str,
+        value,
+        ttl_seconds: Optional[int] = None,
+        if_absent: bool = False,
+    ) -> None:
+        verb = "INSERT OR IGNORE" if if_absent else "INSERT OR REPLACE"
+        self._conn().execute(
+            f"{verb} INTO documents (pk, sk, attribute, data, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (pk, sk, attribute, json.dumps(value), expires_at(ttl_seconds)),
+        )
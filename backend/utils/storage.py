@@ -0,0 +1,395 @@
+"""Session storage interface and the backend-selecting facade handlers call.
+
+STORAGE_BACKEND picks the implementation:
+    dynamodb  - the sessions table (default; utils.dynamo)
+    sqlite    - a local SQLite file in WAL mode at SQLITE_PATH (utils.sqlite_store)
+    memory    - process-local dicts, for tests and load runs (utils.memory_store)
+
+The store is created on first use, so importing a handler never touches AWS.
+Every backend keeps the same data model: a METADATA record per session with a
+version counter, append-only message / emotional-history entries numbered from
+0, and keyed documents (shared curricula, cache entries, question banks).
+tests/test_storage.py checks that every backend honours it.
+"""
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from models.curriculum import curriculum_hash
+from utils.tracing import traced
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "dynamodb")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "mindhacker.db")
+
+# History kinds, also used as DynamoDB sort-key prefixes
+MESSAGES = "MSG#"
+EMOTIONS = "EMO#"
+
+
+class SessionConflict(Exception):
+    """A conditional session write found a newer version than the one the caller loaded."""
+
+
+class SessionStore(ABC):
+    """Persistence operations shared by every storage backend."""
+
+    # -- sessions -------------------------------------------------------------
+
+    @abstractmethod
+    def put_session(self, session_id: str, metadata: dict) -> None:
+        """Write a new session's METADATA record (version 0)."""
+
+    @abstractmethod
+    def get_session(self, session_id: str, fields: Optional[list] = None) -> Optional[dict]:
+        """Read a session's METADATA, only `fields` (plus session_id) if given."""
+
+    @abstractmethod
+    def update_session(
+        self, session_id: str, updates: dict, expected_version: Optional[int] = None
+    ) -> int:
+        """SET fields, increment the version and return it.
+
+        With expected_version, raise SessionConflict unless the stored version
+        (0 when never written) still matches.
+        """
+
+    def batch_get_sessions(self, session_ids: list, fields: list) -> dict:
+        """{session_id: METADATA} for the sessions that exist."""
+        sessions = {}
+        for session_id in dict.fromkeys(session_ids):
+            session = self.get_session(session_id, fields=fields)
+            if session is not None:
+                sessions[session_id] = session
+        return sessions
+
+    def create_session(self, session_data: dict) -> dict:
+        """Store a new session; the curriculum goes to a shared content-addressed document."""
+        session_id = session_data["session_id"]
+        messages = session_data.get("messages", [])
+        emotional_history = session_data.get("emotional_history", [])
+        metadata = {
+            k: v for k, v in session_data.items()
+            if k not in ("messages", "emotional_history", "curriculum")
+        }
+        curriculum = session_data.get("curriculum")
+        if curriculum:
+            metadata["curriculum_hash"] = self.put_curriculum(curriculum)
+            metadata["node_count"] = len(curriculum.get("nodes", []))
+        metadata["message_count"] = len(messages)
+        metadata["emotional_count"] = len(emotional_history)
+
+        self.put_session(session_id, metadata)
+        self.append_history(session_id, MESSAGES, 0, messages)
+        self.append_history(session_id, EMOTIONS, 0, emotional_history)
+        return session_data
+
+    def migrate_inline_history(self, session: dict) -> dict:
+        """Move legacy inline history lists out of METADATA (DynamoDB only)."""
+        return session
+
+    # -- append-only history --------------------------------------------------
+
+    @abstractmethod
+    def append_history(self, session_id: str, kind: str, start_seq: int, entries: list) -> None:
+        """Write entries numbered start_seq, start_seq + 1, ..."""
+
+    @abstractmethod
+    def query_history(
+        self, session_id: str, kind: str, since: int = 0, last_n: Optional[int] = None,
+        with_seq: bool = False,
+    ) -> list:
+        """Entries with seq >= since in order, or only the newest last_n of them.
+
+        With with_seq, (seq, entry) pairs instead of bare entries.
+        """
+
+    def history_since(self, session_id: str, kind: str, timestamp: str) -> list:
+        """Entries whose ISO "timestamp" is >= timestamp (entries without one are older)."""
+        return [
+            e for e in self.query_history(session_id, kind)
+            if e.get("timestamp", "") >= timestamp
+        ]
+
+    # -- keyed documents ------------------------------------------------------
+
+    @abstractmethod
+    def get_document(self, pk: str, sk: str, attribute: str) -> Optional[dict]:
+        """Read a document's value, or None if missing or past its TTL."""
+
+    @abstractmethod
+    def put_document(
+        self,
+        pk: str,
+        sk: str,
+        attribute: str,
+        value,
+        ttl_seconds: Optional[int] = None,
+        if_absent: bool = False,
+    ) -> None:
+        """Write a document; with if_absent an existing one is left untouched."""
+
+    def put_curriculum(self, curriculum: dict) -> str:
+        c_hash = curriculum_hash(curriculum)
+        self.put_document(f"CURRICULUM#{c_hash}", "METADATA", "curriculum", curriculum,
+                          if_absent=True)
+        return c_hash
+
+    def get_curriculum(self, c_hash: str) -> Optional[dict]:
+        return self.get_document(f"CURRICULUM#{c_hash}", "METADATA", "curriculum")
+
+    def get_cache_item(self, pk: str, sk: str) -> Optional[dict]:
+        return self.get_document(pk, sk, "value")
+
+    def put_cache_item(self, pk: str, sk: str, value: dict, ttl_seconds: int) -> None:
+        self.put_document(pk, sk, "value", value, ttl_seconds=ttl_seconds)
+
+    def get_question_bank(self, c_hash: str, node_id: str, band: str) -> Optional[dict]:
+        return self.get_document(f"QBANK#{c_hash}", f"{node_id}#{band}", "bank")
+
+    def put_question_bank(self, c_hash: str, node_id: str, band: str, bank: dict) -> None:
+        self.put_document(f"QBANK#{c_hash}", f"{node_id}#{band}", "bank", bank)
+
+    def get_adaptation(self, c_hash: str, node_id: str, strategy_key: str) -> Optional[dict]:
+        return self.get_document(f"ADAPTBANK#{c_hash}", f"{node_id}#{strategy_key}", "variant")
+
+    def put_adaptation(self, c_hash: str, node_id: str, strategy_key: str, variant: dict) -> None:
+        self.put_document(f"ADAPTBANK#{c_hash}", f"{node_id}#{strategy_key}", "variant", variant)
+
+    def get_strategy_demand(self, c_hash: str) -> Optional[dict]:
+        return self.get_document(f"ADAPTBANK#{c_hash}", "DEMAND", "strategies")
+
+    def put_strategy_demand(self, c_hash: str, demand: dict) -> None:
+        self.put_document(f"ADAPTBANK#{c_hash}", "DEMAND", "strategies", demand)
+
+    def get_parse_result(self, parse_key: str) -> Optional[dict]:
+        return self.get_document(f"PARSE#{parse_key}", "METADATA", "result")
+
+    def put_parse_result(self, parse_key: str, result: dict) -> None:
+        self.put_document(f"PARSE#{parse_key}", "METADATA", "result", result)
+
+    def get_emotion_snapshot(self, session_id: str) -> Optional[dict]:
+        return self.get_document(f"EMOSNAP#{session_id}", "METADATA", "snapshot")
+
+    def put_emotion_snapshot(self, session_id: str, snapshot: dict) -> None:
+        self.put_document(f"EMOSNAP#{session_id}", "METADATA", "snapshot", snapshot)
+
+
+def expires_at(ttl_seconds: Optional[int]) -> Optional[int]:
+    return int(time.time()) + ttl_seconds if ttl_seconds else None
+
+
+def project(record: dict, fields: Optional[list]) -> dict:
+    """Apply a field selection the way a DynamoDB ProjectionExpression would."""
+    if not fields:
+        return record
+    wanted = {"session_id", *fields}
+    return {k: v for k, v in record.items() if k in wanted}
+
+
+def create_store(backend: str) -> SessionStore:
+    if backend == "dynamodb":
+        from utils.dynamo import DynamoDBStore
+
+        return DynamoDBStore()
+    if backend == "sqlite":
+        from utils.sqlite_store import SQLiteStore
+
+        return SQLiteStore(SQLITE_PATH)
+    if backend == "memory":
+        from utils.memory_store import MemoryStore
+
+        return MemoryStore()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SessionStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store(STORAGE_BACKEND)
+    return _store
+
+
+def set_store(store: Optional[SessionStore]) -> None:
+    """Swap the active store (benchmarks, local runs); None re-selects from the env."""
+    global _store
+    _store = store
+
+
+# Module-level API used by handlers and agents --------------------------------
+
+
+def create_session(session_data: dict) -> dict:
+    """Create a new session; the curriculum is stored once under its content hash.
+
+    Long node content goes to utils.content_store first; the returned dict is
+    the caller's, content included.
+    """
+    if session_data.get("curriculum"):
+        from utils.content_store import externalize_content
+
+        get_store().create_session(
+            {**session_data, "curriculum": externalize_content(session_data["curriculum"])}
+        )
+        return session_data
+    return get_store().create_session(session_data)
+
+
+@traced("get_session")
+def get_session(session_id: str, fields: Optional[list] = None) -> Optional[dict]:
+    """Retrieve a session's METADATA by ID, optionally only the given top-level fields.
+
+    Messages and emotional history are loaded separately with get_messages /
+    get_emotional_history, and the curriculum with utils.curriculum_store.
+    """
+    return get_store().get_session(session_id, fields)
+
+
+@traced("batch_get_sessions")
+def batch_get_sessions(session_ids: list, fields: list) -> dict:
+    """Read many sessions' METADATA (only `fields`); {session_id: item} for those that exist."""
+    return get_store().batch_get_sessions(session_ids, fields)
+
+
+@traced("update_session")
+def update_session(session_id: str, updates: dict, expected_version: Optional[int] = None) -> int:
+    """Update specific fields of a session and return its new version.
+
+    Raises SessionConflict if expected_version is given and no longer current.
+    """
+    return get_store().update_session(session_id, updates, expected_version)
+
+
+def _load_history(session: dict, field: str, kind: str, since: int, last_n: Optional[int],
+                  with_seq: bool = False) -> list:
+    # Sessions still in the inline layout carry the full list on METADATA
+    if field in session:
+        entries = list(enumerate(session[field]))[since:]
+        if last_n is not None:
+            entries = entries[-last_n:] if last_n else []
+        return entries if with_seq else [entry for _, entry in entries]
+    return get_store().query_history(session["session_id"], kind, since, last_n, with_seq)
+
+
+def get_messages(session: dict, since: int = 0, last_n: Optional[int] = None) -> list:
+    """Load a session's messages from seq `since` onwards (optionally only the last N)."""
+    return _load_history(session, "messages", MESSAGES, since, last_n)
+
+
+def get_emotional_history(session: dict, since: int = 0, last_n: Optional[int] = None,
+                          with_seq: bool = False) -> list:
+    """Load a session's emotional-history entries (optionally only the last N).
+
+    With with_seq, returns (seq, entry) pairs.
+    """
+    return _load_history(session, "emotional_history", EMOTIONS, since, last_n, with_seq)
+
+
+def get_emotional_history_since(session: dict, timestamp: str) -> list:
+    """Load emotional-history entries recorded at or after an ISO-8601 timestamp."""
+    if "emotional_history" in session:
+        return [e for e in session["emotional_history"] if e.get("timestamp", "") >= timestamp]
+    return get_store().history_since(session["session_id"], EMOTIONS, timestamp)
+
+
+def append_messages(session_id: str, start_seq: int, messages: list) -> None:
+    """Write new messages numbered from start_seq (the current message_count)."""
+    get_store().append_history(session_id, MESSAGES, start_seq, messages)
+
+
+def append_emotional_history(session_id: str, start_seq: int, entries: list) -> None:
+    """Write new emotional-history entries numbered from start_seq (the current emotional_count)."""
+    get_store().append_history(session_id, EMOTIONS, start_seq, entries)
+
+
+def migrate_inline_history(session: dict) -> dict:
+    """Return the session in the append-only layout, migrating legacy inline lists."""
+    if "message_count" in session:
+        return session
+    return get_store().migrate_inline_history(session)
+
+
+def put_curriculum(curriculum: dict) -> str:
+    """Store a curriculum once under its content hash and return the hash.
+
+    Long node content is moved to utils.content_store; the hash covers the
+    stored form, whose content refs are themselves content hashes.
+    """
+    from utils.content_store import externalize_content
+
+    return get_store().put_curriculum(externalize_content(curriculum))
+
+
+@traced("get_curriculum")
+def get_curriculum(c_hash: str) -> Optional[dict]:
+    """Fetch a curriculum stored by put_curriculum."""
+    return get_store().get_curriculum(c_hash)
+
+
+def get_cache_item(pk: str, sk: str) -> Optional[dict]:
+    """Read a cached value stored by put_cache_item, ignoring expired entries."""
+    return get_store().get_cache_item(pk, sk)
+
+
+def put_cache_item(pk: str, sk: str, value: dict, ttl_seconds: int) -> None:
+    """Store a cached value that expires after ttl_seconds."""
+    get_store().put_cache_item(pk, sk, value, ttl_seconds)
+
+
+def get_question_bank(curriculum_hash: str, node_id: str, band: str) -> Optional[dict]:
+    """Fetch pre-generated questions for a curriculum node and emotional band."""
+    return get_store().get_question_bank(curriculum_hash, node_id, band)
+
+
+def put_question_bank(curriculum_hash: str, node_id: str, band: str, bank: dict) -> None:
+    """Store pre-generated questions for a curriculum node and emotional band."""
+    get_store().put_question_bank(curriculum_hash, node_id, band, bank)
+
+
+def get_adaptation(curriculum_hash: str, node_id: str, strategy_key: str) -> Optional[dict]:
+    """Fetch a pre-generated content adaptation for a node and strategy bucket."""
+    return get_store().get_adaptation(curriculum_hash, node_id, strategy_key)
+
+
+def put_adaptation(curriculum_hash: str, node_id: str, strategy_key: str, variant: dict) -> None:
+    """Store a pre-generated content adaptation for a node and strategy bucket."""
+    get_store().put_adaptation(curriculum_hash, node_id, strategy_key, variant)
+
+
+def get_strategy_demand(curriculum_hash: str) -> Optional[dict]:
+    """Fetch the strategy buckets live adaptations used for a curriculum, with counts."""
+    return get_store().get_strategy_demand(curriculum_hash)
+
+
+def put_strategy_demand(curriculum_hash: str, demand: dict) -> None:
+    """Store {strategy_key: {"count": n, "state": {...}}} for a curriculum."""
+    get_store().put_strategy_demand(curriculum_hash, demand)
+
+
+@traced("get_parse_result")
+def get_parse_result(parse_key: str) -> Optional[dict]:
+    """Fetch the cached parse of an upload (see agents.curriculum_parser.parse_key)."""
+    return get_store().get_parse_result(parse_key)
+
+
+def put_parse_result(parse_key: str, result: dict) -> None:
+    """Remember which curriculum an upload's text parsed into."""
+    get_store().put_parse_result(parse_key, result)
+
+
+def get_emotion_snapshot(session_id: str) -> Optional[dict]:
+    """Fetch the packed emotional history stored by put_emotion_snapshot."""
+    return get_store().get_emotion_snapshot(session_id)
+
+
+def put_emotion_snapshot(session_id: str, snapshot: dict) -> None:
+    """Store a session's packed emotional history ({"count": n, "data": base64})."""
+    get_store().put_emotion_snapshot(session_id, snapshot)
@@ -0,0 +1,178 @@
+"""Lightweight per-request tracing with CloudWatch Embedded Metric Format output.
+
+A trace is a tree of timed spans held in a context variable. Instrumented calls
+(orchestrator and agent invocations, tool dispatch, session reads/writes) open
+child spans under whatever span is current; outside a trace they are no-ops.
+finish_trace() prints one EMF line with per-operation durations, counts and
+token totals, which CloudWatch turns into metrics for p95/p99 dashboards.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+METRIC_NAMESPACE = os.environ.get("METRIC_NAMESPACE", "MindHacker")
+TRACE_DEBUG = os.environ.get("TRACE_DEBUG", "false").lower() == "true"
+
+TOKEN_ATTRIBUTES = (
+    "inputTokens",
+    "outputTokens",
+    "cacheReadInputTokens",
+    "cacheWriteInputTokens",
+)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed operation with attributes and child spans."""
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = dict(attributes)
+        self.children = []
+        self.start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def end(self) -> None:
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "duration_ms": round(self.duration_ms or 0.0, 1),
+            **self.attributes,
+            "children": [c.to_dict() for c in self.children],
+        }
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def annotate(**attributes) -> None:
+    """Set attributes on the current span, if any."""
+    span_ = _current_span.get()
+    if span_ is not None:
+        span_.set(**attributes)
+
+
+def record_usage(usage: dict, span_: Optional[Span] = None) -> None:
+    """Attach Bedrock token usage to span_, or to the current span."""
+    tokens = {k: usage.get(k, 0) for k in TOKEN_ATTRIBUTES if k in usage}
+    if span_ is not None:
+        span_.set(**tokens)
+    else:
+        annotate(**tokens)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child of the current span."""
+    parent = _current_span.get()
+    span_ = Span(name, **attributes)
+    if parent is not None:
+        parent.children.append(span_)
+    token = _current_span.set(span_)
+    try:
+        yield span_
+    finally:
+        span_.end()
+        _current_span.reset(token)
+
+
+def child_span(name: str, **attributes) -> Span:
+    """Start a child of the current span without making it current.
+
+    For generators: a context variable set before a yield may be reset in
+    another context, or never if the consumer stops early. The caller ends
+    the span itself (in a finally block).
+    """
+    parent = _current_span.get()
+    span_ = Span(name, **attributes)
+    if parent is not None:
+        parent.children.append(span_)
+    return span_
+
+
+def traced(name: str):
+    """Decorator form of span() for plain (non-generator) functions."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def start_trace(name: str, **attributes) -> Span:
+    """Begin a new trace rooted at the current context."""
+    root = Span(name, **attributes)
+    _current_span.set(root)
+    return root
+
+
+def finish_trace(root: Span) -> dict:
+    """End a trace, emit it as an EMF log line and return the span tree."""
+    root.end()
+    _current_span.set(None)
+
+    metrics = {f"{root.name}.duration": root.duration_ms}
+    totals = {k: 0 for k in TOKEN_ATTRIBUTES}
+    for span_ in root.walk():
+        if span_ is not root:
+            metrics[f"{span_.name}.duration"] = (
+                metrics.get(f"{span_.name}.duration", 0.0) + (span_.duration_ms or 0.0)
+            )
+            metrics[f"{span_.name}.count"] = metrics.get(f"{span_.name}.count", 0) + 1
+        for key in TOKEN_ATTRIBUTES:
+            totals[key] += span_.attributes.get(key, 0)
+    metrics.update(totals)
+    # Numeric attributes on the root (e.g. iterations) are reported as metrics too
+    metrics.update(
+        {k: v for k, v in root.attributes.items()
+         if isinstance(v, (int, float)) and not isinstance(v, bool)}
+    )
+
+    definitions = [
+        {"Name": key, "Unit": "Milliseconds" if key.endswith(".duration") else "Count"}
+        for key in metrics
+    ]
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": METRIC_NAMESPACE,
+                    "Dimensions": [["Operation"]],
+                    "Metrics": definitions,
+                }
+            ],
+        },
+        "Operation": root.name,
+        **{k: round(v, 1) if isinstance(v, float) else v for k, v in metrics.items()},
+        **{k: v for k, v in root.attributes.items() if isinstance(v, str)},
+    }
+    # EMF must be written to stdout as a single line
+    print(json.dumps(record), flush=True)
+    return root.to_dict()
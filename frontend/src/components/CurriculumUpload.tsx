@@ -1,7 +1,7 @@
 'use client';
 
 import { useState, useRef, useCallback } from 'react';
-import { uploadCurriculum, uploadCurriculumPdf } from '@/lib/api';
+import { uploadCurriculum, uploadCurriculumFile } from '@/lib/api';
 import { Curriculum } from '@/lib/types';
 
 /**
@@ -48,13 +48,13 @@ export default function CurriculumUpload({ onUploadComplete, isLoading, setIsLoa
   const [subject, setSubject] = useState('');
   const [isDragging, setIsDragging] = useState(false);
   const [fileName, setFileName] = useState('');
-  const [pdfBase64, setPdfBase64] = useState<string | null>(null);
+  const [pdfFile, setPdfFile] = useState<File | null>(null);
   const fileRef = useRef<HTMLInputElement>(null);
 
   const handleFile = useCallback(async (file: File) => {
     const name = file.name.toLowerCase();
     setFileName(file.name);
-    setPdfBase64(null);
+    setPdfFile(null);
 
     if (!subject) {
       const autoName = file.name.replace(/\.[^.]+$/, '').replace(/[_-]/g, ' ');
@@ -62,12 +62,8 @@ export default function CurriculumUpload({ onUploadComplete, isLoading, setIsLoa
     }
 
     if (name.endsWith('.pdf')) {
-      // Store as base64 — backend will extract text
-      const arrayBuffer = await file.arrayBuffer();
-      const base64 = btoa(
-        new Uint8Array(arrayBuffer).reduce((data, byte) => data + String.fromCharCode(byte), '')
-      );
-      setPdfBase64(base64);
+      // Uploaded straight to S3 on submit — backend extracts the text
+      setPdfFile(file);
       setContent('[PDF uploaded — text will be extracted on the server]');
     } else {
       const text = await file.text();
@@ -92,17 +88,17 @@ export default function CurriculumUpload({ onUploadComplete, isLoading, setIsLoa
     const newContent = content.substring(0, start) + cleaned + content.substring(end);
     setContent(newContent);
     // Clear any previously loaded PDF since user is pasting text
-    setPdfBase64(null);
+    setPdfFile(null);
     setFileName('');
   }, [content]);
 
   const handleSubmit = async () => {
-    if (!pdfBase64 && !content.trim()) return;
+    if (!pdfFile && !content.trim()) return;
     setIsLoading(true);
     setError('');
     try {
-      const res = pdfBase64
-        ? await uploadCurriculumPdf(pdfBase64, subject)
+      const res = pdfFile
+        ? await uploadCurriculumFile(pdfFile, subject)
         : await uploadCurriculum(content, subject);
       onUploadComplete(res.session_id, res.curriculum);
     } catch (err) {
@@ -177,7 +173,7 @@ export default function CurriculumUpload({ onUploadComplete, isLoading, setIsLoa
           {fileName ? (
             <>
               <p className="text-sm font-heading font-semibold gradient-text-static">{fileName}</p>
-              <p className="text-xs text-ice-dark">{pdfBase64 ? 'PDF ready — text will be extracted on submit' : 'Click to change file'}</p>
+              <p className="text-xs text-ice-dark">{pdfFile ? 'PDF ready — text will be extracted on submit' : 'Click to change file'}</p>
             </>
           ) : (
             <>
@@ -199,19 +195,19 @@ export default function CurriculumUpload({ onUploadComplete, isLoading, setIsLoa
         </label>
         <textarea
           value={content}
-          onChange={(e) => { setContent(e.target.value); setPdfBase64(null); setFileName(''); }}
+          onChange={(e) => { setContent(e.target.value); setPdfFile(null); setFileName(''); }}
           onPaste={handlePaste}
           placeholder="Paste your curriculum content here..."
           rows={6}
-          readOnly={!!pdfBase64}
-          className={`w-full px-5 py-4 input-glass text-sm text-foreground placeholder:text-ice-dark resize-none ${pdfBase64 ? 'opacity-50' : ''}`}
+          readOnly={!!pdfFile}
+          className={`w-full px-5 py-4 input-glass text-sm text-foreground placeholder:text-ice-dark resize-none ${pdfFile ? 'opacity-50' : ''}`}
         />
       </div>
 
       {/* Submit button */}
       <button
         onClick={handleSubmit}
-        disabled={(!pdfBase64 && !content.trim()) || isLoading}
+        disabled={(!pdfFile && !content.trim()) || isLoading}
         className="w-full py-4 btn-primary shimmer rounded-2xl flex items-center justify-center gap-2.5 text-base font-heading"
       >
         {isLoading ? (
@@ -220,7 +216,7 @@ export default function CurriculumUpload({ onUploadComplete, isLoading, setIsLoa
               <circle cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="3" className="opacity-20" />
               <path d="M4 12a8 8 0 018-8" stroke="currentColor" strokeWidth="3" strokeLinecap="round" className="opacity-80" />
             </svg>
-            {pdfBase64 ? 'Extracting & parsing...' : 'Parsing curriculum...'}
+            {pdfFile ? 'Extracting & parsing...' : 'Parsing curriculum...'}
           </>
         ) : (
           <>
@@ -1,7 +1,8 @@
-import { ChatResponse, UploadResponse, SessionData, ProgressData, Curriculum } from './types';
+import { ChatResponse, ChatStreamEvent, UploadResponse, UploadUrlResponse, UploadStatus, SessionData, ProgressData, BatchProgressData, Curriculum } from './types';
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || '';
 const CHAT_URL = process.env.NEXT_PUBLIC_CHAT_URL || '';
+export const CHAT_STREAM_URL = process.env.NEXT_PUBLIC_CHAT_STREAM_URL || '';
 const FETCH_TIMEOUT_MS = 120_000;
 
 async function fetchAPI<T>(path: string, options?: RequestInit): Promise<T> {
@@ -61,6 +62,71 @@ export async function sendMessage(sessionId: string, message: string): Promise<C
   });
 }
 
+export async function streamMessage(
+  sessionId: string,
+  message: string,
+  onEvent: (event: ChatStreamEvent) => void,
+): Promise<ChatResponse> {
+  // Streaming Function URL returns one JSON event per line as the turn progresses
+  const controller = new AbortController();
+  const timeout = setTimeout(() => controller.abort(), FETCH_TIMEOUT_MS);
+  try {
+    const res = await fetch(CHAT_STREAM_URL, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ session_id: sessionId, message }),
+      signal: controller.signal,
+    });
+    if (!res.ok || !res.body) {
+      const error = await res.json().catch(() => ({ error: 'Request failed' }));
+      throw new Error(error.error || `HTTP ${res.status}`);
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let done = null as ChatResponse | null;
+
+    const handleLine = (line: string) => {
+      if (!line.trim()) return;
+      const event = JSON.parse(line) as ChatStreamEvent;
+      if (event.type === 'error') throw new Error(event.error);
+      if (event.type === 'done') {
+        done = {
+          response: event.response,
+          emotional_state: event.emotional_state,
+          agent_log: event.agent_log,
+          usage: event.usage,
+          session_usage: event.session_usage,
+          budget_level: event.budget_level,
+          session_id: event.session_id,
+        };
+      }
+      onEvent(event);
+    };
+
+    while (true) {
+      const { value, done: finished } = await reader.read();
+      if (finished) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop() ?? '';
+      lines.forEach(handleLine);
+    }
+    handleLine(buffer);
+
+    if (!done) throw new Error('Stream ended before the response completed');
+    return done;
+  } catch (err: unknown) {
+    if (err instanceof DOMException && err.name === 'AbortError') {
+      throw new Error('Request timed out — is the backend running?');
+    }
+    throw err;
+  } finally {
+    clearTimeout(timeout);
+  }
+}
+
 export async function uploadCurriculum(content: string, subject: string): Promise<UploadResponse> {
   return fetchAPI<UploadResponse>('/api/upload', {
     method: 'POST',
@@ -68,15 +134,54 @@ export async function uploadCurriculum(content: string, subject: string): Promis
   });
 }
 
-export async function uploadCurriculumPdf(pdfBase64: string, subject: string): Promise<UploadResponse> {
-  return fetchAPI<UploadResponse>('/api/upload', {
+const UPLOAD_POLL_INTERVAL_MS = 2_000;
+const UPLOAD_POLL_TIMEOUT_MS = 15 * 60_000;
+
+export async function requestUploadUrl(filename: string, subject: string): Promise<UploadUrlResponse> {
+  return fetchAPI<UploadUrlResponse>('/api/upload/url', {
     method: 'POST',
-    body: JSON.stringify({ pdf_base64: pdfBase64, subject }),
+    body: JSON.stringify({ filename, subject }),
   });
 }
 
+export async function getUploadStatus(sessionId: string): Promise<UploadStatus> {
+  return fetchAPI<UploadStatus>(`/api/upload/${sessionId}`);
+}
+
+/**
+ * Upload a file straight to S3 with a presigned POST, then poll until the
+ * backend has extracted and parsed it.
+ */
+export async function uploadCurriculumFile(file: File, subject: string): Promise<UploadResponse> {
+  const target = await requestUploadUrl(file.name, subject);
+  if (file.size > target.max_bytes) {
+    throw new Error(`File is too large (max ${Math.round(target.max_bytes / 1024 / 1024)} MB)`);
+  }
+
+  const form = new FormData();
+  Object.entries(target.upload_fields).forEach(([key, value]) => form.append(key, value));
+  form.append('file', file); // S3 requires the file to be the last field
+  const res = await fetch(target.upload_url, { method: 'POST', body: form });
+  if (!res.ok) {
+    throw new Error(`Upload failed (HTTP ${res.status})`);
+  }
+
+  const deadline = Date.now() + UPLOAD_POLL_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    await new Promise((resolve) => setTimeout(resolve, UPLOAD_POLL_INTERVAL_MS));
+    const status = await getUploadStatus(target.session_id);
+    if (status.status === 'ready' && status.curriculum) {
+      return { session_id: status.session_id, curriculum: status.curriculum };
+    }
+    if (status.status === 'failed') {
+      throw new Error(status.error || 'Could not parse the uploaded file');
+    }
+  }
+  throw new Error('Timed out waiting for the curriculum to be parsed');
+}
+
 export async function getSession(sessionId: string): Promise<SessionData> {
-  return fetchAPI<SessionData>(`/api/session/${sessionId}`);
+  return fetchAPI<SessionData>(`/api/session/${sessionId}?content=true`);
 }
 
 export async function createBackendSession(curriculum: Curriculum): Promise<SessionData> {
@@ -86,6 +191,24 @@ export async function createBackendSession(curriculum: Curriculum): Promise<Sess
   });
 }
 
-export async function getProgress(sessionId: string): Promise<ProgressData> {
-  return fetchAPI<ProgressData>(`/api/progress/${sessionId}`);
+export interface ProgressQuery {
+  since?: string; // ISO-8601 timestamp
+  window?: number; // seconds
+  points?: number; // downsample to at most this many points
+}
+
+export async function getProgress(sessionId: string, query: ProgressQuery = {}): Promise<ProgressData> {
+  const params = new URLSearchParams();
+  Object.entries(query).forEach(([key, value]) => {
+    if (value !== undefined) params.set(key, String(value));
+  });
+  const qs = params.toString();
+  return fetchAPI<ProgressData>(`/api/progress/${sessionId}${qs ? `?${qs}` : ''}`);
+}
+
+export async function getBatchProgress(sessionIds: string[]): Promise<BatchProgressData> {
+  return fetchAPI<BatchProgressData>('/api/progress/batch', {
+    method: 'POST',
+    body: JSON.stringify({ session_ids: sessionIds }),
+  });
 }
@@ -1,7 +1,7 @@
 'use client';
 
 import { useState, useCallback } from 'react';
-import { sendMessage, getSession } from './api';
+import { sendMessage, streamMessage, getSession, CHAT_STREAM_URL } from './api';
 import { isDemoSession, loadDemoSession, ensureBackendSession } from './demo';
 import { Message, EmotionalState, AgentLogEntry, Curriculum } from './types';
 
@@ -25,16 +25,54 @@ export function useChat(sessionId: string) {
 
     try {
       const effectiveSessionId = await ensureBackendSession(sessionId);
-      const res = await sendMessage(effectiveSessionId, text);
-      const assistantMsg: Message = { role: 'assistant', content: res.response, timestamp: new Date().toISOString() };
-      setMessages(prev => [...prev, assistantMsg]);
+      if (CHAT_STREAM_URL) {
+        // Render the reply as it streams; the placeholder is filled in by text events
+        const timestamp = new Date().toISOString();
+        let streamed = '';
+        const setStreamed = (content: string) => {
+          setMessages(prev => {
+            const last = prev[prev.length - 1];
+            const msg: Message = { role: 'assistant', content, timestamp };
+            if (last?.role === 'assistant' && last.timestamp === timestamp) {
+              return [...prev.slice(0, -1), msg];
+            }
+            return [...prev, msg];
+          });
+        };
 
-      if (res.emotional_state) {
-        setEmotionalState(res.emotional_state);
-        setEmotionalHistory(prev => [...prev, res.emotional_state!]);
-      }
+        const res = await streamMessage(effectiveSessionId, text, event => {
+          if (event.type === 'text') {
+            streamed += event.delta;
+            setStreamed(streamed);
+            setAgentActivity('');
+          } else if (event.type === 'reset') {
+            // Text written before a tool call is not part of the reply
+            streamed = '';
+            setMessages(prev => {
+              const last = prev[prev.length - 1];
+              return last?.role === 'assistant' && last.timestamp === timestamp ? prev.slice(0, -1) : prev;
+            });
+          } else if (event.type === 'agent_log') {
+            setAgentLog(prev => [...prev, event.entry]);
+            setAgentActivity(event.entry.input_summary);
+          } else if (event.type === 'emotional_state') {
+            setEmotionalState(event.emotional_state);
+            setEmotionalHistory(prev => [...prev, event.emotional_state]);
+          }
+        });
+        setStreamed(res.response);
+      } else {
+        const res = await sendMessage(effectiveSessionId, text);
+        const assistantMsg: Message = { role: 'assistant', content: res.response, timestamp: new Date().toISOString() };
+        setMessages(prev => [...prev, assistantMsg]);
+
+        if (res.emotional_state) {
+          setEmotionalState(res.emotional_state);
+          setEmotionalHistory(prev => [...prev, res.emotional_state!]);
+        }
 
-      setAgentLog(prev => [...prev, ...res.agent_log]);
+        setAgentLog(prev => [...prev, ...res.agent_log]);
+      }
       setAgentActivity('');
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to send message');
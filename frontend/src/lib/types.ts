@@ -17,6 +17,8 @@ export interface CurriculumNode {
   prerequisites: string[];
   learning_objectives: string[];
   content?: string;
+  content_ref?: string; // set when content is loaded separately (see getSession)
+  content_length?: number;
 }
 
 export interface Curriculum {
@@ -36,18 +38,51 @@ export interface AgentLogEntry {
   input_summary: string;
 }
 
+export interface TokenUsage {
+  inputTokens: number;
+  outputTokens: number;
+  cacheReadInputTokens: number;
+  cacheWriteInputTokens: number;
+}
+
 export interface ChatResponse {
   response: string;
   emotional_state: EmotionalState | null;
   agent_log: AgentLogEntry[];
+  usage?: TokenUsage;
+  session_usage?: TokenUsage & { turns: number };
+  budget_level?: 'normal' | 'constrained' | 'exhausted';
   session_id: string;
 }
 
+export type ChatStreamEvent =
+  | { type: 'text'; delta: string }
+  | { type: 'reset' }
+  | { type: 'agent_log'; entry: AgentLogEntry }
+  | { type: 'emotional_state'; emotional_state: EmotionalState }
+  | ({ type: 'done' } & ChatResponse)
+  | { type: 'error'; error: string };
+
 export interface UploadResponse {
   session_id: string;
   curriculum: Curriculum;
 }
 
+export interface UploadUrlResponse {
+  session_id: string;
+  upload_url: string;
+  upload_fields: Record<string, string>;
+  max_bytes: number;
+  status: 'pending';
+}
+
+export interface UploadStatus {
+  session_id: string;
+  status: 'pending' | 'processing' | 'ready' | 'failed';
+  curriculum?: Curriculum;
+  error?: string;
+}
+
 export interface SessionData {
   session_id: string;
   curriculum: Curriculum;
@@ -57,9 +92,34 @@ export interface SessionData {
   current_node_id: string;
 }
 
+export interface EmotionalAggregates {
+  count: number;
+  flow_trend: number | null;
+  dropout_trend: number | null;
+  per_node: Record<string, Record<string, number>>;
+}
+
+export interface ProgressSummary {
+  session_id: string;
+  completed_count: number;
+  total_nodes: number;
+  progress_pct: number;
+  current_node_id: string;
+  emotional_count: number;
+  flow_trend: number | null;
+  dropout_trend: number | null;
+}
+
+export interface BatchProgressData {
+  sessions: ProgressSummary[];
+  missing: string[];
+}
+
 export interface ProgressData {
   session_id: string;
   emotional_history: EmotionalState[];
+  emotional_count: number;
+  aggregates: EmotionalAggregates;
   completed_nodes: string[];
   total_nodes: number;
   progress_pct: number;